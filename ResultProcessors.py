@@ -1,11 +1,27 @@
-import pandas as pd
+from __future__ import annotations
+from typing import Iterable, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class ResultProcessors:
+    # regexes of the section (file) names inside an archive that this processor handles, see extractor_registry
+    SECTION_PATTERNS: tuple[str, ...] = ()
+
     def process(self, content) -> None:
         raise NotImplementedError
 
-    def groups_to_values_mapping(self) -> dict[str, list[float]]:
+    def process_section(self, section_name: str, parameters: dict[str, str], content) -> None:
+        self.process(content)
+
+    def groups_to_values_mapping(self) -> dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def sample_groups(self) -> Iterable[tuple[str, list, np.ndarray, np.ndarray]]:
+        # raw samples of every group as (group, sub-key labels, sub-key code of each sample, values), see sample_table
         raise NotImplementedError
 
     def stats_to_consider(self) -> list[tuple[str, callable]]:
@@ -1,7 +1,8 @@
 # Taken from https://towardsdatascience.com/make-your-tables-look-glorious-2a5ddbfcc0e5
 import pandas as pd
-import dataframe_image as dfi
 from matplotlib import pyplot as plt, image as mpimg
+from matplotlib.font_manager import FontProperties
+from matplotlib.patches import Rectangle
 
 
 def highlight_product(series, colour ='yellow'):
@@ -20,7 +21,18 @@ def format_value(value):
         return f"{value:.3f}"  # Two decimal places for floats
 
 
-def export_pandas_to_png(df: pd.DataFrame, filename: str, title:str, hide_index=False, border=False, alternating_row_colors=True):
+# "dataframe_image" renders the styled HTML table in a headless browser, "matplotlib" draws the table directly
+TABLE_BACKENDS = ("dataframe_image", "matplotlib")
+ALTERNATING_ROW_COLOUR = '#DDEBF7'
+
+
+def export_pandas_to_png(df: pd.DataFrame, filename: str, title:str, hide_index=False, border=False, alternating_row_colors=True,
+                         backend="dataframe_image"):
+    if backend == "matplotlib":
+        render_table_with_matplotlib(df, filename, title, hide_index, border, alternating_row_colors)
+        return
+    if backend != "dataframe_image":
+        raise ValueError(f"Unknown table backend {backend}, expected one of {TABLE_BACKENDS}")
     df.insert(0, 'index', range(len(df)))
     df.set_index('index', inplace=True, drop=True, append=True)
     d_styled = (
@@ -35,7 +47,7 @@ def export_pandas_to_png(df: pd.DataFrame, filename: str, title:str, hide_index=
         ])
     )
     if alternating_row_colors:
-        d_styled = d_styled.apply(highlight_product, colour = '#DDEBF7', axis = 1)
+        d_styled = d_styled.apply(highlight_product, colour = ALTERNATING_ROW_COLOUR, axis = 1)
     d_styled = d_styled.hide(subset=None, level=['index'] if not hide_index else None, names=not hide_index)  # hide "index" index from png output
     if border:
         d_styled = (
@@ -43,6 +55,8 @@ def export_pandas_to_png(df: pd.DataFrame, filename: str, title:str, hide_index=
                     .apply(lambda x: add_horizontal_borders(df), axis=None)  # Apply horizontal borders
                     # .apply(lambda x: add_vertical_borders(df), axis=None)
         )
+    # dataframe_image starts a headless browser and pulls in nbconvert, only import it for this backend
+    import dataframe_image as dfi
     dfi.export(
         d_styled,
         filename,
@@ -61,6 +75,66 @@ def add_title_to_existing_file(filename, title):
     plt.close()
 
 
+def render_table_with_matplotlib(df: pd.DataFrame, filename: str, title: str, hide_index=False, border=False,
+                                 alternating_row_colors=True):
+    # Same look as the dataframe_image output (formatting, alignment, row colours, group borders) and the title,
+    # laid out and drawn in a single matplotlib figure
+    index_levels = [] if hide_index else list(range(df.index.nlevels))
+    header = [str(df.index.names[level] or '') for level in index_levels] + [str(column) for column in df.columns]
+    index_values = [index if isinstance(index, tuple) else (index,) for index in df.index]
+    body = []
+    for row_number, (index, values) in enumerate(zip(index_values, df.itertuples(index=False))):
+        previous = index_values[row_number - 1] if row_number > 0 else None
+        # sparsify repeated index values like the HTML output does
+        index_cells = ['' if previous is not None and previous[:level + 1] == index[:level + 1] else format_value(index[level])
+                       for level in index_levels]
+        body.append(index_cells + [format_value(value) for value in values])
+    group_starts = {row_number for row_number in range(1, len(index_values))
+                    if index_values[row_number][0] != index_values[row_number - 1][0]}
+    left_aligned_columns = len(index_levels) + 1  # index columns and the first data column
+
+    font_size, padding, row_height, dpi = 10, 8, 22, 100
+    fig = plt.figure(dpi=dpi)
+    renderer = fig.canvas.get_renderer()
+    header_font = FontProperties(size=font_size, weight='bold')
+    body_font = FontProperties(size=font_size)
+    column_widths = []
+    for column in range(len(header)):
+        widths = [renderer.get_text_width_height_descent(header[column], header_font, ismath=False)[0]]
+        widths += [renderer.get_text_width_height_descent(row[column], body_font, ismath=False)[0] for row in body]
+        column_widths.append(max(widths) + 2 * padding)
+    title_height = 36
+    width = sum(column_widths)
+    height = title_height + row_height * (len(body) + 1)
+    fig.set_size_inches(width / dpi, height / dpi)
+
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_xlim(0, width)
+    ax.set_ylim(height, 0)
+    ax.axis('off')
+    ax.text(width / 2, title_height / 2, title, fontsize=14, ha='center', va='center')
+
+    for row_number, cells in enumerate([header] + body):
+        top = title_height + row_number * row_height
+        body_row = row_number - 1
+        if row_number > 0 and alternating_row_colors and body_row % 2 == 0:
+            ax.add_patch(Rectangle((0, top), width, row_height, facecolor=ALTERNATING_ROW_COLOUR, edgecolor='none'))
+        if row_number > 0 and border and body_row in group_starts:
+            ax.plot([0, width], [top, top], color='black', linewidth=2)
+        x = 0
+        for column, text in enumerate(cells):
+            left_aligned = column < left_aligned_columns
+            ax.text(x + padding if left_aligned else x + column_widths[column] - padding, top + row_height / 2, text,
+                    fontproperties=header_font if row_number == 0 else body_font,
+                    ha='left' if left_aligned else 'right', va='center')
+            x += column_widths[column]
+    header_bottom = title_height + row_height
+    ax.plot([0, width], [header_bottom, header_bottom], color='black', linewidth=1)
+
+    fig.savefig(filename, transparent=True, bbox_inches='tight', pad_inches=0.05)
+    plt.close(fig)
+
+
 def add_horizontal_borders_for_index(styler):
     styler.applymap_index(lambda v: 'border-top: 2px solid black;', level=0, axis=0)
     return styler
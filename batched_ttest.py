@@ -0,0 +1,89 @@
+from __future__ import annotations
+from typing import Callable
+
+import numpy as np
+
+from stats import p_value_not_equal, p_value_greater, p_value_less
+
+# p-value stat function -> alternative hypothesis of the t-test it runs (current group vs comparison group)
+P_VALUE_ALTERNATIVES: dict[Callable, str] = {
+    p_value_not_equal: 'two-sided',
+    p_value_greater: 'greater',
+    p_value_less: 'less',
+}
+
+
+def register_p_value_stat(stat_function: Callable, alternative: str):
+    P_VALUE_ALTERNATIVES[stat_function] = alternative
+
+
+def p_values_from_moments(mean1, std1, count1, mean2, std2, count2, alternative='two-sided'):
+    # Student's t-test (equal variances, same as scipy.stats.ttest_ind) from the moments of both samples.
+    # Every argument may be an array, in which case all comparisons are done in one call. Same computation as
+    # scipy.stats.ttest_ind_from_stats, but only needs scipy.special, which imports several times faster.
+    from scipy.special import stdtr
+    mean1, std1, count1, mean2, std2, count2 = (np.asarray(argument, dtype=np.float64) for argument in
+                                                (mean1, std1, count1, mean2, std2, count2))
+    # the pooled variance is still defined when a sample has a single observation
+    variance1 = np.where(count1 == 1, 0., std1 ** 2)
+    variance2 = np.where(count2 == 1, 0., std2 ** 2)
+    degrees_of_freedom = count1 + count2 - 2.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled_variance = ((count1 - 1) * variance1 + (count2 - 1) * variance2) / degrees_of_freedom
+        t = (mean1 - mean2) / np.sqrt(pooled_variance * (1.0 / count1 + 1.0 / count2))
+    if alternative == 'less':
+        p_value = stdtr(degrees_of_freedom, t)
+    elif alternative == 'greater':
+        p_value = stdtr(degrees_of_freedom, -t)
+    elif alternative == 'two-sided':
+        p_value = 2 * stdtr(degrees_of_freedom, -np.abs(t))
+    else:
+        raise ValueError("`alternative` must be 'less', 'greater', or 'two-sided'.")
+    return p_value[()]
+
+
+def moments(stat_recap) -> tuple[float, float, int] | None:
+    if stat_recap.summary is not None:
+        return stat_recap.summary['mean'], stat_recap.summary['stdev'], stat_recap.summary['count']
+    values = stat_recap.array_of_values
+    if all(hasattr(values, attribute) for attribute in ('average', 'stdev', 'count')):
+        # pre-aggregated samples, e.g. gpu_utilization_extractor.GpuUtilSummary
+        return values.average, values.stdev, values.count
+    return None
+
+
+class PValueBatch:
+    # Collects the p-value stats of many StatsRecap (all groups of all services) and computes them together:
+    # one vectorized t-test per alternative, with the moments of every group computed only once.
+    def __init__(self):
+        self.pending = []
+
+    def add(self, stat_recap, stat_name: str, stat_function: Callable, comparison_recap):
+        stat_recap.stats_calculation_result[stat_name] = None  # reserve the position of the result
+        self.pending.append((stat_recap, stat_name, stat_function, comparison_recap))
+
+    def compute(self):
+        moments_cache = {}
+
+        def cached_moments(stat_recap):
+            if id(stat_recap) not in moments_cache:
+                moments_cache[id(stat_recap)] = moments(stat_recap)
+            return moments_cache[id(stat_recap)]
+
+        batches: dict[str, list] = {}
+        for stat_recap, stat_name, stat_function, comparison_recap in self.pending:
+            current_moments = cached_moments(stat_recap)
+            comparison_moments = cached_moments(comparison_recap)
+            if current_moments is None or comparison_moments is None:
+                stat_recap.stats_calculation_result[stat_name] = stat_function(
+                    stat_recap.array_of_values, additional_argument=comparison_recap.array_of_values)
+                continue
+            alternative = P_VALUE_ALTERNATIVES[stat_function]
+            batches.setdefault(alternative, []).append((stat_recap, stat_name, current_moments + comparison_moments))
+
+        for alternative, entries in batches.items():
+            columns = np.array([entry_moments for _, _, entry_moments in entries], dtype=np.float64).T
+            p_values = np.atleast_1d(p_values_from_moments(*columns, alternative=alternative))
+            for (stat_recap, stat_name, _), p_value in zip(entries, p_values):
+                stat_recap.stats_calculation_result[stat_name] = p_value
+        self.pending = []
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark of the extractors on the archives inside ./data.
+
+Compares the scanners in benchmark_scanner against the previous str-based implementation of each extractor
+(kept below as legacy_*), and prints the throughput of both. Usage: python benchmark_extractors.py [repeat]
+"""
+import re
+import sys
+import timeit
+from glob import glob
+
+import benchmark_scanner
+from more_format_reader import MoreFormatArchive
+
+
+class RecordCounter:
+    def __init__(self):
+        self.records = 0
+
+    def add_step(self, *_):
+        self.records += 1
+
+    def add_batch_result(self, model, batch_size, values):
+        self.records += len(values)
+
+    def add_samples(self, values):
+        self.records += len(values)
+
+
+def legacy_glmark2(content: str):
+    results = {}
+    informations = list(re.finditer(
+        "\\[([a-zA-Z0-9]+)\\] (.+?): FPS: (\\d+) FrameTime: ([0-9.]+) ms", content))
+    for info in informations:
+        step_category = info.group(1)
+        step_name = info.group(2)
+        results[f"{step_category}-{step_name}"] = (step_category, int(info.group(3)), float(info.group(4)))
+    return results
+
+
+def legacy_pytorch(content: str):
+    results = {}
+    separator_beginning = list(re.finditer(r"Device: ([a-zA-Z0-9]+) - Batch Size: (\d+) - Model: ([a-zA-Z0-9\-_]+):", content))
+    separator_ending = list(re.finditer(r"Average: ([.0-9]+) batches/sec", content))
+    for beginning, ending in zip(separator_beginning, separator_ending):
+        substring = content[beginning.end(0):ending.start(0)]
+        results[(beginning.group(3), int(beginning.group(2)))] = list(map(float, substring.split()))
+    return results
+
+
+def legacy_namd(content: str):
+    temp = list(re.finditer(r"ATPase Simulation - (\d|,)+ Atoms:", content))[0]
+    content2 = content[temp.end(0):]
+    extracted_content = re.split(r"Average:", content2)[0]
+    return list(map(float, extracted_content.strip().split()))
+
+
+EXTRACTORS = {
+    # name: (section name filter, legacy implementation, scanner)
+    'Glmark2': (lambda name: name.startswith('glmark2_benchmark_result_'), legacy_glmark2, benchmark_scanner.scan_glmark2),
+    'PyTorch': (lambda name: name == 'pytorch_benchmark_result.txt', legacy_pytorch, benchmark_scanner.scan_pytorch),
+    'NAMD': (lambda name: name.startswith('namd_benchmark_result'), legacy_namd, benchmark_scanner.scan_namd),
+}
+
+
+def collect_sections(file_paths: list[str]) -> dict[str, list[bytes]]:
+    ret = {name: [] for name in EXTRACTORS}
+    for file_path in file_paths:
+        with MoreFormatArchive(file_path) as archive:
+            for section_name, content in archive.sections():
+                for extractor_name, (accepts, _, _) in EXTRACTORS.items():
+                    if accepts(section_name):
+                        ret[extractor_name].append(bytes(content))
+    return ret
+
+
+def run(repeat=20):
+    sections = collect_sections(sorted(glob("./data/*")))
+    print(f"{'extractor':<10}{'sections':>10}{'MB':>8}{'legacy MB/s':>14}{'scanner MB/s':>14}{'speedup':>10}")
+    for extractor_name, (_, legacy, scanner) in EXTRACTORS.items():
+        as_bytes = sections[extractor_name]
+        if not as_bytes:
+            continue
+        as_str = [content.decode() for content in as_bytes]
+        megabytes = sum(map(len, as_bytes)) / 1e6
+
+        legacy_time = min(timeit.repeat(lambda: [legacy(content) for content in as_str], number=1, repeat=repeat))
+        scanner_time = min(timeit.repeat(lambda: [scanner(content, RecordCounter()) for content in as_bytes],
+                                         number=1, repeat=repeat))
+        print(f"{extractor_name:<10}{len(as_bytes):>10}{megabytes:>8.2f}{megabytes / legacy_time:>14.1f}"
+              f"{megabytes / scanner_time:>14.1f}{legacy_time / scanner_time:>9.2f}x")
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:]))
@@ -0,0 +1,145 @@
+"""
+Benchmark of the stages of main.main (parse, stats, LaTeX, charts, tables) on archives of increasing size, generated
+by synthetic_archives, plus the real archives inside ./data.
+
+Every run also checks latex_command.tex against the digests in benchmark_goldens.json, so an optimisation that
+changes the published numbers fails the suite. Usage:
+    python benchmark_pipeline.py [size ...] [--repeat N] [--no-graphics] [--update-goldens]
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import main
+from aesthetic_pandas_export import export_pandas_to_png
+from service_parser import glmark2_resolutions
+from synthetic_archives import UNRECAPPED_GLMARK2_RESOLUTIONS, ArchiveShape, generate_dataset
+from utils import convert_to_openstack_name
+
+GOLDENS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_goldens.json")
+# size name -> (services, scale of ArchiveShape); None is the real ./data
+SIZES = {
+    'real': None,
+    'small': (5, 1),
+    'medium': (5, 4),
+    'large': (5, 16),
+    'wide': (20, 1),
+}
+STAGES = ['parse', 'stats', 'latex', 'charts', 'tables']
+
+
+def dataset(size: str, folder: str) -> dict[str, str]:
+    if SIZES[size] is None:
+        return main.get_file_path_dict([os.path.abspath(path) for path in main.get_file_list()])
+    services, scale = SIZES[size]
+    return main.get_file_path_dict(sorted(generate_dataset(folder, services, ArchiveShape().scaled(scale))))
+
+
+def run_stages(files: dict[str, str], graphics=True) -> tuple[dict[str, float], str]:
+    # Seconds per stage, and the sha256 of the latex_command.tex. Runs inside the current directory.
+    timings = {}
+    start = time.perf_counter()
+    parsed_services = main.parse_archives(files, cache=None)
+    timings['parse'] = time.perf_counter() - start
+    check_filtered_sections(parsed_services)
+
+    start = time.perf_counter()
+    openstack_services, stats_store = main.calculate_stats(parsed_services)
+    timings['stats'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    main.write_latex_variables(stats_store, "latex_command.tex")
+    timings['latex'] = time.perf_counter() - start
+    with open("latex_command.tex", "rb") as f:
+        latex_digest = hashlib.sha256(f.read()).hexdigest()
+
+    # the graphics put one column per kind of service, so they need every kind exactly once
+    kinds = [convert_to_openstack_name(name) for name in files]
+    if graphics and len(set(kinds)) == len(kinds):
+        update_charts = main.create_graphics_updater(openstack_services, stats_store, use_graphics_cache=False)
+        jobs = update_charts.collect_render_jobs()
+        for stage, selected in (('charts', lambda job: job.render is not export_pandas_to_png),
+                                ('tables', lambda job: job.render is export_pandas_to_png)):
+            start = time.perf_counter()
+            update_charts.render([job for job in jobs if selected(job)])
+            timings[stage] = time.perf_counter() - start
+    return timings, latex_digest
+
+
+def check_filtered_sections(parsed_services):
+    # the Glmark2 resolutions outside of service_parser.glmark2_resolutions are reported, not parsed
+    for name, parsed in parsed_services.items():
+        unexpected = set(parsed.glmark2_processor.resolutions) - set(glmark2_resolutions)
+        assert not unexpected, f"{name}: resolutions {sorted(unexpected)} should have been filtered out"
+        if 'synthetic' in name:
+            for resolution in UNRECAPPED_GLMARK2_RESOLUTIONS:
+                assert parsed.section_report.skipped[f"glmark2_benchmark_result_{resolution}.txt"] == 1, \
+                    f"{name}: the Glmark2 resolution {resolution} was not reported as filtered out"
+
+
+def load_goldens() -> dict[str, str]:
+    if not os.path.isfile(GOLDENS_FILE):
+        return {}
+    with open(GOLDENS_FILE) as f:
+        return json.load(f)
+
+
+def run(sizes: list[str], repeat=1, graphics=True, update_goldens=False) -> bool:
+    goldens = load_goldens()
+    ok = True
+    print(f"{'size':<8}{'services':>9}{'MB':>8}" + "".join(f"{stage + ' s':>10}" for stage in STAGES) + "  latex")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            files = dataset(size, os.path.join(folder, "data"))
+            megabytes = sum(os.path.getsize(path) for path in files.values()) / 1e6
+            working_directory = os.getcwd()
+            os.chdir(folder)
+            try:
+                best: dict[str, float] = {}
+                digests = set()
+                for _ in range(repeat):
+                    timings, latex_digest = run_stages(files, graphics)
+                    digests.add(latex_digest)
+                    for stage, seconds in timings.items():
+                        best[stage] = min(seconds, best.get(stage, seconds))
+            finally:
+                os.chdir(working_directory)
+
+        latex_digest = digests.pop()
+        if update_goldens:
+            goldens[size] = latex_digest
+            verdict = "updated"
+        elif size not in goldens:
+            verdict = "no golden"
+        elif digests or goldens[size] != latex_digest:
+            verdict = "MISMATCH"
+            ok = False
+        else:
+            verdict = "ok"
+        print(f"{size:<8}{len(files):>9}{megabytes:>8.2f}"
+              + "".join(f"{best[stage]:>10.3f}" if stage in best else f"{'-':>10}" for stage in STAGES)
+              + f"  {verdict}")
+
+    if update_goldens:
+        with open(GOLDENS_FILE, "w") as f:
+            json.dump(goldens, f, indent=1, sort_keys=True)
+    return ok
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    repeat = 1
+    if "--repeat" in arguments:
+        index = arguments.index("--repeat")
+        repeat = int(arguments[index + 1])
+        del arguments[index:index + 2]
+    flags = {argument for argument in arguments if argument.startswith("--")}
+    sizes = [argument for argument in arguments if not argument.startswith("--")] or list(SIZES)
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        sys.exit(f"Unknown sizes {unknown}, choose from {list(SIZES)}")
+    sys.exit(0 if run(sizes, repeat, "--no-graphics" not in flags, "--update-goldens" in flags) else 1)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import re
+from typing import Protocol
+
+from more_format_reader import as_buffer
+
+# All patterns work on bytes, so they can run directly on the memoryview sections of an archive
+GLMARK2_STEP = re.compile(rb"\[([a-zA-Z0-9]+)\] (.+?): FPS: (\d+) FrameTime: ([0-9.]+) ms")
+PYTORCH_BLOCK_BEGINNING = re.compile(rb"Device: ([a-zA-Z0-9]+) - Batch Size: (\d+) - Model: ([a-zA-Z0-9\-_]+):")
+PYTORCH_BLOCK_ENDING = re.compile(rb"Average: [.0-9]+ batches/sec")
+NAMD_HEADER = re.compile(rb"ATPase Simulation - (\d|,)+ Atoms:")
+NAMD_FOOTER = re.compile(rb"Average:")
+
+
+class Glmark2Sink(Protocol):
+    def add_step(self, step_category: str, step_name: str, fps: int, frame_time: float) -> None: ...
+
+
+class PytorchSink(Protocol):
+    def add_batch_result(self, model: str, batch_size: int, values: list[float]) -> None: ...
+
+
+class NamdSink(Protocol):
+    def add_samples(self, values: list[float]) -> None: ...
+
+
+def scan_glmark2(content, sink: Glmark2Sink):
+    # [category] step name: FPS: 123 FrameTime: 1.234 ms
+    for info in GLMARK2_STEP.finditer(as_buffer(content)):
+        sink.add_step(info.group(1).decode(), info.group(2).decode(), int(info.group(3)), float(info.group(4)))
+
+
+def scan_pytorch(content, sink: PytorchSink):
+    # Device: ... - Batch Size: N - Model: NAME:
+    #     value value ...
+    #     Average: X batches/sec
+    content = as_buffer(content)
+    position = 0
+    while True:
+        beginning = PYTORCH_BLOCK_BEGINNING.search(content, position)
+        if beginning is None:
+            return
+        ending = PYTORCH_BLOCK_ENDING.search(content, beginning.end(0))
+        if ending is None:
+            return
+        sink.add_batch_result(beginning.group(3).decode(), int(beginning.group(2)),
+                              read_numbers(content, beginning.end(0), ending.start(0)))
+        position = ending.end(0)
+
+
+def scan_namd(content, sink: NamdSink):
+    # Samples are listed after "ATPase Simulation - 327,506 Atoms:", up to the first "Average:"
+    content = as_buffer(content)
+    header = NAMD_HEADER.search(content)
+    if header is None:
+        raise ValueError("NAMD result does not contain the ATPase Simulation header")
+    footer = NAMD_FOOTER.search(content, header.end(0))
+    end = footer.start(0) if footer is not None else len(content)
+    sink.add_samples(read_numbers(content, header.end(0), end))
+
+
+def read_numbers(content, start: int, end: int) -> list[float]:
+    # whitespace separated numbers; only this region is copied out of the archive
+    return list(map(float, bytes(content[start:end]).split()))
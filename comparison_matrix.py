@@ -0,0 +1,65 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from batched_ttest import moments, p_values_from_moments
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from stats_recap import StatRecapPerOpenStackService
+
+
+class ComparisonMatrix:
+    # Every ordered pair of services compared per (benchmark, group), instead of every service against the single
+    # comparison of main.INDEX_OF_T_TEST_COMPARISON. ratios[g, i, j] is the average of service i relative to the one
+    # of service j (> 1 when i performs better, same orientation as StatsStore.ratios) and p_values[g, i, j] the
+    # two-sided t-test of both. The ratios divide the 'Average' stat of each group, the values StatsStore.ratios and
+    # the ...AverageRatio LaTeX variables use (rounded for summarized samples); the t-tests use the moments. Both are
+    # already known after the stats stage, so the work grows with services² per group, not with the raw samples.
+    def __init__(self, services: list[str], groups: list[tuple[str, str]], ratios: np.ndarray, p_values: np.ndarray):
+        self.services = services
+        self.groups = groups  # (benchmark, group), in order of first appearance
+        self.ratios = ratios
+        self.p_values = p_values
+
+    @staticmethod
+    def from_recaps(all_openstack_service_stat_recap: list[StatRecapPerOpenStackService]) -> ComparisonMatrix:
+        services = [recap.openstack_service_name for recap in all_openstack_service_stat_recap]
+        groups: dict[tuple[str, str], int] = {}
+        higher_is_worse = []
+        for recap in all_openstack_service_stat_recap:
+            for benchmark_app, stat_per_benchmark_app in recap.as_dict().items():
+                for group in stat_per_benchmark_app.grouping_to_stats_recap_mapping:
+                    if (benchmark_app, group) not in groups:
+                        groups[(benchmark_app, group)] = len(groups)
+                        higher_is_worse.append(stat_per_benchmark_app.higher_nominals_means_worse_performance)
+
+        # mean, stdev and count of every (group, service), NaN where a service has no such group
+        group_moments = np.full((3, len(groups), len(services)), np.nan)
+        average = np.full((len(groups), len(services)), np.nan)
+        for column, recap in enumerate(all_openstack_service_stat_recap):
+            for benchmark_app, stat_per_benchmark_app in recap.as_dict().items():
+                for group, stat_recap in stat_per_benchmark_app.grouping_to_stats_recap_mapping.items():
+                    row = groups[(benchmark_app, group)]
+                    group_moments[:, row, column] = moments(stat_recap) or np.nan
+                    value = stat_recap.stats_calculation_result.get('Average')
+                    average[row, column] = np.nan if value is None else value
+
+        # rows against columns, all pairs of all groups in one broadcast
+        mean, stdev, count = group_moments
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(np.array(higher_is_worse, dtype=bool)[:, None, None],
+                              average[:, None, :] / average[:, :, None], average[:, :, None] / average[:, None, :])
+            p_values = p_values_from_moments(mean[:, :, None], stdev[:, :, None], count[:, :, None],
+                                             mean[:, None, :], stdev[:, None, :], count[:, None, :])
+        return ComparisonMatrix(services, list(groups), ratios, np.asarray(p_values))
+
+    def pair_count(self) -> int:
+        return len(self.groups) * len(self.services) * (len(self.services) - 1)
+
+    def as_dataframe(self, index: int, values='ratios', labels: list[str] = None) -> pd.DataFrame:
+        # the services x services matrix (ratios or p_values) of self.groups[index], rows compared to columns
+        import pandas as pd
+        labels = self.services if labels is None else labels
+        return pd.DataFrame(getattr(self, values)[index], index=labels, columns=labels)
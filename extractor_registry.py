@@ -0,0 +1,105 @@
+from __future__ import annotations
+import re
+from collections import Counter
+from typing import Container
+
+import profiling
+
+
+class SectionRouter:
+    # Routes the sections of an archive (file names inside the `more` output) to the processor that handles them.
+    # Processors declare the file names they handle as regexes in SECTION_PATTERNS, named groups become
+    # parameters (resolution, batch number, ...) passed to their process_section. All patterns are compiled into
+    # one matcher, and every section name is only matched once per process; afterwards routing is a dict lookup.
+    def __init__(self, parameter_filters: dict[str, Container] = None):
+        # parameter_filters: e.g. {'batch': range(0, 15)} skips sections whose batch parameter is not in the range.
+        # Numeric parameters are compared as int, the others as they appear in the section name.
+        self.parameter_filters = {name: allowed for name, allowed in (parameter_filters or {}).items()
+                                  if allowed is not None}
+        self.routes: list[tuple[str, str]] = []
+        self._matcher: re.Pattern = None
+        self._cache: dict[str, tuple[str, dict[str, str]] | None] = {}
+
+    def filters_fingerprint(self) -> str:
+        # what is filtered out decides what gets parsed, so it is part of the key of cached parses
+        return ";".join(f"{name}:{sorted(map(str, allowed))}"
+                        for name, allowed in sorted(self.parameter_filters.items()))
+
+    def register(self, slot: str, processor_class):
+        # slot: attribute of the object passed to dispatch that holds the processor instance
+        for pattern in processor_class.SECTION_PATTERNS:
+            self.routes.append((slot, pattern))
+        self._matcher = None
+        self._cache = {}
+        return self
+
+    def compile(self):
+        alternatives = []
+        for index, (_, pattern) in enumerate(self.routes):
+            # group names must be unique across the whole matcher
+            pattern = re.sub(r"\(\?P<(\w+)>", rf"(?P<r{index}_\1>", pattern)
+            alternatives.append(f"(?P<r{index}>{pattern})")
+        self._matcher = re.compile("|".join(alternatives))
+        return self
+
+    def route(self, section_name: str) -> tuple[str, dict[str, str]] | None:
+        if section_name in self._cache:
+            return self._cache[section_name]
+        if self._matcher is None:
+            self.compile()
+        ret = None
+        match = self._matcher.fullmatch(section_name)
+        if match is not None:
+            index = next(index for index in range(len(self.routes)) if match.group(f"r{index}") is not None)
+            prefix = f"r{index}_"
+            parameters = {name[len(prefix):]: value for name, value in match.groupdict().items()
+                          if name.startswith(prefix) and value is not None}
+            ret = (self.routes[index][0], parameters)
+        self._cache[section_name] = ret
+        return ret
+
+    def is_filtered_out(self, parameters: dict[str, str]) -> bool:
+        for name, allowed in self.parameter_filters.items():
+            if name in parameters and parameter_value(parameters[name]) not in allowed:
+                return True
+        return False
+
+    def dispatch(self, target, section_name: str, content, report: SectionReport):
+        route = self.route(section_name)
+        if route is None:
+            report.unknown[section_name] += 1
+            return
+        slot, parameters = route
+        if self.is_filtered_out(parameters):
+            report.skipped[section_name] += 1
+            return
+        report.routed[slot] += 1
+        with profiling.stage(slot, sections=1):
+            getattr(target, slot).process_section(section_name, parameters, content)
+
+
+def parameter_value(value: str) -> int | str:
+    return int(value) if value.isdigit() else value
+
+
+class SectionReport:
+    def __init__(self):
+        self.routed = Counter()
+        self.unknown = Counter()
+        self.skipped = Counter()
+
+    def __iadd__(self, other: SectionReport):
+        self.routed += other.routed
+        self.unknown += other.unknown
+        self.skipped += other.skipped
+        return self
+
+    def summary(self) -> list[str]:
+        ret = []
+        if self.unknown:
+            ret.append("Unknown sections (ignored): " + ", ".join(
+                f"{name} x{count}" for name, count in sorted(self.unknown.items())))
+        if self.skipped:
+            ret.append("Sections filtered out: " + ", ".join(
+                f"{name} x{count}" for name, count in sorted(self.skipped.items())))
+        return ret
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import copy
+import hashlib
+from collections import Counter
+
+
+# In-memory stand-ins for the googleapiclient Slides and Drive services. They follow the
+# service.resource().method(...).execute() shape and count every executed call in `api_calls`.
+class FakeRequest:
+    def __init__(self, api_calls: Counter, name: str, handler, *args):
+        self.api_calls = api_calls
+        self.name = name
+        self.handler = handler
+        self.args = args
+
+    def execute(self):
+        self.api_calls[self.name] += 1
+        return self.handler(*self.args)
+
+
+class FakeSlidesService:
+    def __init__(self, presentation_id: str, slide_object_ids=("p",)):
+        self.api_calls = Counter()
+        self.request_kinds = Counter()
+        self.presentations_by_id = {presentation_id: {
+            'presentationId': presentation_id,
+            'slides': [{'objectId': object_id, 'pageElements': []} for object_id in slide_object_ids],
+        }}
+
+    def presentations(self):
+        return self
+
+    def get(self, presentationId):
+        return FakeRequest(self.api_calls, "presentations.get",
+                           lambda: copy.deepcopy(self.presentations_by_id[presentationId]))
+
+    def batchUpdate(self, presentationId, body):
+        return FakeRequest(self.api_calls, "presentations.batchUpdate", self._batch_update, presentationId, body)
+
+    def elements(self, presentation_id: str) -> dict[str, dict]:
+        return {element['objectId']: element
+                for slide in self.presentations_by_id[presentation_id]['slides']
+                for element in slide['pageElements']}
+
+    def _batch_update(self, presentation_id, body):
+        # all or nothing, like the real API
+        presentation = copy.deepcopy(self.presentations_by_id[presentation_id])
+        replies = []
+        for request in body['requests']:
+            (kind, arguments), = request.items()
+            self.request_kinds[kind] += 1
+            replies.append(getattr(self, f"_{kind}")(presentation, arguments) or {})
+        self.presentations_by_id[presentation_id] = presentation
+        return {'presentationId': presentation_id, 'replies': replies}
+
+    @staticmethod
+    def _element(presentation, object_id):
+        for slide in presentation['slides']:
+            for element in slide['pageElements']:
+                if element['objectId'] == object_id:
+                    return element
+        raise ValueError(f"The object ({object_id}) could not be found.")
+
+    def _createImage(self, presentation, arguments):
+        object_id = arguments.get('objectId', f"generated_{sum(self.request_kinds.values())}")
+        if any(element['objectId'] == object_id for slide in presentation['slides']
+               for element in slide['pageElements']):
+            raise ValueError(f"The object ID ({object_id}) should be unique among all pages and page elements.")
+        page_object_id = arguments['elementProperties']['pageObjectId']
+        slide = next((slide for slide in presentation['slides'] if slide['objectId'] == page_object_id), None)
+        if slide is None:
+            raise ValueError(f"The page ({page_object_id}) could not be found.")
+        slide['pageElements'].append({'objectId': object_id, 'image': {'contentUrl': arguments['url']}})
+        return {'createImage': {'objectId': object_id}}
+
+    def _replaceImage(self, presentation, arguments):
+        element = self._element(presentation, arguments['imageObjectId'])
+        element['image'] = {'contentUrl': arguments['url']}
+
+    def _updatePageElementAltText(self, presentation, arguments):
+        element = self._element(presentation, arguments['objectId'])
+        for key in ('title', 'description'):
+            if key in arguments:
+                element[key] = arguments[key]
+
+
+class FakeDriveService:
+    def __init__(self, public_folder_ids=()):
+        self.api_calls = Counter()
+        self.public_folder_ids = set(public_folder_ids)
+        self.files_by_id: dict[str, dict] = {}
+        self.contents: dict[str, bytes] = {}
+        self.next_id = 0
+
+    def files(self):
+        return FakeDriveFiles(self)
+
+    def permissions(self):
+        return FakeDrivePermissions(self)
+
+    def new_file_id(self) -> str:
+        self.next_id += 1
+        return f"file{self.next_id}"
+
+
+class FakeDriveFiles:
+    def __init__(self, drive: FakeDriveService):
+        self.drive = drive
+
+    def list(self, q=None, spaces='drive', fields=None, pageSize=100, pageToken=None, **kwargs):
+        return FakeRequest(self.drive.api_calls, "files.list", self._list, q, pageSize, pageToken)
+
+    def create(self, body, media_body=None, fields=None):
+        return FakeRequest(self.drive.api_calls, "files.create", self._create, body, media_body)
+
+    def update(self, fileId, body=None, media_body=None, fields=None):
+        return FakeRequest(self.drive.api_calls, "files.update", self._update, fileId, body, media_body)
+
+    def delete(self, fileId):
+        return FakeRequest(self.drive.api_calls, "files.delete", self._delete, fileId)
+
+    def _list(self, query, page_size, page_token):
+        # only understands the name = '...' and '<folder>' in parents conditions of the queries we send
+        conditions = [condition.strip() for condition in (query or "").split(" and ")]
+        ret = []
+        for file in self.drive.files_by_id.values():
+            matches = True
+            for condition in conditions:
+                if condition.startswith("name = "):
+                    matches &= file['name'] == condition[len("name = "):].strip("'")
+                elif condition.endswith(" in parents"):
+                    matches &= condition[:-len(" in parents")].strip("'") in file['parents']
+            if matches:
+                ret.append(dict(file))
+        start = int(page_token or 0)
+        response = {'files': ret[start:start + page_size]}
+        if start + page_size < len(ret):
+            response['nextPageToken'] = str(start + page_size)
+        return response
+
+    def _create(self, body, media_body):
+        file_id = self.drive.new_file_id()
+        self.drive.files_by_id[file_id] = {
+            'id': file_id, 'name': body['name'], 'parents': list(body.get('parents', [])),
+            'webContentLink': f"https://drive.google.com/uc?id={file_id}&export=download",
+        }
+        self._store(file_id, media_body)
+        return dict(self.drive.files_by_id[file_id])
+
+    def _update(self, file_id, body, media_body):
+        if file_id not in self.drive.files_by_id:
+            raise ValueError(f"File not found: {file_id}")
+        self.drive.files_by_id[file_id].update(body or {})
+        if media_body is not None:
+            self._store(file_id, media_body)
+        return dict(self.drive.files_by_id[file_id])
+
+    def _store(self, file_id, media_body):
+        self.drive.contents[file_id] = read_media(media_body)
+        self.drive.files_by_id[file_id]['md5Checksum'] = hashlib.md5(self.drive.contents[file_id]).hexdigest()
+
+    def _delete(self, file_id):
+        del self.drive.files_by_id[file_id]
+        del self.drive.contents[file_id]
+        return ""
+
+
+class FakeDrivePermissions:
+    def __init__(self, drive: FakeDriveService):
+        self.drive = drive
+
+    def list(self, fileId, fields=None):
+        return FakeRequest(self.drive.api_calls, "permissions.list", lambda: {'permissions': [
+            {'id': 'anyoneWithLink', 'type': 'anyone', 'role': 'reader'}] if fileId in self.drive.public_folder_ids
+            else []})
+
+
+def read_media(media_body) -> bytes:
+    # googleapiclient.http.MediaFileUpload (or None)
+    if media_body is None:
+        return b""
+    return media_body.getbytes(0, media_body.size())
@@ -0,0 +1,127 @@
+from __future__ import annotations
+from collections import Counter
+
+
+# In-memory stand-in for the parts of gspread used by the exports. Every API round trip is counted in
+# `api_calls`, so an export can be checked for the number of requests it makes without touching Google.
+class FakeClient:
+    def __init__(self):
+        self.spreadsheets: dict[str, FakeSpreadsheet] = {}
+
+    def open_by_url(self, url: str) -> FakeSpreadsheet:
+        if url not in self.spreadsheets:
+            self.spreadsheets[url] = FakeSpreadsheet()
+        return self.spreadsheets[url]
+
+
+class FakeWorksheet:
+    def __init__(self, sheet_id: int, title: str, rows=1000, cols=26):
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells: dict[tuple[int, int], dict] = {}
+        self.merges: list[tuple[int, int, int, int]] = []  # start row, end row, start column, end column
+
+    def get_all_values(self) -> list[list]:
+        if not self.cells:
+            return []
+        rows = max(row for row, _ in self.cells) + 1
+        cols = max(column for _, column in self.cells) + 1
+        return [[next(iter(self.cells[(row, column)].values()), "") if (row, column) in self.cells else ""
+                 for column in range(cols)] for row in range(rows)]
+
+
+class FakeSpreadsheet:
+    def __init__(self, titles=("Sheet1",)):
+        self.sheets = [FakeWorksheet(index, title) for index, title in enumerate(titles)]
+        self.api_calls = Counter()
+        self.request_kinds = Counter()
+
+    def worksheets(self) -> list[FakeWorksheet]:
+        self.api_calls["fetch_sheet_metadata"] += 1
+        return list(self.sheets)
+
+    def worksheet_by_title(self, title: str) -> FakeWorksheet:
+        return next(worksheet for worksheet in self.sheets if worksheet.title == title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> FakeWorksheet:
+        self.api_calls["batch_update"] += 1
+        return self._add_sheet({"title": title, "gridProperties": {"rowCount": rows, "columnCount": cols}})
+
+    def batch_update(self, body: dict) -> dict:
+        self.api_calls["batch_update"] += 1
+        replies = []
+        for request in body["requests"]:
+            (kind, arguments), = request.items()
+            self.request_kinds[kind] += 1
+            replies.append(getattr(self, f"_{kind}")(arguments) or {})
+        return {"replies": replies}
+
+    def _sheet(self, sheet_id: int) -> FakeWorksheet:
+        for worksheet in self.sheets:
+            if worksheet.id == sheet_id:
+                return worksheet
+        raise ValueError(f"No grid with id: {sheet_id}")
+
+    def _add_sheet(self, properties: dict) -> FakeWorksheet:
+        if any(worksheet.title == properties["title"] for worksheet in self.sheets):
+            raise ValueError(f"A sheet with the name \"{properties['title']}\" already exists")
+        sheet_id = properties.get("sheetId", max([worksheet.id for worksheet in self.sheets], default=-1) + 1)
+        if any(worksheet.id == sheet_id for worksheet in self.sheets):
+            raise ValueError(f"A sheet with the id {sheet_id} already exists")
+        grid = properties.get("gridProperties", {})
+        worksheet = FakeWorksheet(sheet_id, properties["title"], grid.get("rowCount", 1000),
+                                  grid.get("columnCount", 26))
+        self.sheets.append(worksheet)
+        return worksheet
+
+    def _addSheet(self, arguments):
+        worksheet = self._add_sheet(arguments["properties"])
+        return {"addSheet": {"properties": {"sheetId": worksheet.id, "title": worksheet.title}}}
+
+    def _updateSheetProperties(self, arguments):
+        worksheet = self._sheet(arguments["properties"]["sheetId"])
+        grid = arguments["properties"].get("gridProperties", {})
+        worksheet.row_count = grid.get("rowCount", worksheet.row_count)
+        worksheet.col_count = grid.get("columnCount", worksheet.col_count)
+
+    def _grid_range(self, grid_range: dict) -> tuple[FakeWorksheet, int, int, int, int]:
+        worksheet = self._sheet(grid_range["sheetId"])
+        bounds = (grid_range.get("startRowIndex", 0), grid_range.get("endRowIndex", worksheet.row_count),
+                  grid_range.get("startColumnIndex", 0), grid_range.get("endColumnIndex", worksheet.col_count))
+        if bounds[1] > worksheet.row_count or bounds[3] > worksheet.col_count:
+            raise ValueError(f"Range {bounds} exceeds grid limits of {worksheet.title}")
+        return (worksheet, *bounds)
+
+    def _unmergeCells(self, arguments):
+        worksheet, start_row, end_row, start_column, end_column = self._grid_range(arguments["range"])
+        worksheet.merges = [merge for merge in worksheet.merges
+                            if not (start_row <= merge[0] and merge[1] <= end_row
+                                    and start_column <= merge[2] and merge[3] <= end_column)]
+
+    def _mergeCells(self, arguments):
+        worksheet, *merge = self._grid_range(arguments["range"])
+        for other in worksheet.merges:
+            if merge[0] < other[1] and other[0] < merge[1] and merge[2] < other[3] and other[2] < merge[3]:
+                raise ValueError(f"Merge {merge} overlaps existing merge {other} in {worksheet.title}")
+        worksheet.merges.append(tuple(merge))
+
+    def _updateCells(self, arguments):
+        if "range" in arguments:
+            worksheet, start_row, end_row, start_column, end_column = self._grid_range(arguments["range"])
+            for row, column in list(worksheet.cells):
+                if start_row <= row < end_row and start_column <= column < end_column:
+                    del worksheet.cells[(row, column)]
+            return
+        start = arguments["start"]
+        worksheet = self._sheet(start["sheetId"])
+        for row_offset, row in enumerate(arguments.get("rows", [])):
+            for column_offset, cell in enumerate(row.get("values", [])):
+                position = (start.get("rowIndex", 0) + row_offset, start.get("columnIndex", 0) + column_offset)
+                if position[0] >= worksheet.row_count or position[1] >= worksheet.col_count:
+                    raise ValueError(f"Cell {position} exceeds grid limits of {worksheet.title}")
+                if "userEnteredValue" in cell:
+                    worksheet.cells[position] = cell["userEnteredValue"]
+                else:
+                    worksheet.cells.pop(position, None)
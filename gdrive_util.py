@@ -1,53 +1,116 @@
+import hashlib
 import io
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
+
+from request_scheduler import scheduler
 
 # Define the Google Drive API scopes and service account file path
 SCOPES = ['https://www.googleapis.com/auth/drive']
 SERVICE_ACCOUNT_FILE = "./key/key.json"
 
-# Create credentials using the service account file
-credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+# Google Drive service, built on first use so the module can be imported (and given a fake service) without a key.
+# The Google client libraries are only imported then as well.
+service = None
+
+
+def get_service():
+    global service
+    if service is None:
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+        # Create credentials using the service account file
+        credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        # the discovery document shipped with googleapiclient, instead of fetching it over the network
+        service = build('drive', 'v3', credentials=credentials, static_discovery=True, cache_discovery=False)
+    return service
 
-# Build the Google Drive service
-service = build('drive', 'v3', credentials=credentials)
 
-def upload_file(folder_id, source_file_path, gdrive_new_file_name, mimetype="image/png", overwrite=False):
+def upload_file(folder_id, source_file_path, gdrive_new_file_name, mimetype="image/png", overwrite=False,
+                drive_service=None):
+    drive_service = drive_service or get_service()
     file_metadata = {
         'name': gdrive_new_file_name,
         'parents': [folder_id]  # ID of the folder you want to upload to
     }
+    from googleapiclient.http import MediaFileUpload
     media = MediaFileUpload(source_file_path, mimetype=mimetype)
     ret = {'deleted-existing-file': None}
 
     if overwrite:
         query = f"name = '{gdrive_new_file_name}' and '{folder_id}' in parents and trashed = false"
-        response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+        response = scheduler.execute("drive", drive_service.files().list(q=query, spaces='drive', fields='files(id, name)'))
         files = response.get('files', [])
 
         # If the file exists, delete it
         if files:
             file_id = files[0].get('id')
-            service.files().delete(fileId=file_id).execute()
+            scheduler.execute("drive", drive_service.files().delete(fileId=file_id))
             ret['deleted-existing-file'] = file_id
 
-    file = service.files().create(
+    file = scheduler.execute("drive", drive_service.files().create(
         body=file_metadata,
         media_body=media,
         fields='id, webContentLink'
-    ).execute()
+    ))
     return ret | file
 
 
-def is_folder_accessible(folder_id):
+def list_folder_files(folder_id, drive_service=None) -> dict[str, dict]:
+    # name -> {id, name, md5Checksum, webContentLink} of every file in the folder, all pages
+    drive_service = drive_service or get_service()
+    ret = {}
+    page_token = None
+    while True:
+        response = scheduler.execute("drive", drive_service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false", spaces='drive', pageSize=1000, pageToken=page_token,
+            fields='nextPageToken, files(id, name, md5Checksum, webContentLink)'))
+        for file in response.get('files', []):
+            ret.setdefault(file['name'], file)
+        page_token = response.get('nextPageToken')
+        if page_token is None:
+            return ret
+
+
+def md5_of_file(file_path):
+    digest = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sync_file(folder_id, source_file_path, gdrive_new_file_name, folder_files: dict[str, dict], mimetype="image/png",
+              drive_service=None):
+    # Upload that keeps the Drive file (and its id and webContentLink) when one with the same name exists:
+    # skipped when the content is identical, otherwise the content is replaced with files.update.
+    # folder_files: list_folder_files of the folder, kept up to date by this function
+    drive_service = drive_service or get_service()
+    existing = folder_files.get(gdrive_new_file_name)
+    if existing is not None and existing.get('md5Checksum') == md5_of_file(source_file_path):
+        return existing | {'status': 'unchanged'}
+    from googleapiclient.http import MediaFileUpload
+    media = MediaFileUpload(source_file_path, mimetype=mimetype)
+    fields = 'id, name, md5Checksum, webContentLink'
+    if existing is not None:
+        file = scheduler.execute("drive", drive_service.files().update(
+            fileId=existing['id'], media_body=media, fields=fields))
+        status = 'updated'
+    else:
+        file = scheduler.execute("drive", drive_service.files().create(
+            body={'name': gdrive_new_file_name, 'parents': [folder_id]}, media_body=media, fields=fields))
+        status = 'created'
+    folder_files[gdrive_new_file_name] = file
+    return file | {'status': status}
+
+
+def is_folder_accessible(folder_id, drive_service=None):
+    drive_service = drive_service or get_service()
     try:
         # Retrieve the permissions for the folder
-        permissions = service.permissions().list(
+        permissions = scheduler.execute("drive", drive_service.permissions().list(
             fileId=folder_id,
             fields='permissions(id, type, role)'
-        ).execute()
+        ))
 
         read_access = False
         write_access = False
@@ -1,13 +1,20 @@
 from __future__ import annotations
-import re
+from typing import TYPE_CHECKING
 
-import pandas as pd
+import numpy as np
 
 from ResultProcessors import ResultProcessors
+from benchmark_scanner import scan_glmark2
+from sample_store import SampleStore
 from stats import DEFAULT_STATS_TO_CONSIDER, LESS_THAN_PHYSICAL
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class MultiresolutionGlmark2ResultProcessor(ResultProcessors):
+    SECTION_PATTERNS = (r"glmark2_benchmark_result_(?P<resolution>\d+x\d+)\.txt",)
+
     def __init__(self):
         self.resolution_to_processor_mapping = {}
 
@@ -18,7 +25,7 @@ class MultiresolutionGlmark2ResultProcessor(ResultProcessors):
     def items(self):
         return self.resolution_to_processor_mapping.items()
 
-    def groups_to_values_mapping(self) -> dict[str, list[float]]:
+    def groups_to_values_mapping(self) -> dict[str, np.ndarray]:
         ret = {}
         glmark2Processor: Glmark2ResultProcessor
         for resolution, glmark2Processor in self.resolution_to_processor_mapping.items():
@@ -40,36 +47,52 @@ class MultiresolutionGlmark2ResultProcessor(ResultProcessors):
             self.resolution_to_processor_mapping[resolution] = Glmark2ResultProcessor()
         self.resolution_to_processor_mapping[resolution].process(content)
 
+    def process_section(self, section_name, parameters, content):
+        self.process(parameters['resolution'], content)
+
     def stats_to_consider(self):
         return DEFAULT_STATS_TO_CONSIDER + LESS_THAN_PHYSICAL
 
+    def sample_groups(self):
+        # sub-key: "category-step name"
+        for resolution, processor in self.resolution_to_processor_mapping.items():
+            yield resolution, processor.fps.labels, processor.fps.codes, processor.fps.values
+
     def as_dataframe(self) -> pd.DataFrame:
-        data = []
-        for resolution, values in self.groups_to_values_mapping().items():
-            for value in values:
-                data.append({
-                    'resolution': resolution,
-                    'FPS': value,
-                })
-        return pd.DataFrame(data)
+        import pandas as pd
+        resolutions = list(self.resolution_to_processor_mapping.keys())
+        values = [processor.get_values() for processor in self.resolution_to_processor_mapping.values()]
+        codes = np.repeat(np.arange(len(resolutions)), [len(value) for value in values])
+        return pd.DataFrame({
+            'resolution': pd.Categorical.from_codes(codes, categories=resolutions),
+            'FPS': np.concatenate(values) if values else np.empty(0, dtype=np.int64),
+        }, copy=False)
 
 
 
 class Glmark2ResultProcessor:
     def __init__(self):
-        self.results = {}
+        # one FPS sample per step, labelled "category-step name"; FPS is reported as an integer by glmark2
+        self.fps = SampleStore(np.int64)
+        self.frame_times = SampleStore()
+        self.step_categories: dict[str, str] = {}
 
     def process(self, content) -> None:
-        informations = list(re.finditer(
-            "\\[([a-zA-Z0-9]+)\\] (.+?): FPS: (\\d+) FrameTime: ([0-9.]+) ms", content))
-        for info in informations:
-            step_category = info.group(1)
-            step_name = info.group(2)
-            fps = info.group(3)
-            frame_time = info.group(4)
-            self.results[f"{step_category}-{step_name}"] = (step_category, int(fps), float(frame_time))
-
-    def get_values(self):
-        select_by_fps_result = lambda x: x[1]
-        list_of_tuple_of_category_fps_spf = list(self.results.values())
-        return list(map(select_by_fps_result, list_of_tuple_of_category_fps_spf))
+        scan_glmark2(content, self)
+
+    def add_step(self, step_category: str, step_name: str, fps: int, frame_time: float) -> None:
+        key = f"{step_category}-{step_name}"
+        self.step_categories[key] = step_category
+        self.fps.replace(key, (fps,))
+        self.frame_times.replace(key, (frame_time,))
+
+    @property
+    def results(self) -> dict[str, tuple[str, int, float]]:
+        return {
+            key: (step_category, fps, frame_time)
+            for (key, step_category), fps, frame_time in zip(self.step_categories.items(),
+                                                              self.fps.values.tolist(), self.frame_times.values.tolist())
+        }
+
+    def get_values(self) -> np.ndarray:
+        return self.fps.values
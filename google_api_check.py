@@ -0,0 +1,94 @@
+"""
+Request-count check of the sheets and slides stages, run against the in-memory fakes of fake_gspread.py and
+fake_google_api.py instead of Google. On synthetic archives (see synthetic_archives.py) it checks that the whole
+workbook is written with one batchUpdate, that the images are placed in the deck with one presentations.batchUpdate,
+and that images whose MD5 matches their Drive copy are neither uploaded nor replaced again. Exits with 1 when a count
+differs. Usage:
+    python google_api_check.py
+"""
+from __future__ import annotations
+import asyncio
+import os
+import sys
+import tempfile
+from collections import Counter
+
+import main
+from fake_google_api import FakeDriveService, FakeSlidesService
+from fake_gspread import FakeClient
+from spreadsheet import SpreadsheetLogic
+from synthetic_archives import generate_dataset
+from update_gslide import IMAGES_GDRIVE_FOLDER_ID, PRESENTATION_ID, UpdateGslide
+
+# images put in the folder the slides stage uploads
+IMAGES = 12
+
+
+def check(name: str, actual: Counter, expected: dict[str, int]) -> bool:
+    differences = {key: (actual[key], count) for key, count in expected.items() if actual[key] != count}
+    print(f"{name:<48}{'ok' if not differences else 'FAILED'}"
+          + "".join(f"  {key}: {got} instead of {count}" for key, (got, count) in differences.items()))
+    return not differences
+
+
+def check_sheets(folder: str) -> bool:
+    files = main.get_file_path_dict(sorted(generate_dataset(os.path.join(folder, "data"))))
+    openstack_services, stats_store = main.calculate_stats(main.parse_archives(files, cache=None))
+    client = FakeClient()
+    ok = True
+    for export in ("first", "second"):
+        spreadsheet_logic = SpreadsheetLogic(openstack_services, *main.processors_of(openstack_services)[:3],
+                                             client=client, stats_store=stats_store)
+        document = spreadsheet_logic.document
+        api_calls_before = Counter(document.api_calls)
+        asyncio.run(spreadsheet_logic.process_spreadsheet())
+        # the tabs are added by the same batchUpdate the first time, and only written the second time
+        ok &= check(f"sheets, {export} export", document.api_calls - api_calls_before,
+                    {"batch_update": 1, "fetch_sheet_metadata": 1})
+    return ok
+
+
+def check_slides(folder: str) -> bool:
+    images = os.path.join(folder, "graphics")
+    os.makedirs(images)
+    for index in range(IMAGES):
+        write_image(os.path.join(images, f"chart_{index}.png"), f"chart {index}")
+    slides_service = FakeSlidesService(PRESENTATION_ID)
+    drive_service = FakeDriveService(public_folder_ids=[IMAGES_GDRIVE_FOLDER_ID])
+    ok = True
+    # (name, image written again before the run, expected Drive uploads, expected presentations.batchUpdate)
+    for name, changed_image, expected_drive, expected_batches in (
+            ("every image new", None, {"files.create": IMAGES, "files.update": 0}, 1),
+            ("nothing changed", None, {"files.create": 0, "files.update": 0}, 0),
+            ("one image changed", "chart_0.png", {"files.create": 0, "files.update": 1}, 1),
+    ):
+        if changed_image is not None:
+            write_image(os.path.join(images, changed_image), "new data")
+        drive_calls_before, slides_calls_before = Counter(drive_service.api_calls), Counter(slides_service.api_calls)
+        UpdateGslide(slides_service, drive_service).upsert_all_in_folder(images)
+        ok &= check(f"slides, {name}, Drive", drive_service.api_calls - drive_calls_before, expected_drive)
+        ok &= check(f"slides, {name}, Slides", slides_service.api_calls - slides_calls_before,
+                    {"presentations.batchUpdate": expected_batches})
+    # one element per image, each one with its file name as alt text title
+    titles = Counter(element.get('title') for element in slides_service.elements(PRESENTATION_ID).values())
+    ok &= check("slides, one element per image", titles, {f"chart_{index}.png": 1 for index in range(IMAGES)})
+    return ok
+
+
+def write_image(path: str, content: str):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def run() -> bool:
+    with tempfile.TemporaryDirectory() as folder:
+        working_directory = os.getcwd()
+        os.chdir(folder)
+        try:
+            return check_sheets(folder) & check_slides(folder)
+        finally:
+            os.chdir(working_directory)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
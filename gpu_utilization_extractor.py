@@ -1,11 +1,17 @@
 from __future__ import annotations
 import json
+import os
+from typing import TYPE_CHECKING
 
-import pandas as pd
-from scipy.stats import ttest_ind_from_stats
+import numpy as np
 
 from ResultProcessors import ResultProcessors
-from stats import avg, count
+from batched_ttest import p_values_from_moments, register_p_value_stat
+from more_format_reader import as_buffer
+from stats import avg, count, boxplot_samples
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 BENCHMARK_TO_PROCESS_MAPPING = {
     'Glmark2': "glmark2",
@@ -13,134 +19,223 @@ BENCHMARK_TO_PROCESS_MAPPING = {
     'PyTorch': "python3",
 }
 
+# benchmark parameter of SECTION_PATTERNS -> benchmark app
+BENCHMARK_OF_SECTION = {benchmark_app.lower(): benchmark_app for benchmark_app in BENCHMARK_TO_PROCESS_MAPPING}
+
 TWO_SIDED_P_VALUE_EQUAL = "≠ physical; p-value"
+# raw logs are read this many bytes at a time
+LOG_CHUNK_BYTES = 1 << 20
+# header names (lower case, without the unit) of the columns with the GPU utilisation and the process name. Only
+# `process_name` (--query-compute-apps) and the `command` of pmon name a process: `name` is the name of the GPU.
+GPU_UTILIZATION_COLUMNS = ("utilization.gpu", "sm", "gpu-util")
+PROCESS_NAME_COLUMNS = ("process_name", "command")
 
 class GpuUtilizzationExtractorBase(ResultProcessors):
-    def __init__(self):
-        self.groups: dict[str, GpuUtilStats] = {}
-
-    def process(self, gpu_util_json_file_name, content) -> None:
-        parsed = json.loads(content)
-        app_name = self.extract_benchmark_app_name(gpu_util_json_file_name)
-        util_info = self.get_utilization_dict_info_from_process(app_name, parsed)
-        if app_name not in self.groups:
-            self.groups[app_name] = GpuUtilStats()
-        currentData = GpuUtilStats(util_info['gpu-sum'], util_info['count'], util_info['gpu-variance'])
-        self.groups[app_name] = self.groups[app_name] + currentData
+    # nvidia-smi output of a benchmark run, either summarised on the benchmark host (JSON with gpu-sum, count and
+    # gpu-variance per process name) or the raw samples (CSV query output or `nvidia-smi pmon` logs), which are
+    # streamed in chunks. Either way every section becomes one GpuUtilSummary per benchmark.
+    SECTION_PATTERNS = (r"nvidia_smi_(?P<benchmark>glmark2|pytorch|namd)(?:_(?P<batch>\d+))?\.(?:txt|csv|log)",)
 
-    def groups_to_values_mapping(self) -> dict[str, GpuUtilStats]:
-        return self.groups
+    def __init__(self):
+        # benchmark -> summary of every section, merged by groups_to_values_mapping
+        self.summaries: dict[str, list[GpuUtilSummary]] = {}
+
+    def process_section(self, section_name, parameters, content):
+        self.process(BENCHMARK_OF_SECTION[parameters['benchmark']], section_name, content)
+
+    def process(self, app_name, section_name, content) -> None:
+        buffer = as_buffer(content)
+        if bytes(buffer[:64]).lstrip().startswith(b"{"):
+            parsed = json.loads(bytes(buffer))
+            util_info = self.get_utilization_dict_info_from_process(app_name, parsed, section_name)
+            summary = GpuUtilSummary.from_variance(util_info['count'], util_info['gpu-sum'], util_info['gpu-variance'])
+        else:
+            parsed, names_processes = summarize_gpu_log(buffer)
+            # samples without a process name are only the benchmark's when the log does not name any process
+            summary = self.get_utilization_dict_info_from_process(app_name, parsed, section_name,
+                                                                  unattributed_fallback=not names_processes)
+        self.summaries.setdefault(app_name, []).append(summary)
+
+    def groups_to_values_mapping(self) -> dict[str, GpuUtilSummary]:
+        return {app_name: merge_tree(summaries) for app_name, summaries in self.summaries.items()}
 
     def stats_to_consider(self) -> list[tuple[str, callable]]:
         return [('Average', avg), ('Count', count), ('Stdev', stdevForGpuutils), (TWO_SIDED_P_VALUE_EQUAL, ttest_two_tail)]
 
-    def extract_benchmark_app_name(self, file_name):
-        file_name = file_name.lower()
-        for benchmark_app in BENCHMARK_TO_PROCESS_MAPPING.keys():
-            if benchmark_app.lower() in file_name:
-                return benchmark_app
-        assert False
-
-
-    def get_utilization_dict_info_from_process(self, benchmark_app_name, parsed):
+    def get_utilization_dict_info_from_process(self, benchmark_app_name, parsed, section_name=None,
+                                               unattributed_fallback=True):
         benchmark_app_name = benchmark_app_name
         assert benchmark_app_name in BENCHMARK_TO_PROCESS_MAPPING.keys()
         process_name = BENCHMARK_TO_PROCESS_MAPPING[benchmark_app_name]
 
         if process_name in parsed:
             return parsed[process_name]
-        if "null" in parsed:
+        # `nvidia-smi pmon` logs the name of the executable without its path
+        if os.path.basename(process_name) in parsed:
+            return parsed[os.path.basename(process_name)]
+        if unattributed_fallback and "null" in parsed:
             return parsed["null"]
-        assert False
+        raise ValueError(f"{section_name or benchmark_app_name}: no GPU utilisation of {process_name!r}, "
+                         f"processes found: {', '.join(map(repr, parsed)) or 'none'}")
 
     def as_dataframe(self) -> pd.DataFrame:
-        data = []
-        for benchmark_app, gpu_util in self.groups_to_values_mapping().items():
-            for value in gpu_util:
-                data.append({
-                    'benchmark': benchmark_app,
-                    'gpu-util': gpu_util.sum / gpu_util.count,
-                    'count': gpu_util.count,
-                    'stdev': gpu_util.stdev,
-                })
-        return pd.DataFrame(data)
-
-
-class GpuUtilStats:
-    def __init__(self, sum=0, count=0, variance=0):
+        import pandas as pd
+        return pd.DataFrame([{
+            'benchmark': benchmark_app,
+            'gpu-util': gpu_util.average,
+            'count': gpu_util.count,
+            'stdev': gpu_util.stdev,
+        } for benchmark_app, gpu_util in self.groups_to_values_mapping().items()])
+
+
+class GpuUtilSummary:
+    # Count, sum and sum of squared deviations from the mean (M2) of GPU utilisation samples. Summaries of
+    # disjoint samples merge exactly (Chan et al.), so each chunk of a log is summarised on its own.
+    __slots__ = ('count', 'sum', 'm2')
+
+    def __init__(self, count=0, sum=0, m2=0.0):
         self.count = count
         self.sum = sum
-        self.variance = variance
+        self.m2 = m2
+
+    @staticmethod
+    def from_variance(count, sum, variance) -> GpuUtilSummary:
+        # the JSON summaries of the benchmark hosts hold the sample variance
+        return GpuUtilSummary(count, sum, variance * (count - 1) if count > 1 else 0.0)
+
+    @staticmethod
+    def of_samples(values: np.ndarray) -> GpuUtilSummary:
+        if len(values) == 0:
+            return GpuUtilSummary()
+        total = values.sum()
+        return GpuUtilSummary(len(values), total.item(), float(np.square(values - total / len(values)).sum()))
 
     @property
     def average(self):
         if self.count == 0:
-            return 9999999999999
+            return float('nan')
         return self.sum / self.count
 
+    @property
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
     @property
     def stdev(self):
         return self.variance**.5
 
-    def __add__(self, other):
-        return GpuUtilStats(self.sum + other.sum, self.count + other.count, calculateVariance(self, other))
-
-    def __radd__(self, other):
-        if isinstance(other, int):
+    def merge(self, other: GpuUtilSummary) -> GpuUtilSummary:
+        if self.count == 0:
+            return other
+        if other.count == 0:
             return self
-        return self + other
-
-    def __rtruediv__ (self, other):
-        return self
-
-    def __truediv__ (self, other):
-        return self
-
-    def __len__(self):
-        return self.count
-
-    def __float__(self):
-        return round(self.sum / self.count, 2)
+        count = self.count + other.count
+        delta = other.average - self.average
+        return GpuUtilSummary(count, self.sum + other.sum, self.m2 + other.m2 + delta * delta * self.count * other.count / count)
 
     def __repr__(self):
-        return f"{self.__float__()}"
-
-    def __iter__(self):
-        return iter([self])
-
-    def __round__(self, ndigits=None):
-        return round(self.__float__(), ndigits=min(2,ndigits or 100))
-
-
-def calculateVariance(stats1: GpuUtilStats, stats2: GpuUtilStats):
-    add1 = (stats1.count - 1) * stats1.variance
-    add2 = (stats2.count - 1) * stats2.variance
-    divisor = stats1.count + stats2.count - 1
-    firstNumber = (add1 + add2) / divisor
-
-    numerator = stats1.count*stats2.count * (stats1.average - stats2.average)**2
-    denominator = (stats1.count + stats2.count) * (stats1.count + stats2.count - 1)
-    secondNumber = numerator / denominator
-    return firstNumber + secondNumber
-
-
-def stdevForGpuutils(gpuUtil: GpuUtilStats, **_):
+        return f"GpuUtilSummary(count={self.count}, average={self.average}, stdev={self.stdev})"
+
+
+def merge_tree(summaries: list[GpuUtilSummary]) -> GpuUtilSummary:
+    # pairwise, level by level: both sides of every merge hold a similar amount of samples, which keeps the
+    # rounding error of the M2 updates at O(log n) merges instead of O(n)
+    while len(summaries) > 1:
+        summaries = [summaries[i].merge(summaries[i + 1]) if i + 1 < len(summaries) else summaries[i]
+                     for i in range(0, len(summaries), 2)]
+    return summaries[0] if summaries else GpuUtilSummary()
+
+
+@avg.register(GpuUtilSummary)
+def _avg(summary: GpuUtilSummary, **_):
+    # reported with two decimals
+    return round(summary.average, 2)
+
+
+@count.register(GpuUtilSummary)
+def _count(summary: GpuUtilSummary, **_):
+    return summary.count
+
+
+@boxplot_samples.register(GpuUtilSummary)
+def _boxplot_samples(summary: GpuUtilSummary) -> list:
+    return [round(summary.average, 2)]
+
+
+def summarize_gpu_log(buffer, chunk_bytes=LOG_CHUNK_BYTES) -> tuple[dict[str, GpuUtilSummary], bool]:
+    # Raw nvidia-smi samples -> summary per process name ("null" for samples without one), and whether the log has a
+    # process name column at all. Reads chunk_bytes at a time, so the log is never decoded as a whole; every chunk
+    # gives one partial summary per process.
+    partials: dict[str, list[GpuUtilSummary]] = {}
+    layout = None
+    for chunk in line_chunks(buffer, chunk_bytes):
+        lines = chunk.decode(errors="replace").splitlines()
+        if layout is None:
+            layout = log_layout(lines)
+            if layout is None:
+                continue
+        for process_name, values in parse_log_lines(lines, layout).items():
+            partials.setdefault(process_name, []).append(GpuUtilSummary.of_samples(np.asarray(values)))
+    names_processes = layout is not None and layout[2] is not None
+    return {process_name: merge_tree(summaries) for process_name, summaries in partials.items()}, names_processes
+
+
+def line_chunks(buffer, chunk_bytes):
+    start = 0
+    while start < len(buffer):
+        chunk = bytes(buffer[start:start + chunk_bytes])
+        if start + len(chunk) < len(buffer):
+            # the last line continues in the next chunk
+            end = chunk.rfind(b"\n") + 1
+            chunk = chunk[:end] if end > 0 else chunk
+        start += len(chunk)
+        yield chunk
+
+
+def log_layout(lines: list[str]) -> tuple[str, int, int | None] | None:
+    # From the header: (delimiter, column of the GPU utilisation, column of the process name or None), None while
+    # the header was not found. `nvidia-smi pmon` starts with "# gpu pid type sm mem ... command", the CSV query
+    # output with e.g. "timestamp, process_name, utilization.gpu [%]".
+    for line in lines:
+        if line.startswith("#"):
+            columns = line[1:].split()
+            if "sm" in columns:
+                process = next((index for index, column in enumerate(columns) if column in PROCESS_NAME_COLUMNS), None)
+                return None, columns.index("sm"), process
+        elif "," in line:
+            columns = [column.split("[")[0].strip().lower() for column in line.split(",")]
+            utilization = next((index for index, column in enumerate(columns) if column in GPU_UTILIZATION_COLUMNS), None)
+            if utilization is not None:
+                process = next((index for index, column in enumerate(columns) if column in PROCESS_NAME_COLUMNS), None)
+                return ",", utilization, process
+    return None
+
+
+def parse_log_lines(lines: list[str], layout) -> dict[str, list[float]]:
+    delimiter, utilization, process = layout
+    ret: dict[str, list[float]] = {}
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split(delimiter)
+        try:
+            value = float(fields[utilization].strip().rstrip("%"))
+        except (IndexError, ValueError):
+            # header repeated by pmon, "-" when a process had no sample, "[N/A]"
+            continue
+        process_name = fields[process].strip() if process is not None and process < len(fields) else "null"
+        ret.setdefault(process_name if process_name not in ("", "-") else "null", []).append(value)
+    return ret
+
+
+def stdevForGpuutils(gpuUtil: GpuUtilSummary, **_):
     return gpuUtil.stdev
 
-def ttest_two_tail(gpuUtil: GpuUtilStats, additional_argument: GpuUtilStats):
+def ttest_two_tail(gpuUtil: GpuUtilSummary, additional_argument: GpuUtilSummary):
     physical = additional_argument
-    tstat, pvalue = ttest_ind_from_stats(gpuUtil.average, gpuUtil.stdev, gpuUtil.count, physical.average, physical.stdev, physical.count, alternative='two-sided')
-    return pvalue
-
-def groups_to_values_mapping(self) -> dict[str, list[float]]:
-        raise NotImplementedError
-
-
+    return p_values_from_moments(gpuUtil.average, gpuUtil.stdev, gpuUtil.count, physical.average, physical.stdev, physical.count, alternative='two-sided')
 
-class GpuUtilizzationExtractor:
-    def __init__(self, base: GpuUtilizzationExtractorBase, benchmark_app_name):
-        self.benchmark_app_name = benchmark_app_name
-        self.base = base
 
-    def process(self, content) -> None:
-        self.base.process(self.benchmark_app_name, content)
+register_p_value_stat(ttest_two_tail, 'two-sided')
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# Bump when the look of the charts/tables changes without their inputs changing, to re-render everything
+GRAPHICS_STYLE_VERSION = 1
+MANIFEST_FILE_NAME = ".manifest.json"
+
+
+def fingerprint(render, arguments: dict) -> str:
+    # Hash of everything that ends up in a PNG: the render function, its data slice and its styling arguments
+    digest = hashlib.sha256()
+    digest.update(f"{GRAPHICS_STYLE_VERSION}:{render.__module__}.{render.__qualname__}".encode())
+    for name in sorted(arguments):
+        digest.update(name.encode())
+        update_digest(digest, arguments[name])
+    return digest.hexdigest()
+
+
+def update_digest(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr([(str(column), str(dtype)) for column, dtype in value.dtypes.items()]).encode())
+        digest.update(repr(list(map(str, value.index.names))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    else:
+        digest.update(repr(value).encode())
+
+
+class GraphicsManifest:
+    # fingerprint -> file inside the graphics folder that was rendered from it
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_FILE_NAME)
+        self.entries: dict[str, str] = {}
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable graphics manifest {self.path}. Reason: {e}")
+
+    def is_up_to_date(self, job_fingerprint: str, file_path: str) -> bool:
+        recorded = self.entries.get(job_fingerprint)
+        return recorded is not None and os.path.basename(recorded) == os.path.basename(file_path) \
+            and os.path.isfile(file_path)
+
+    def record(self, job_fingerprint: str, file_path: str):
+        self.forget(file_path)
+        self.entries[job_fingerprint] = os.path.basename(file_path)
+
+    def forget(self, file_path: str):
+        self.entries = {key: value for key, value in self.entries.items()
+                        if value != os.path.basename(file_path)}
+
+    def collect_garbage(self, current_file_paths: list[str]) -> list[str]:
+        # Removes the files (and manifest entries) that no current render job produces anymore
+        current = set(map(os.path.basename, current_file_paths))
+        self.entries = {key: value for key, value in self.entries.items() if value in current}
+        removed = []
+        if not os.path.isdir(self.folder):
+            return removed
+        for file_name in os.listdir(self.folder):
+            file_path = os.path.join(self.folder, file_name)
+            if file_name == MANIFEST_FILE_NAME or file_name in current or not os.path.isfile(file_path):
+                continue
+            os.unlink(file_path)
+            removed.append(file_path)
+        return removed
+
+    def save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.path)
@@ -1,159 +1,383 @@
+from __future__ import annotations
+import argparse
 import asyncio
 import os.path
-import re
-import shutil
+import signal
+import time
 from glob import glob
+from typing import TYPE_CHECKING
 
-import namd_extractor
-import pytorch_extractor
-from glmark2_extractor import Glmark2ResultProcessor, MultiresolutionGlmark2ResultProcessor
-from gpu_utilization_extractor import GpuUtilizzationExtractorBase, GpuUtilizzationExtractor
-from spreadsheet import SpreadsheetLogic
+import profiling
+from parse_cache import ParseCache, archive_key
+from resampling import resample_comparisons
+from service_parser import parse_services, report_sections
+from stats_artifact import StatsArtifact
 from stats_recap import StatRecapPerBenchmarkApp, StatRecapPerOpenStackService
-from update_graphics import UpdateGraphics
-from update_gslide import UpdateGslide
+from stats_store import StatsStore
 
-glmark2_resolutions = ['1920x1080', '1366x768', '360x800', '192x108']
-openstack_namd_batch_range = range(0, 15)
-INDEX_OF_T_TEST_COMPARISON = 0
-
-
-async def main():
-    file_names = get_file_list()
-    files = get_file_content_dict(file_names)
-
-    glmark2_processors = {opnstck_svc_nm: MultiresolutionGlmark2ResultProcessor().add_resolutions(glmark2_resolutions)
-                          for opnstck_svc_nm in files.keys()}
-    pytorch_processors = {opnstck_svc_nm: pytorch_extractor.PytorchResultProcessor() for opnstck_svc_nm in files.keys()}
-    namd_processors = {opnstck_svc_nm: namd_extractor.NamdResultProcessor() for opnstck_svc_nm in files.keys()}
-    gpu_util_processors = {opnstck_svc_nm: GpuUtilizzationExtractorBase() for opnstck_svc_nm in files.keys()}
-
-    for index, (openstack_service_name, content) in enumerate(files.items()):
-        print(openstack_service_name)
-        benchmark_results = extract_file_name_from_more_format(content)
+# pandas, matplotlib, seaborn and the Google clients take seconds to import; they are imported by the stages that
+# use them, so that parse, stats and latex start quickly. startup_check.py guards this.
+if TYPE_CHECKING:
+    from sample_table import SampleTable
+    from update_graphics import UpdateGraphics
 
-        for benchmark_type, content in benchmark_results.items():
-            handle_processing(benchmark_type, content, pytorch_processors[openstack_service_name],
-                              namd_processors[openstack_service_name], glmark2_processors[openstack_service_name],
-                              gpu_util_processors[openstack_service_name])
-
-    openstack_services = {opnstck_svc_nm: StatRecapPerOpenStackService(opnstck_svc_nm) for opnstck_svc_nm in files.keys()}
-    for openstack_service_name, openstack_service_recap in openstack_services.items():
-        openstack_service_recap.glmark2_processor = glmark2_processors[openstack_service_name]
-        openstack_service_recap.pytorch_processor = pytorch_processors[openstack_service_name]
-        openstack_service_recap.namd_processor = namd_processors[openstack_service_name]
-        openstack_service_recap.gpu_util_processor = gpu_util_processors[openstack_service_name]
-
-    openstack_services_ordering = list(namd_processors.keys())
+INDEX_OF_T_TEST_COMPARISON = 0
+# Number of processes used to parse the files inside ./data. 1 parses everything in this process.
+PARSING_WORKERS = os.cpu_count() or 1
+# Set to None to always re-parse every file inside ./data
+PARSE_CACHE = ParseCache()
+# Number of processes used to render the charts and tables inside ./graphics
+RENDER_WORKERS = os.cpu_count() or 1
+# "matplotlib" draws the tables directly, "dataframe_image" renders them in a headless browser
+TABLE_BACKEND = "matplotlib"
+# Bootstrap and permutation resamples per group of the resample stage
+RESAMPLES = 10_000
+RESAMPLING_SEED = 0
+# Number of processes the groups are resampled with. 1 resamples everything in this process.
+RESAMPLING_WORKERS = os.cpu_count() or 1
+# Where `python main.py matrix` renders the comparison of every pair of services
+MATRIX_FOLDER = "./graphics/matrix"
+# `python main.py --watch` looks at ./data this often, and waits until the archives stayed unchanged this long
+WATCH_POLL_SECONDS = 2.0
+WATCH_DEBOUNCE_SECONDS = 3.0
+# Where `python main.py --profile` writes profile.json and trace.json
+PROFILE_FOLDER = "./profile"
+# Set to None to always calculate the stats again when a stage after "stats" runs on its own
+STATS_ARTIFACT = StatsArtifact()
+STAGES = ['parse', 'stats', 'resample', 'latex', 'charts', 'matrix', 'sheets', 'slides']
+# what `python main.py` and `python main.py all` run; resample takes seconds per service, sheets and slides need the
+# Google service account
+DEFAULT_STAGES = ['parse', 'stats', 'latex', 'charts']
+
+
+async def main(stages: list[str] = None):
+    files = get_file_path_dict(get_file_list())
+    pipeline = Pipeline(files)
+    for stage in stages or DEFAULT_STAGES:
+        await pipeline.run(stage)
+
+
+async def watch(stages: list[str] = None, poll_seconds=WATCH_POLL_SECONDS, debounce_seconds=WATCH_DEBOUNCE_SECONDS):
+    # Runs the stages once, then again every time archives inside ./data are added, modified or removed, until
+    # SIGINT / SIGTERM. Only the services whose archive changed are parsed and calculated again (every service when
+    # the comparison changed), only their LaTeX variables are written again, and the charts whose data is unchanged
+    # are kept by the graphics cache.
+    from watch import ArchiveWatcher, LatexBlocks
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+    watcher = ArchiveWatcher(get_file_list, poll_seconds, debounce_seconds)
+    pipeline = Pipeline(get_file_path_dict(get_file_list()))
+    latex_blocks = LatexBlocks()
+    try:
+        while True:
+            try:
+                with profiling.stage("update"):
+                    await update(pipeline, latex_blocks, stages or DEFAULT_STAGES)
+            except Exception as e:
+                # e.g. an archive that is not complete yet; the next change is picked up again
+                print(f"Failed to update. Reason: {e!r}")
+            print("Watching ./data for new or changed archives, Ctrl+C to stop")
+            if not await watcher.wait_for_change(stop):
+                break
+    finally:
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signal_number)
+    print("Stopped watching ./data")
+
+
+async def update(pipeline: Pipeline, latex_blocks, stages: list[str]):
+    start = time.perf_counter()
+    changed = pipeline.update(get_file_path_dict(get_file_list()), 'resample' in stages)
+    if not changed:
+        print("No archive changed")
+        return
+    print(f"Calculated the stats of {', '.join(sorted(changed))} again")
+    for stage in stages:
+        if stage in ('parse', 'stats', 'resample'):
+            continue  # done by pipeline.update
+        if stage == 'latex':
+            with profiling.stage("latex"):
+                print(f"{latex_blocks.update(pipeline.stats_store, changed)} LaTeX lines changed")
+        else:
+            await pipeline.run(stage)
+    print(f"Updated in {time.perf_counter() - start:.1f} s")
+
+
+class Pipeline:
+    # The stages of one run of main. The parsed archives are persisted by PARSE_CACHE and the calculated stats by
+    # STATS_ARTIFACT, so a stage that runs without the stages before it (e.g. `python main.py charts`) loads their
+    # output instead of parsing and calculating again.
+    def __init__(self, files: dict[str, str], stats_artifact=STATS_ARTIFACT):
+        self.files = files
+        self.stats_artifact = stats_artifact
+        self.parsed_services = None
+        self.openstack_services: dict[str, StatRecapPerOpenStackService] = None
+        self.stats_store: StatsStore = None
+        self.sample_table: SampleTable = None
+        self._stats_key: str = None
+        self.archive_keys: dict[str, str] = {}  # of the archives parsed by update
+
+    async def run(self, stage: str):
+        if stage == 'parse':
+            self.parsed_services = parse_archives(self.files)
+        elif stage == 'stats':
+            self.calculate_stats()
+        elif stage == 'resample':
+            self.resample_stats()
+        elif stage == 'latex':
+            write_latex_variables(self.load_stats()[1])
+        elif stage == 'charts':
+            update_charts = create_graphics_updater(*self.load_stats(), sample_table=self.load_samples())
+            with profiling.stage("graphics"):
+                update_charts.update_slides()
+        elif stage == 'matrix':
+            from comparison_matrix import ComparisonMatrix
+            from update_graphics import render_comparison_matrix
+            with profiling.stage("comparison_matrix") as timing:
+                matrix = ComparisonMatrix.from_recaps(list(self.load_stats()[0].values()))
+                timing.add(pairs=matrix.pair_count())
+            with profiling.stage("graphics"):
+                render_comparison_matrix(matrix, MATRIX_FOLDER, RENDER_WORKERS, table_backend=TABLE_BACKEND)
+        elif stage == 'sheets':
+            from spreadsheet import SpreadsheetLogic
+            openstack_services, stats_store = self.load_stats()
+            spreadsheet_logic = SpreadsheetLogic(openstack_services, *processors_of(openstack_services)[:3],
+                                                 stats_store=stats_store, sample_table=self.load_samples())
+            print(spreadsheet_logic.url)
+            await spreadsheet_logic.process_spreadsheet()
+        elif stage == 'slides':
+            from update_gslide import UpdateGslide
+            UpdateGslide().upsert_all_in_folder('./graphics')
+        else:
+            raise ValueError(f"Unknown stage {stage}, choose from {STAGES}")
+
+    def stats_key(self) -> str:
+        # hashes every archive, only once per run
+        if self._stats_key is None:
+            self._stats_key = self.stats_artifact.key(self.files, INDEX_OF_T_TEST_COMPARISON)
+        return self._stats_key
+
+    def load_stats(self) -> tuple[dict[str, StatRecapPerOpenStackService], StatsStore]:
+        if self.stats_store is None and self.stats_artifact is not None:
+            with profiling.stage("load_stats"):
+                loaded = self.stats_artifact.load(self.stats_key())
+            if loaded is not None:
+                print("Using the stats calculated by a previous run")
+                self.openstack_services, self.stats_store = loaded
+        if self.stats_store is None:
+            self.calculate_stats()
+        return self.openstack_services, self.stats_store
+
+    def calculate_stats(self):
+        if self.parsed_services is None:
+            self.parsed_services = parse_archives(self.files)
+        self.openstack_services, self.stats_store = calculate_stats(self.parsed_services)
+        self.sample_table = None
+        if self.stats_artifact is not None:
+            self.stats_artifact.store(self.stats_key(), self.openstack_services, self.stats_store)
+
+    def resample_stats(self):
+        # adds the resampled stats to the ones of the stats stage, unless the loaded stats already have them
+        openstack_services, stats_store = self.load_stats()
+        if stats_store.resampled:
+            return
+        comparison = next(recap for recap in openstack_services.values() if recap.as_comparison)
+        self.stats_store = create_stats_store(openstack_services,
+                                              resample(list(openstack_services.values()), comparison))
+        if self.stats_artifact is not None:
+            self.stats_artifact.store(self.stats_key(), self.openstack_services, self.stats_store)
+
+    def update(self, files: dict[str, str], with_resampling=False) -> set[str]:
+        # Watch mode: parses the archives of `files` whose content changed since the previous update (all of them the
+        # first time) and calculates the stats of their services again, resampled ones included if with_resampling.
+        # Every service is calculated again when the comparison changed, since all of them refer to it. Returns the
+        # services whose stats changed.
+        archive_keys = {name: archive_key(file_path) for name, file_path in files.items()}
+        changed = {name for name, key in archive_keys.items() if self.archive_keys.get(name) != key}
+        removed = self.archive_keys.keys() - archive_keys.keys()
+        if not changed and not removed:
+            return set()
+        parsed = parse_archives({name: file_path for name, file_path in files.items() if name in changed})
+        parsed_services = {name: parsed[name] if name in parsed else self.parsed_services[name] for name in files}
+        previous_comparison = self.comparison_name()
+        recalculate_all = self.stats_store is None or previous_comparison in changed \
+            or list(files)[INDEX_OF_T_TEST_COMPARISON] != previous_comparison
+        if recalculate_all:
+            openstack_services, stats_store = calculate_stats(parsed_services, with_resampling)
+        else:
+            openstack_services, stats_store = update_stats(self.openstack_services, self.stats_store, parsed_services,
+                                                           changed, with_resampling)
+        # kept only once the update succeeded, so that a failed one is tried again with the next change
+        self.files, self.archive_keys, self.parsed_services = files, archive_keys, parsed_services
+        self.openstack_services, self.stats_store = openstack_services, stats_store
+        self.sample_table = None
+        self._stats_key = None
+        if self.stats_artifact is not None:
+            self.stats_artifact.store(self.stats_key(), self.openstack_services, self.stats_store)
+        return set(files) if recalculate_all else changed | removed
+
+    def comparison_name(self) -> str | None:
+        if self.openstack_services is None:
+            return None
+        return next((name for name, recap in self.openstack_services.items() if recap.as_comparison), None)
+
+    def load_samples(self) -> SampleTable:
+        self.load_stats()
+        if self.sample_table is None and self.stats_artifact is not None:
+            with profiling.stage("load_samples"):
+                self.sample_table = self.stats_artifact.load_samples(self.stats_key())
+        if self.sample_table is None:
+            # built the first time a stage needs it, pandas is not imported by the stages before
+            with profiling.stage("sample_table") as stage:
+                self.sample_table = create_sample_table(self.openstack_services)
+                stage.add(samples=len(self.sample_table))
+            if self.stats_artifact is not None:
+                self.stats_artifact.store_samples(self.stats_key(), self.sample_table)
+        return self.sample_table
+
+
+# The stages of main, in order. Each one only depends on the output of the previous ones.
+def parse_archives(files: dict[str, str], workers=PARSING_WORKERS, cache=PARSE_CACHE):
+    with profiling.stage("parse", files=len(files)):
+        parsed_services = parse_services(files, workers, cache)
+    report_sections(parsed_services)
+    return parsed_services
+
+
+def calculate_stats(parsed_services,
+                    with_resampling=False) -> tuple[dict[str, StatRecapPerOpenStackService], StatsStore]:
+    with profiling.stage("stats", services=len(parsed_services)):
+        return _calculate_stats(parsed_services, with_resampling)
+
+
+def _calculate_stats(parsed_services,
+                     with_resampling=False) -> tuple[dict[str, StatRecapPerOpenStackService], StatsStore]:
+    openstack_services = {opnstck_svc_nm: create_recap(opnstck_svc_nm, parsed_services[opnstck_svc_nm])
+                          for opnstck_svc_nm in parsed_services.keys()}
+
+    openstack_services_ordering = list(parsed_services.keys())
     comparison_openstack_service_name = openstack_services_ordering[INDEX_OF_T_TEST_COMPARISON]
     comparison = openstack_services[comparison_openstack_service_name]
     comparison.as_comparison = True
-    for index, op_svc in enumerate(openstack_services):
-        openstack_service_recap = openstack_services[op_svc]
-        openstack_service_recap.calculate_benchmark(comparison)
-
-    with open("latex_command.tex", "w") as f:
-        print("\n".join(StatRecapPerOpenStackService.as_latex_variables(
-            list(openstack_services.values())
-        )), file=f)
-
-    clear_folder("./graphics")
-    update_charts = UpdateGraphics(openstack_services, glmark2_processors, namd_processors, pytorch_processors, gpu_util_processors)
-    update_charts.update_slides()
-
-    # spreadsheet_logic = SpreadsheetLogic(openstack_services, glmark2_processors, namd_processors, pytorch_processors)
-    # print(spreadsheet_logic.url)
-    # await spreadsheet_logic.process_spreadsheet()
-
-    # update_slide = UpdateGslide()
-    # update_slide.upsert_all_in_folder('./graphics')
-
-
-
-
-def handle_processing(benchmark_type, content, pytorch_processor, namd_processor, glmark2_processors: dict[str, Glmark2ResultProcessor], utilization_base_proc):
-    handlers = {
-        'pytorch_benchmark_result.txt': pytorch_processor,
-        'namd_benchmark_result.txt': namd_processor,
-        'nvidia_smi_glmark2.txt': GpuUtilizzationExtractor(utilization_base_proc, 'nvidia_smi_glmark2.txt'),
-        'nvidia_smi_pytorch.txt': GpuUtilizzationExtractor(utilization_base_proc, 'nvidia_smi_pytorch.txt'),
-    } | {
-        f'glmark2_benchmark_result_{resolution}.txt': processor for resolution, processor in glmark2_processors.items()
-    } | {
-        f'namd_benchmark_result_{batch_no}.txt': namd_processor
-        for batch_no in openstack_namd_batch_range
-    } | {
-        f'nvidia_smi_namd_{batch_no}.txt': GpuUtilizzationExtractor(utilization_base_proc, 'nvidia_smi_namd_{batch_no}.txt')
-        for batch_no in openstack_namd_batch_range
-    }
-    nop_processor = NopProcessor()
-    handler = handlers.get(benchmark_type, nop_processor)
-    handler.process(content)
+    StatRecapPerOpenStackService.calculate_benchmarks(list(openstack_services.values()), comparison)
+    resampled = resample(list(openstack_services.values()), comparison) if with_resampling else None
+    return openstack_services, create_stats_store(openstack_services, resampled)
+
+
+def update_stats(openstack_services: dict[str, StatRecapPerOpenStackService], stats_store: StatsStore,
+                 parsed_services, services: set[str],
+                 with_resampling=False) -> tuple[dict[str, StatRecapPerOpenStackService], StatsStore]:
+    # Calculates the stats of `services` again, e.g. after their archives changed, and drops the services that are
+    # not inside parsed_services anymore. The comparison must be unchanged: the stats of the other services are kept
+    # as they are.
+    with profiling.stage("stats", services=len(services)):
+        openstack_services = {name: create_recap(name, parsed) if name in services else openstack_services[name]
+                              for name, parsed in parsed_services.items()}
+        comparison = next(recap for recap in openstack_services.values() if recap.as_comparison)
+        recalculated = [openstack_services[name] for name in services]
+        for openstack_service_recap in recalculated:
+            openstack_service_recap.calculate_benchmark(comparison)
+        resampled = None
+        if with_resampling:
+            resampled = {key: value for key, value in stats_store.resampled.items()
+                         if key[0] in openstack_services and key[0] not in services}
+            resampled.update(resample(recalculated, comparison) or {})
+        return openstack_services, create_stats_store(openstack_services, resampled)
+
+
+def create_recap(openstack_service_name: str, parsed) -> StatRecapPerOpenStackService:
+    openstack_service_recap = StatRecapPerOpenStackService(openstack_service_name)
+    openstack_service_recap.glmark2_processor = parsed.glmark2_processor
+    openstack_service_recap.pytorch_processor = parsed.pytorch_processor
+    openstack_service_recap.namd_processor = parsed.namd_processor
+    openstack_service_recap.gpu_util_processor = parsed.gpu_util_processor
+    return openstack_service_recap
+
+
+def resample(recaps: list[StatRecapPerOpenStackService], comparison: StatRecapPerOpenStackService) -> dict | None:
+    if RESAMPLES <= 0:
+        return None
+    with profiling.stage("resampling") as stage:
+        resampled = resample_comparisons(recaps, comparison, RESAMPLES, RESAMPLING_SEED, RESAMPLING_WORKERS)
+        stage.add(groups=len(resampled), resamples=RESAMPLES)
+    return resampled
+
+
+def create_stats_store(openstack_services: dict[str, StatRecapPerOpenStackService], resampled) -> StatsStore:
+    # every exporter reads the computed stats from this store
+    with profiling.stage("stats_store") as stage:
+        stats_store = StatsStore.from_recaps(list(openstack_services.values()), resampled)
+        stage.add(rows=len(stats_store))
+    return stats_store
+
+
+def write_latex_variables(stats_store: StatsStore, file_path="latex_command.tex"):
+    with profiling.stage("latex"):
+        with profiling.stage("as_latex_variables") as stage:
+            latex_variables = stats_store.as_latex_variables()
+            stage.add(lines=len(latex_variables))
+        with open(file_path, "w") as f:
+            print("\n".join(latex_variables), file=f)
+
+
+def create_graphics_updater(openstack_services: dict[str, StatRecapPerOpenStackService], stats_store: StatsStore,
+                            render_workers=RENDER_WORKERS, use_graphics_cache=True,
+                            sample_table: SampleTable = None) -> UpdateGraphics:
+    from update_graphics import UpdateGraphics
+    return UpdateGraphics(openstack_services, *processors_of(openstack_services),
+                          render_workers, use_graphics_cache, TABLE_BACKEND, stats_store, sample_table)
+
+
+def create_sample_table(openstack_services: dict[str, StatRecapPerOpenStackService]) -> SampleTable:
+    from sample_table import SampleTable
+    glmark2_processors, namd_processors, pytorch_processors, _ = processors_of(openstack_services)
+    return SampleTable.from_processors({'Glmark2': glmark2_processors, 'NAMD': namd_processors,
+                                        'PyTorch': pytorch_processors})
+
+
+def processors_of(openstack_services: dict[str, StatRecapPerOpenStackService]):
+    # the glmark2, NAMD, PyTorch and GPU utilization processors of every service, as calculate_stats assigned them
+    return ({name: recap.glmark2_processor for name, recap in openstack_services.items()},
+            {name: recap.namd_processor for name, recap in openstack_services.items()},
+            {name: recap.pytorch_processor for name, recap in openstack_services.items()},
+            {name: recap.gpu_util_processor for name, recap in openstack_services.items()})
 
 
 def get_file_list() -> list[str]:
-    return  list(glob("./data/*"))
-
-
-def get_file_content_dict(file_list: list[str], file_name_extract=os.path.basename):
-    ret = {}
-    for file_path in file_list:
-        key = file_name_extract(file_path)
-        with open(file_path, "r") as f:
-            ret[key] = f.read()
-    return ret
-
-
-"""
-Format command linux `more *` di linux akan menghasilkan format:
-::::::::::::::
-FILENAME1
-::::::::::::::
-FILE_CONTENT1::::::::::::::
-FILENAME2
-::::::::::::::
-FILE_CONTENT2::::::::::::::
-...
-
-fungsi ini memecah format itu 
-"""
-def extract_file_name_from_more_format(output_in_more_format: str) -> dict[str, str]:
-    splitted = re.split(r':::::::*', output_in_more_format)
-    splitted.pop(0)
-    ret = {}
-    for file_name, content in flat_to_2d(splitted, 2):
-        ret[file_name.strip()] = content
-    return ret
-
-def clear_folder(folder_path: str):
-    if not os.path.isdir(folder_path):
-        return
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        try:
-            if os.path.isfile(file_path) or os.path.islink(file_path):
-                os.unlink(file_path)  # remove file or link
-            elif os.path.isdir(file_path):
-                shutil.rmtree(file_path)  # remove directory
-        except Exception as e:
-            print(f'Failed to delete {file_path}. Reason: {e}')
+    # sorted, so that the comparison (INDEX_OF_T_TEST_COMPARISON) and the order of the output do not depend on the
+    # file system
+    return sorted(glob("./data/*"))
 
 
+def get_file_path_dict(file_list: list[str], file_name_extract=os.path.basename):
+    return {file_name_extract(file_path): file_path for file_path in file_list}
 
-def flat_to_2d(lst: list, n: int):
-    if len(lst) % n != 0:
-        raise ValueError("Given list length is not divisible by n")
-    for i in range(0, len(lst), n):
-        yield lst[i:i+n]
-    return
 
-
-class NopProcessor:
-    def process(self, content):
-        return
+def parse_arguments(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recapitulate the benchmark results inside ./data")
+    parser.add_argument("stages", nargs="*", metavar="stage", default=["all"],
+                        help=f"stages to run, in any order: {', '.join(STAGES)} or all ({', '.join(DEFAULT_STAGES)})")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running, and run the stages again whenever archives inside ./data change")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"write the time and memory used by every stage inside {PROFILE_FOLDER}")
+    args = parser.parse_args(argv)
+    unknown = [stage for stage in args.stages if stage not in STAGES + ['all']]
+    if unknown:
+        parser.error(f"unknown stages {unknown}, choose from {STAGES + ['all']}")
+    selected = set(DEFAULT_STAGES if 'all' in args.stages else []) | set(args.stages)
+    args.stages = [stage for stage in STAGES if stage in selected]
+    return args
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    arguments = parse_arguments()
+    if arguments.profile:
+        profiling.enable()
+    asyncio.run(watch(arguments.stages) if arguments.watch else main(arguments.stages))
+    if profiling.is_enabled():
+        print("Profile written to {} and {}".format(*profiling.save(PROFILE_FOLDER)))
 
 
@@ -0,0 +1,111 @@
+"""
+Reader for the archives inside ./data: the output of `more * | cat` in the benchmark_result folder, which
+puts every file after a header of separator lines:
+::::::::::::::
+FILENAME1
+::::::::::::::
+FILE_CONTENT1::::::::::::::
+FILENAME2
+::::::::::::::
+FILE_CONTENT2::::::::::::::
+...
+
+Splitting rule: a separator is a run of at least six ':'. Everything before the first separator is dropped, the
+remaining pieces alternate between file name (stripped) and content.
+"""
+import mmap
+import os
+import re
+
+SECTION_SEPARATOR = re.compile(rb':::::::*')
+
+
+class MoreFormatArchive:
+    """
+    Memory-mapped reader for the `more *` format described at the top of this module.
+
+    The file is scanned once to build an index of section name -> (start, end) byte offsets. Sections are
+    handed out as memoryview slices of the mapping, so no section content is copied until an extractor
+    actually reads from it.
+    """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.index: dict[str, tuple[int, int]] = {}
+        self._file = None
+        self._mmap = None
+        self._buffer: memoryview = None
+        self._views: list[memoryview] = []
+
+    def open(self):
+        self._file = open(self.file_path, "rb")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            # mmap refuses to map empty files
+            self._buffer = memoryview(b'')
+        else:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buffer = memoryview(self._mmap)
+        self.index = build_section_index(self._buffer)
+        return self
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        if self._buffer is None:
+            self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __contains__(self, section_name):
+        return section_name in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def section(self, section_name: str) -> memoryview:
+        start, end = self.index[section_name]
+        view = self._buffer[start:end]
+        self._views.append(view)
+        return view
+
+    def sections(self):
+        for section_name in self.index:
+            yield section_name, self.section(section_name)
+
+
+def build_section_index(buffer) -> dict[str, tuple[int, int]]:
+    # splitting rule of the module docstring, on byte offsets instead of copies of the pieces
+    separators = [(match.start(), match.end()) for match in SECTION_SEPARATOR.finditer(buffer)]
+    if len(separators) % 2 != 0:
+        raise ValueError("Given list length is not divisible by n")
+    ret = {}
+    total_length = len(buffer)
+    for i in range(0, len(separators), 2):
+        name_start = separators[i][1]
+        name_end = separators[i + 1][0]
+        content_start = separators[i + 1][1]
+        content_end = separators[i + 2][0] if i + 2 < len(separators) else total_length
+        file_name = bytes(buffer[name_start:name_end]).decode().strip()
+        ret[file_name] = (content_start, content_end)
+    return ret
+
+
+def as_buffer(content):
+    # Extractors work on bytes-like objects (memoryview sections of an archive). Plain strings are still
+    # accepted so the processors can be fed from anywhere.
+    if isinstance(content, str):
+        return content.encode()
+    return content
@@ -1,32 +1,42 @@
-import re
+from __future__ import annotations
+from typing import TYPE_CHECKING
 
-import pandas as pd
+import numpy as np
 
 from ResultProcessors import ResultProcessors
+from benchmark_scanner import scan_namd
+from sample_store import SampleStore
 from stats import GREATER_THAN_PHYSICAL, DEFAULT_STATS_TO_CONSIDER
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class NamdResultProcessor(ResultProcessors):
+    SECTION_PATTERNS = (r"namd_benchmark_result(?:_(?P<batch>\d+))?\.txt",)
+
     def __init__(self):
-        self.results = []
+        self.samples = SampleStore()
+
+    @property
+    def results(self) -> np.ndarray:
+        return self.samples.values
 
     def process(self, content) -> None:
-        temp = list(re.finditer(r"ATPase Simulation - (\d|,)+ Atoms:", content))[0]
-        content2 = content[temp.end(0):]
-        extracted_content = re.split(r"Average:", content2)[0]
-        benchmark_results_as_str = extracted_content.strip().split()
-        self.results += list(map(float, benchmark_results_as_str))
+        scan_namd(content, self)
 
-    def groups_to_values_mapping(self) -> dict[str, list[float]]:
+    def add_samples(self, values: list[float]) -> None:
+        self.samples.extend('', values)
+
+    def groups_to_values_mapping(self) -> dict[str, np.ndarray]:
         return {'': self.results}
 
     def stats_to_consider(self) -> list[tuple[str, callable]]:
         return DEFAULT_STATS_TO_CONSIDER + GREATER_THAN_PHYSICAL
 
+    def sample_groups(self):
+        yield '', self.samples.labels, self.samples.codes, self.samples.values
+
     def as_dataframe(self) -> pd.DataFrame:
-        data = []
-        for value in self.results:
-            data.append({
-                'days/ns': value,
-            })
-        return pd.DataFrame(data)
+        import pandas as pd
+        return pd.DataFrame({'days/ns': self.results}, copy=False)
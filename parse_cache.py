@@ -0,0 +1,108 @@
+import argparse
+import hashlib
+import os
+import pickle
+
+from service_parser import ParsedService, PARSER_VERSION, SECTION_ROUTER
+
+DEFAULT_CACHE_DIR = "./.cache/parsed"
+DEFAULT_MAX_SIZE_BYTES = 512 * 1024 * 1024
+
+
+def archive_key(file_path: str) -> str:
+    # hash of the archive content, of the parser that reads it and of the sections it filters out
+    with open(file_path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256")
+    digest.update(f"parser-version:{PARSER_VERSION};filters:{SECTION_ROUTER.filters_fingerprint()}".encode())
+    return digest.hexdigest()
+
+
+class ParseCache:
+    # On-disk cache of ParsedService objects, keyed by the hash of the archive content, PARSER_VERSION and the section
+    # filters of service_parser.SECTION_ROUTER.
+    # Entries are evicted least-recently-used first once the folder grows past max_size_bytes.
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_bytes=DEFAULT_MAX_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+
+    def key(self, file_path: str) -> str:
+        return archive_key(file_path)
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+
+    def load(self, key: str, openstack_service_name: str) -> ParsedService | None:
+        path = self.entry_path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                parsed: ParsedService = pickle.load(f)
+        except Exception as e:
+            print(f"Discarding unreadable cache entry {path}. Reason: {e}")
+            self.remove(key)
+            return None
+        os.utime(path)  # mark as recently used
+        # same content may have been saved under another file name
+        parsed.openstack_service_name = openstack_service_name
+        return parsed
+
+    def store(self, key: str, parsed: ParsedService):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.entry_path(key)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as f:
+            pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def remove(self, key: str):
+        path = self.entry_path(key)
+        if os.path.isfile(path):
+            os.unlink(path)
+
+    def entries(self) -> list[os.DirEntry]:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [entry for entry in os.scandir(self.cache_dir) if entry.is_file() and entry.name.endswith(".pickle")]
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry.stat().st_mtime)
+        total_size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            total_size -= entry.stat().st_size
+            os.unlink(entry.path)
+
+    def invalidate(self, file_paths: list[str] = None) -> int:
+        # Without file_paths, the whole cache is dropped. Returns the number of removed entries.
+        if not file_paths:
+            entries = self.entries()
+            for entry in entries:
+                os.unlink(entry.path)
+            return len(entries)
+        removed = 0
+        for file_path in file_paths:
+            key = self.key(file_path)
+            if os.path.isfile(self.entry_path(key)):
+                self.remove(key)
+                removed += 1
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the cache of parsed benchmark archives")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    invalidate = subparsers.add_parser("invalidate", help="remove cached entries (all of them if no file is given)")
+    invalidate.add_argument("files", nargs="*", help="archives inside ./data whose cached result should be dropped")
+    args = parser.parse_args()
+
+    if args.command == "invalidate":
+        removed = ParseCache(args.cache_dir).invalidate(args.files)
+        print(f"Removed {removed} cache entries")
+
+
+if __name__ == "__main__":
+    main()
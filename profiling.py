@@ -0,0 +1,189 @@
+"""
+Opt-in instrumentation of the pipeline stages. Wrap a stage in `with profiling.stage("name", items=...)`; once
+profiling.enable() has been called, every stage records its wall time, CPU time, peak traced memory, the peak RSS of
+the process and its item counts. profiling.save() writes them as a summary (profile.json) and as a Chrome trace
+(trace.json, open it in chrome://tracing or https://ui.perfetto.dev).
+
+While profiling is disabled, stage() returns a shared do-nothing context manager.
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def add(self, **items):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage:
+    def __init__(self, profiler: Profiler, name: str, items: dict):
+        self.profiler = profiler
+        self.name = name
+        self.items = dict(items)
+        self.children_peak = 0
+
+    def add(self, **items):
+        for key, value in items.items():
+            self.items[key] = self.items.get(key, 0) + value
+
+    def __enter__(self):
+        stack = self.profiler.stack()
+        if self.profiler.trace_memory:
+            # the peak of tracemalloc is process wide: the parent keeps the peak reached before this stage
+            if stack:
+                stack[-1].children_peak = max(stack[-1].children_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self.path = " > ".join([stage.name for stage in stack] + [self.name])
+        stack.append(self)
+        self.timestamp = time.time_ns() // 1000
+        self.cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu_start
+        stack = self.profiler.stack()
+        stack.pop()
+        arguments = {'cpu_ms': round(cpu * 1000, 3), **self.items}
+        if self.profiler.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.children_peak)
+            if stack:
+                stack[-1].children_peak = max(stack[-1].children_peak, peak)
+            arguments['peak_traced_kb'] = round(peak / 1024, 1)
+        if resource is not None:
+            arguments['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if exc_type is not None:
+            arguments['error'] = exc_type.__name__
+        self.profiler.events.append({
+            'name': self.name, 'cat': self.path, 'ph': 'X', 'ts': self.timestamp, 'dur': round(wall * 1e6, 1),
+            'pid': os.getpid(), 'tid': threading.get_ident(), 'args': arguments,
+        })
+        return False
+
+
+class Profiler:
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.events: list[dict] = []
+        self._local = threading.local()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stack(self) -> list[Stage]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def merge(self, events: list[dict]):
+        # events recorded by a worker process become children of the current stage
+        prefix = " > ".join(stage.name for stage in self.stack())
+        for event in events:
+            self.events.append(event | {'cat': f"{prefix} > {event['cat']}" if prefix else event['cat']})
+
+    def summary(self) -> list[dict]:
+        # one entry per stage path, in order of first appearance
+        ret: dict[str, dict] = {}
+        for event in self.events:
+            entry = ret.setdefault(event['cat'], {'stage': event['cat'], 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+            entry['calls'] += 1
+            entry['wall_s'] += event['dur'] / 1e6
+            for key, value in event['args'].items():
+                if key == 'cpu_ms':
+                    entry['cpu_s'] += value / 1000
+                elif key in ('peak_traced_kb', 'max_rss_kb'):
+                    entry[key] = max(entry.get(key, 0), value)
+                elif isinstance(value, (int, float)):
+                    entry[key] = entry.get(key, 0) + value
+        for entry in ret.values():
+            entry['wall_s'] = round(entry['wall_s'], 6)
+            entry['cpu_s'] = round(entry['cpu_s'], 6)
+        return list(ret.values())
+
+
+PROFILER: Profiler = None
+
+
+def enable(trace_memory=True) -> Profiler:
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = Profiler(trace_memory)
+    return PROFILER
+
+
+def disable():
+    global PROFILER
+    if PROFILER is not None and PROFILER.trace_memory:
+        tracemalloc.stop()
+    PROFILER = None
+
+
+def is_enabled() -> bool:
+    return PROFILER is not None
+
+
+def stage(name: str, **items):
+    if PROFILER is None:
+        return NULL_STAGE
+    return Stage(PROFILER, name, items)
+
+
+class ProfiledResult:
+    def __init__(self, result, events: list[dict]):
+        self.result = result
+        self.events = events
+
+
+def run_profiled(trace_memory: bool, func, *args, **kwargs) -> ProfiledResult:
+    # Runs inside a worker process: profiles func with a profiler of its own and sends its events back
+    global PROFILER
+    PROFILER = Profiler(trace_memory)
+    try:
+        return ProfiledResult(func(*args, **kwargs), PROFILER.events)
+    finally:
+        disable()
+
+
+def submit(executor, func, *args, **kwargs):
+    # executor.submit that keeps profiling inside worker processes; read the result with profiling.result(future)
+    if PROFILER is None:
+        return executor.submit(func, *args, **kwargs)
+    return executor.submit(run_profiled, PROFILER.trace_memory, func, *args, **kwargs)
+
+
+def result(future):
+    ret = future.result()
+    if isinstance(ret, ProfiledResult):
+        if PROFILER is not None:
+            PROFILER.merge(ret.events)
+        return ret.result
+    return ret
+
+
+def save(folder="./profile") -> tuple[str, str]:
+    os.makedirs(folder, exist_ok=True)
+    summary_path = os.path.join(folder, "profile.json")
+    trace_path = os.path.join(folder, "trace.json")
+    with open(summary_path, "w") as f:
+        json.dump(PROFILER.summary(), f, indent=1)
+    with open(trace_path, "w") as f:
+        json.dump({'traceEvents': PROFILER.events, 'displayTimeUnit': 'ms'}, f)
+    return summary_path, trace_path
@@ -1,46 +1,60 @@
-import re
+from __future__ import annotations
+from typing import TYPE_CHECKING
 
-import pandas as pd
+import numpy as np
 
 from ResultProcessors import ResultProcessors
+from benchmark_scanner import scan_pytorch
+from sample_store import SampleStore
 from stats import LESS_THAN_PHYSICAL, DEFAULT_STATS_TO_CONSIDER
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class PytorchResultProcessor(ResultProcessors):
+    SECTION_PATTERNS = (r"pytorch_benchmark_result\.txt",)
+
     def __init__(self):
-        self.results = {}
+        # samples are labelled by (model, batch size)
+        self.samples = SampleStore()
 
-    def process(self, content) -> None:
-        separator_beginning = list(re.finditer(r"Device: ([a-zA-Z0-9]+) - Batch Size: (\d+) - Model: ([a-zA-Z0-9\-_]+):", content))
-        separator_ending = list(re.finditer(r"Average: ([.0-9]+) batches/sec", content))
+    @property
+    def results(self) -> dict[tuple[str, int], np.ndarray]:
+        return self.samples.groups()
 
-        beginning: re.Match
-        ending: re.Match
-        for beginning, ending in zip(separator_beginning, separator_ending):
-            batch_size = int(beginning.group(2))
-            model = beginning.group(3)
+    def process(self, content) -> None:
+        scan_pytorch(content, self)
 
-            substring = content[beginning.end(0):ending.start(0)]
-            result = substring.split()
-            self.results[(model, batch_size)] = list(map(float, result))
+    def add_batch_result(self, model: str, batch_size: int, values: list[float]) -> None:
+        self.samples.replace((model, batch_size), values)
 
-    def groups_to_values_mapping(self) -> dict[str, list[float]]:
+    def models(self) -> dict[str, list[tuple[str, int]]]:
         ret = {}
-        for (model, batch_size), values in self.results.items():
+        for model, batch_size in self.samples.labels:
             if model not in ret:
                 ret[model] = []
-            ret[model].extend(values)
+            ret[model].append((model, batch_size))
         return ret
 
+    def groups_to_values_mapping(self) -> dict[str, np.ndarray]:
+        return {model: self.samples.select(labels) for model, labels in self.models().items()}
+
     def stats_to_consider(self) -> list[tuple[str, callable]]:
         return DEFAULT_STATS_TO_CONSIDER + LESS_THAN_PHYSICAL
 
+    def sample_groups(self):
+        # grouped by model, sub-key: batch size
+        batch_sizes = [batch_size for _, batch_size in self.samples.labels]
+        for model, labels in self.models().items():
+            rows = np.isin(self.samples.codes, [self.samples.code_of(label) for label in labels])
+            yield model, batch_sizes, self.samples.codes[rows], self.samples.values[rows]
+
     def as_dataframe(self) -> pd.DataFrame:
-        data = []
-        for model, values in self.groups_to_values_mapping().items():
-            for value in values:
-                data.append({
-                    'model': model,
-                    'batches/second': value,
-                })
-        return pd.DataFrame(data)
\ No newline at end of file
+        import pandas as pd
+        models = list(self.models().keys())
+        label_to_model_code = np.array([models.index(model) for model, _ in self.samples.labels], dtype=np.int64)
+        return pd.DataFrame({
+            'model': pd.Categorical.from_codes(label_to_model_code[self.samples.codes], categories=models),
+            'batches/second': self.samples.values,
+        }, copy=False)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Callable
+
+# Requests per minute allowed for each Google API (per user quotas of the service account)
+GOOGLE_QUOTAS_PER_MINUTE = {
+    "sheets": 60,
+    "slides": 60,
+    "drive": 600,
+}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+maximum_backoff = 64
+
+
+class TokenBucket:
+    # `rate` tokens per second refill the bucket up to `capacity`; every request takes one token
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            self.sleep(wait)
+
+    def pause(self, seconds: float):
+        # The API said the quota is used up: nobody sends anything for a while, and the bucket starts empty
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self.tokens = 0
+
+
+class RequestScheduler:
+    # Every Google API call goes through here. Calls are throttled by a token bucket per API, retried with
+    # jittered exponential backoff (or the server's Retry-After) on quota and server errors, and return real
+    # futures so errors reach the caller.
+    def __init__(self, quotas_per_minute: dict[str, int] = None, workers=2, max_attempts=8, base_backoff=1.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        quotas_per_minute = quotas_per_minute or GOOGLE_QUOTAS_PER_MINUTE
+        self.buckets = {quota: TokenBucket(per_minute / 60, per_minute, clock, sleep)
+                        for quota, per_minute in quotas_per_minute.items()}
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self._executor: ThreadPoolExecutor = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def submit(self, quota: str, func: Callable, *args, **kwargs) -> Future:
+        return self.executor.submit(self._run_in_worker, quota, func, args, kwargs)
+
+    def call(self, quota: str, func: Callable, *args, **kwargs):
+        # Blocking call. Called from one of the scheduler's own workers it runs inline instead of waiting for
+        # another worker, which could never come if every worker is waiting the same way.
+        if getattr(self._local, "is_worker", False):
+            return self._with_retries(quota, func, args, kwargs)
+        return self.submit(quota, func, *args, **kwargs).result()
+
+    async def run(self, quota: str, func: Callable, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(quota, func, *args, **kwargs))
+
+    def spawn(self, func: Callable, *args, **kwargs) -> Future:
+        # Runs a task made of several API calls on a worker; its calls are throttled and retried one by one
+        return self.executor.submit(self._spawned, func, args, kwargs)
+
+    def execute(self, quota: str, request):
+        # googleapiclient request objects (service.files().list(...), ...)
+        return self.call(quota, request.execute)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="google-api")
+            return self._executor
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _run_in_worker(self, quota, func, args, kwargs):
+        self._local.is_worker = True
+        return self._with_retries(quota, func, args, kwargs)
+
+    def _spawned(self, func, args, kwargs):
+        self._local.is_worker = True
+        return func(*args, **kwargs)
+
+    def _with_retries(self, quota, func, args, kwargs):
+        bucket = self.buckets[quota]
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                retry_after = retry_after_of(e)
+                if retry_after is None or attempt >= self.max_attempts:
+                    raise
+                # full jitter, but never earlier than the server asked for
+                delay = max(retry_after, random.uniform(0, min(maximum_backoff, self.base_backoff * 2 ** attempt)))
+                print(f"{quota} request failed ({type(e).__name__}), retry {attempt} in {delay:.1f}s")
+                bucket.pause(delay)
+
+
+def retry_after_of(error: Exception) -> float | None:
+    # Seconds to wait before retrying, or None when the error is not worth retrying. Understands
+    # gspread.exceptions.APIError (requests response) and googleapiclient.errors.HttpError (httplib2 response).
+    # requests.Response is falsy for error statuses, so it is compared with None
+    response = getattr(error, "response", None)
+    if response is None:
+        response = getattr(error, "resp", None)
+    if response is None:
+        return None
+    status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    text = getattr(response, "text", None) or str(error)
+    if int(status or 0) not in RETRYABLE_STATUS_CODES and "Quota exceeded" not in text \
+            and "rateLimitExceeded" not in text:
+        return None
+    headers = getattr(response, "headers", response)
+    header = (headers.get("retry-after") or headers.get("Retry-After")) if hasattr(headers, "get") else None
+    if header is None:
+        return 0
+    try:
+        return max(float(header), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(header).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+# Shared by the Sheets, Drive and Slides code, so they all respect the same quotas
+scheduler = RequestScheduler()
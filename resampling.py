@@ -0,0 +1,123 @@
+from __future__ import annotations
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+import profiling
+
+if TYPE_CHECKING:
+    from stats_recap import StatRecapPerOpenStackService
+
+# Resamples drawn per group, for the bootstrap and the permutation test each
+RESAMPLES = 10_000
+CONFIDENCE = 0.95
+# Indices drawn by one array operation at most (32 MB of int64); a group is resampled in as many chunks as needed
+MAX_DRAWS_PER_CHUNK = 1 << 22
+# (stat name shown in the tables, function name the LaTeX variable is named after) of every resampled statistic
+RESAMPLED_STATS = [
+    ('Average ratio; CI low', 'ratio_ci_low'),
+    ('Average ratio; CI high', 'ratio_ci_high'),
+    ('≠ physical; permutation p-value', 'permutation_p_value'),
+]
+
+
+def resample_comparisons(all_openstack_service_stat_recap: list[StatRecapPerOpenStackService],
+                         comparison: StatRecapPerOpenStackService, resamples=RESAMPLES, seed=0,
+                         workers=1) -> dict[tuple[str, str, str], tuple[float, float, float]]:
+    # (service, benchmark, group) -> values of RESAMPLED_STATS, for every group of raw samples of every service but
+    # the comparison. Groups are independent and each one has its own random stream, derived from the seed and the
+    # names of the group, so the results do not depend on the number of workers nor on the other services.
+    tasks = {}
+    for openstack_service_stat_recap in all_openstack_service_stat_recap:
+        if openstack_service_stat_recap is comparison:
+            continue
+        service = openstack_service_stat_recap.openstack_service_name
+        comparison_per_benchmark_app = comparison.as_dict()
+        for benchmark_app, stat_per_benchmark_app in openstack_service_stat_recap.as_dict().items():
+            comparison_groups = comparison_per_benchmark_app[benchmark_app].grouping_to_stats_recap_mapping
+            for group, stat_recap in stat_per_benchmark_app.grouping_to_stats_recap_mapping.items():
+                current = as_samples(stat_recap.array_of_values)
+                baseline = as_samples(comparison_groups[group].array_of_values)
+                if current is None or baseline is None:
+                    continue
+                tasks[(service, benchmark_app, group)] = (
+                    current, baseline, stat_per_benchmark_app.higher_nominals_means_worse_performance, resamples,
+                    group_seed(seed, service, benchmark_app, group))
+    if workers is None or workers <= 1 or len(tasks) <= 1:
+        return {key: resample_comparison(*task) for key, task in tasks.items()}
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        futures = {key: profiling.submit(executor, resample_comparison, *task) for key, task in tasks.items()}
+        return {key: profiling.result(future) for key, future in futures.items()}
+
+
+def as_samples(values) -> np.ndarray | None:
+    # None for groups that only keep a summary of their samples, or too few to resample
+    if not isinstance(values, (np.ndarray, list)):
+        return None
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 1 or len(values) < 2:
+        return None
+    return values
+
+
+def group_seed(seed: int, *names: str) -> np.random.SeedSequence:
+    return np.random.SeedSequence([seed, zlib.crc32("/".join(names).encode())])
+
+
+def resample_comparison(current: np.ndarray, baseline: np.ndarray, higher_is_worse: bool, resamples=RESAMPLES,
+                        seed: np.random.SeedSequence = None, confidence=CONFIDENCE) -> tuple[float, float, float]:
+    # Percentile bootstrap confidence interval of the average ratio (same orientation as StatsStore.ratios, > 1 when
+    # the current service performs better) and two-sided permutation p-value of the difference of the averages.
+    current_seed, baseline_seed, permutation_seed = (seed or np.random.SeedSequence()).spawn(3)
+    current_means = bootstrap_means(current, resamples, np.random.default_rng(current_seed))
+    baseline_means = bootstrap_means(baseline, resamples, np.random.default_rng(baseline_seed))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = baseline_means / current_means if higher_is_worse else current_means / baseline_means
+    low, high = np.quantile(ratios, [(1 - confidence) / 2, (1 + confidence) / 2])
+    p_value = permutation_p_value(current, baseline, resamples, np.random.default_rng(permutation_seed))
+    return float(low), float(high), p_value
+
+
+def bootstrap_means(values: np.ndarray, resamples: int, rng: np.random.Generator) -> np.ndarray:
+    # averages of `resamples` samples drawn with replacement: one index matrix per chunk instead of one draw per
+    # resample
+    means = np.empty(resamples)
+    # narrow indices are drawn and gathered faster
+    dtype = np.int16 if len(values) <= np.iinfo(np.int16).max else np.int64
+    for start, stop in chunks(resamples, len(values)):
+        means[start:stop] = values[rng.integers(0, len(values), size=(stop - start, len(values)),
+                                                dtype=dtype)].mean(axis=1)
+    return means
+
+
+def permutation_p_value(current: np.ndarray, baseline: np.ndarray, resamples: int, rng: np.random.Generator) -> float:
+    # Every permutation splits the pooled samples in two groups of the original sizes. Only the members of the smaller
+    # group are drawn and summed, the sum of the other one is the rest.
+    pooled = np.concatenate([current, baseline])
+    total = pooled.sum()
+    observed = abs(current.mean() - baseline.mean())
+    # differences equal to the observed one up to rounding count as at least as extreme
+    tolerance = 1e-9 * max(1., np.abs(pooled).max())
+    drawn = min(len(current), len(baseline))
+    extreme = 0
+    for start, stop in chunks(resamples, len(pooled)):
+        drawn_sums = pooled[random_subsets(stop - start, len(pooled), drawn, rng)].sum(axis=1)
+        current_sums = drawn_sums if drawn == len(current) else total - drawn_sums
+        differences = np.abs(current_sums / len(current) - (total - current_sums) / len(baseline))
+        extreme += np.count_nonzero(differences >= observed - tolerance)
+    return float((extreme + 1) / (resamples + 1))
+
+
+def random_subsets(count: int, length: int, size: int, rng: np.random.Generator) -> np.ndarray:
+    # `count` subsets of `size` elements of range(length), one per row: the first `size` slots of a random permutation.
+    # argpartition only moves the `size` smallest random keys in front, O(length) per row instead of a full sort.
+    keys = rng.random((count, length))
+    return np.argpartition(keys, size - 1, axis=1)[:, :size]
+
+
+def chunks(resamples: int, sample_count: int):
+    size = max(1, MAX_DRAWS_PER_CHUNK // sample_count)
+    for start in range(0, resamples, size):
+        yield start, min(start + size, resamples)
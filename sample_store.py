@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import Hashable, Iterable
+
+import numpy as np
+
+MAXIMUM_GROUPS = np.iinfo(np.uint16).max + 1
+
+
+class SampleStore:
+    # Contiguous array of samples, each tagged with a small categorical code that refers to `labels`.
+    # The arrays grow by doubling their capacity, so appending is amortised O(1).
+    def __init__(self, dtype=np.float64, initial_capacity=64):
+        self._values = np.empty(initial_capacity, dtype=dtype)
+        self._codes = np.empty(initial_capacity, dtype=np.uint16)
+        self._size = 0
+        self.labels: list[Hashable] = []
+        self._label_to_code: dict[Hashable, int] = {}
+        # per code: first row, row after the last one, and number of rows. A group is contiguous when
+        # stop - start == count, in which case it can be handed out as a view.
+        self._starts: list[int] = []
+        self._stops: list[int] = []
+        self._counts: list[int] = []
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, label):
+        return label in self._label_to_code
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_values'] = self.values.copy()
+        state['_codes'] = self.codes.copy()
+        return state
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:self._size]
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._codes[:self._size]
+
+    def code_of(self, label) -> int:
+        if label not in self._label_to_code:
+            if len(self.labels) >= MAXIMUM_GROUPS:
+                raise OverflowError(f"SampleStore supports at most {MAXIMUM_GROUPS} groups")
+            self._label_to_code[label] = len(self.labels)
+            self.labels.append(label)
+            self._starts.append(0)
+            self._stops.append(0)
+            self._counts.append(0)
+        return self._label_to_code[label]
+
+    def extend(self, label, values: Iterable[float]):
+        values = np.asarray(values, dtype=self._values.dtype)
+        code = self.code_of(label)
+        start = self._size
+        stop = start + len(values)
+        self._reserve(stop)
+        self._values[start:stop] = values
+        self._codes[start:stop] = code
+        self._size = stop
+
+        if self._counts[code] == 0:
+            self._starts[code] = start
+        self._stops[code] = stop
+        self._counts[code] += len(values)
+
+    def append(self, label, value: float):
+        self.extend(label, (value,))
+
+    def replace(self, label, values: Iterable[float]):
+        # Same semantics as assigning to a dict key: the label keeps its position in `labels`
+        values = np.asarray(values, dtype=self._values.dtype)
+        if label not in self._label_to_code:
+            self.extend(label, values)
+            return
+        code = self._label_to_code[label]
+        if self._counts[code] == len(values) and self._is_contiguous(code):
+            self._values[self._starts[code]:self._stops[code]] = values
+            return
+        self._remove_rows(code)
+        self.extend(label, values)
+
+    def group(self, label) -> np.ndarray:
+        code = self._label_to_code[label]
+        if self._is_contiguous(code):
+            return self._values[self._starts[code]:self._stops[code]]
+        return self.values[self.codes == code]
+
+    def select(self, labels: list) -> np.ndarray:
+        # Values of several labels, in the order of `labels`. A view when they lie next to each other.
+        codes = [self._label_to_code[label] for label in labels]
+        non_empty = [code for code in codes if self._counts[code] > 0]
+        if not non_empty:
+            return self._values[:0]
+        adjacent = all(self._is_contiguous(code) for code in non_empty) and all(
+            self._stops[previous] == self._starts[current] for previous, current in zip(non_empty, non_empty[1:]))
+        if adjacent:
+            return self._values[self._starts[non_empty[0]]:self._stops[non_empty[-1]]]
+        return np.concatenate([self.group(self.labels[code]) for code in non_empty])
+
+    def groups(self) -> dict[Hashable, np.ndarray]:
+        return {label: self.group(label) for label in self.labels}
+
+    def _is_contiguous(self, code: int) -> bool:
+        return self._stops[code] - self._starts[code] == self._counts[code]
+
+    def _reserve(self, size: int):
+        capacity = len(self._values)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity = max(capacity * 2, 1)
+        values = np.empty(capacity, dtype=self._values.dtype)
+        codes = np.empty(capacity, dtype=self._codes.dtype)
+        values[:self._size] = self.values
+        codes[:self._size] = self.codes
+        self._values = values
+        self._codes = codes
+
+    def _remove_rows(self, code: int):
+        keep = self.codes != code
+        remaining = int(keep.sum())
+        self._values[:remaining] = self.values[keep]
+        self._codes[:remaining] = self.codes[keep]
+        self._size = remaining
+        self._reindex()
+
+    def _reindex(self):
+        codes = self.codes
+        for code in range(len(self.labels)):
+            rows = np.flatnonzero(codes == code)
+            self._counts[code] = len(rows)
+            self._starts[code] = int(rows[0]) if len(rows) else 0
+            self._stops[code] = int(rows[-1]) + 1 if len(rows) else 0
@@ -0,0 +1,67 @@
+from __future__ import annotations
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from ResultProcessors import ResultProcessors
+from stats_store import Categories
+
+CATEGORICAL_COLUMNS = ['service', 'benchmark', 'group', 'sub_key']
+
+
+class SampleTable:
+    # Every raw sample of every service in long format: service, benchmark (Glmark2, NAMD, PyTorch), group
+    # (resolution, model, ...), sub_key (glmark2 step, PyTorch batch size, ...) and value. The first four columns
+    # are categorical, in order of first appearance; value is float64. Built once from the processors, stored as
+    # Parquet next to the stats artifact, and read through grouped views instead of one boolean mask per chart.
+    # The stats do not read it: they keep the int or float samples of the processors, whose formatting the LaTeX
+    # output prints, where value is always float64.
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def __len__(self):
+        return len(self.frame)
+
+    @staticmethod
+    def from_processors(processors_per_benchmark: dict[str, dict[str, ResultProcessors]]) -> SampleTable:
+        categories = {column: Categories() for column in CATEGORICAL_COLUMNS}
+        codes = {column: [] for column in CATEGORICAL_COLUMNS}
+        values = []
+        for benchmark, processors in processors_per_benchmark.items():
+            benchmark_code = categories['benchmark'].code_of(benchmark)
+            for service, processor in processors.items():
+                service_code = categories['service'].code_of(service)
+                for group, sub_keys, sub_key_codes, group_values in processor.sample_groups():
+                    count = len(group_values)
+                    sub_key_code_of = np.array([categories['sub_key'].code_of(str(sub_key)) for sub_key in sub_keys],
+                                               dtype=np.int32)
+                    codes['service'].append(np.full(count, service_code, dtype=np.int32))
+                    codes['benchmark'].append(np.full(count, benchmark_code, dtype=np.int32))
+                    codes['group'].append(np.full(count, categories['group'].code_of(group), dtype=np.int32))
+                    codes['sub_key'].append(sub_key_code_of[sub_key_codes])
+                    values.append(np.asarray(group_values, dtype=np.float64))
+        frame = pd.DataFrame({
+            column: pd.Categorical.from_codes(np.concatenate(codes[column]) if codes[column] else np.empty(0, np.int32),
+                                              categories=categories[column].labels)
+            for column in CATEGORICAL_COLUMNS
+        } | {'value': np.concatenate(values) if values else np.empty(0, np.float64)})
+        return SampleTable(frame)
+
+    @staticmethod
+    def read_parquet(path: str) -> SampleTable:
+        return SampleTable(pd.read_parquet(path))
+
+    def to_parquet(self, path: str):
+        self.frame.to_parquet(path, index=False)
+
+    def groups(self, benchmark: str) -> Iterator[tuple[str, pd.DataFrame]]:
+        # the samples of every group of `benchmark`, groups in order of first appearance
+        samples = self.frame[self.frame['benchmark'] == benchmark]
+        for group, group_samples in samples.groupby('group', observed=True, sort=False):
+            yield group, group_samples
+
+    def values_per_service(self, benchmark: str, group: str = '') -> dict[str, np.ndarray]:
+        samples = self.frame[(self.frame['benchmark'] == benchmark) & (self.frame['group'] == group)]
+        return {service: service_samples['value'].to_numpy()
+                for service, service_samples in samples.groupby('service', observed=True, sort=False)}
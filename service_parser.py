@@ -0,0 +1,82 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import profiling
+import namd_extractor
+import pytorch_extractor
+from extractor_registry import SectionRouter, SectionReport
+from glmark2_extractor import MultiresolutionGlmark2ResultProcessor
+from gpu_utilization_extractor import GpuUtilizzationExtractorBase
+from more_format_reader import MoreFormatArchive
+
+# Glmark2 resolutions (glmark2_benchmark_result_WxH.txt) included in the recap, the other ones are filtered out
+glmark2_resolutions = ['1920x1080', '1366x768', '360x800', '192x108']
+# NAMD batches (namd_benchmark_result_N.txt, nvidia_smi_namd_N.txt) included in the recap; None includes all of them
+openstack_namd_batch_range = range(0, 15)
+# Bump whenever the extractors or the state kept by the processors change, so that parse_cache.ParseCache entries
+# created by an older parser are not reused
+PARSER_VERSION = 7
+
+
+class ParsedService:
+    # Everything extracted from one file inside ./data. Only holds plain processor objects so that it can be
+    # pickled back from a worker process.
+    def __init__(self, openstack_service_name: str):
+        self.openstack_service_name = openstack_service_name
+        self.glmark2_processor = MultiresolutionGlmark2ResultProcessor().add_resolutions(glmark2_resolutions)
+        self.pytorch_processor = pytorch_extractor.PytorchResultProcessor()
+        self.namd_processor = namd_extractor.NamdResultProcessor()
+        self.gpu_util_processor = GpuUtilizzationExtractorBase()
+        self.section_report = SectionReport()
+
+
+SECTION_ROUTER = (
+    SectionRouter({'batch': openstack_namd_batch_range, 'resolution': glmark2_resolutions})
+    .register('glmark2_processor', MultiresolutionGlmark2ResultProcessor)
+    .register('pytorch_processor', pytorch_extractor.PytorchResultProcessor)
+    .register('namd_processor', namd_extractor.NamdResultProcessor)
+    .register('gpu_util_processor', GpuUtilizzationExtractorBase)
+    .compile()
+)
+
+
+def parse_service(openstack_service_name: str, file_path: str) -> ParsedService:
+    print(openstack_service_name)
+    parsed = ParsedService(openstack_service_name)
+    with profiling.stage(openstack_service_name, files=1) as stage, MoreFormatArchive(file_path) as archive:
+        for benchmark_type, content in archive.sections():
+            SECTION_ROUTER.dispatch(parsed, benchmark_type, content, parsed.section_report)
+            stage.add(sections=1, bytes=len(content))
+    return parsed
+
+
+def report_sections(parsed_services: dict[str, ParsedService]):
+    for name, parsed in parsed_services.items():
+        for line in parsed.section_report.summary():
+            print(f"{name}: {line}")
+
+
+def parse_services(files: dict[str, str], workers: int = 1, cache=None) -> dict[str, ParsedService]:
+    # files: openstack service name -> archive path. The returned dict keeps the ordering of `files`,
+    # regardless of which worker finished first. `cache` is an optional parse_cache.ParseCache; only archives
+    # missing from it are parsed.
+    ret = {}
+    cache_keys = {}
+    if cache is not None:
+        for name, file_path in files.items():
+            cache_keys[name] = cache.key(file_path)
+            ret[name] = cache.load(cache_keys[name], name)
+    to_be_parsed = {name: file_path for name, file_path in files.items() if ret.get(name) is None}
+
+    if workers is None or workers <= 1 or len(to_be_parsed) <= 1:
+        parsed_services = {name: parse_service(name, file_path) for name, file_path in to_be_parsed.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(to_be_parsed))) as executor:
+            futures = {name: profiling.submit(executor, parse_service, name, file_path)
+                       for name, file_path in to_be_parsed.items()}
+            parsed_services = {name: profiling.result(future) for name, future in futures.items()}
+
+    for name, parsed in parsed_services.items():
+        ret[name] = parsed
+        if cache is not None:
+            cache.store(cache_keys[name], parsed)
+    return {name: ret[name] for name in files}
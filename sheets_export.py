@@ -0,0 +1,104 @@
+from __future__ import annotations
+import math
+from typing import Callable
+
+import numpy as np
+
+
+class WorkbookExportPlan:
+    # Collects the writes of every tab (creating the tab, resizing it, unmerging, clearing, the values and the
+    # merges) and sends them all as a single spreadsheets.batchUpdate. The Sheets API applies the requests of
+    # one batchUpdate in order and atomically, so a tab created by addSheet can be written in the same call.
+    def __init__(self, document):
+        # document: gspread.Spreadsheet, or fake_gspread.FakeSpreadsheet
+        self.document = document
+        self.worksheets = {worksheet.title: worksheet for worksheet in document.worksheets()}
+        self.next_sheet_id = max([worksheet.id for worksheet in self.worksheets.values()], default=0) + 1
+        self.added_sheets: list[dict] = []
+        self.requests: list[dict] = []
+
+    def write_table(self, title: str, table: list[list], merge_columns=(), clear=True, unmerge=True):
+        # merge_columns: indexes of the columns whose adjacent equal values are merged into one cell
+        row_count = len(table)
+        column_count = max(map(len, table), default=0)
+        sheet_id = self.sheet_id(title, row_count, column_count)
+        if unmerge:
+            self.requests.append({"unmergeCells": {"range": {"sheetId": sheet_id}}})
+        if clear:
+            self.requests.append({"updateCells": {"range": {"sheetId": sheet_id}, "fields": "userEnteredValue"}})
+        self.requests.append({"updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [{"values": [cell_data(value) for value in row]} for row in table],
+            "fields": "userEnteredValue",
+        }})
+        for column in merge_columns:
+            column_values = [row[column] if column < len(row) else None for row in table]
+            for start, stop in adjacent_equal_runs(column_values):
+                self.requests.append({"mergeCells": {
+                    "range": {"sheetId": sheet_id, "startRowIndex": start, "endRowIndex": stop,
+                              "startColumnIndex": column, "endColumnIndex": column + 1},
+                    "mergeType": "MERGE_ALL",
+                }})
+
+    def sheet_id(self, title: str, row_count: int, column_count: int) -> int:
+        # Unlike values.update, updateCells does not grow the grid, so the tab is sized for the table first
+        for added_sheet in self.added_sheets:
+            properties = added_sheet["addSheet"]["properties"]
+            if properties["title"] == title:
+                grid = properties["gridProperties"]
+                grid["rowCount"] = max(grid["rowCount"], row_count)
+                grid["columnCount"] = max(grid["columnCount"], column_count)
+                return properties["sheetId"]
+        if title not in self.worksheets:
+            sheet_id = self.next_sheet_id
+            self.next_sheet_id += 1
+            self.added_sheets.append({"addSheet": {"properties": {
+                "sheetId": sheet_id, "title": title,
+                "gridProperties": {"rowCount": max(row_count, 1), "columnCount": max(column_count, 1)},
+            }}})
+            return sheet_id
+        worksheet = self.worksheets[title]
+        if worksheet.row_count < row_count or worksheet.col_count < column_count:
+            self.requests.append({"updateSheetProperties": {
+                "properties": {"sheetId": worksheet.id, "gridProperties": {
+                    "rowCount": max(worksheet.row_count, row_count),
+                    "columnCount": max(worksheet.col_count, column_count),
+                }},
+                "fields": "gridProperties.rowCount,gridProperties.columnCount",
+            }})
+        return worksheet.id
+
+    def execute(self, batch_update: Callable[[dict], dict] = None) -> int:
+        # Returns the number of requests inside the batch; batch_update defaults to document.batch_update
+        requests = self.added_sheets + self.requests
+        if not requests:
+            return 0
+        (batch_update or self.document.batch_update)({"requests": requests})
+        self.added_sheets = []
+        self.requests = []
+        return len(requests)
+
+
+def adjacent_equal_runs(values: list) -> list[tuple[int, int]]:
+    # (start, stop) of every run of at least two equal adjacent values; single cells need no merge
+    ret = []
+    start = 0
+    for i in range(1, len(values) + 1):
+        if i == len(values) or values[i] != values[start]:
+            if i - start > 1:
+                ret.append((start, i))
+            start = i
+    return ret
+
+
+def cell_data(value) -> dict:
+    # Same as writing the value with value_input_option RAW
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
@@ -1,15 +1,14 @@
-import time
-
-import gspread
-from gspread import Worksheet
 
 import glmark2_extractor
 import namd_extractor
 import pytorch_extractor
 from glmark2_extractor import Glmark2ResultProcessor, MultiresolutionGlmark2ResultProcessor
+from sample_table import SampleTable
 from stats import major_grouping_by_stat_name
 from stats_recap import StatRecapPerOpenStackService
-from thread_pool_worker import WorkerPool, maximum_backoff
+from stats_store import StatsStore
+from request_scheduler import scheduler
+from sheets_export import WorkbookExportPlan
 from utils import transpose, combine_dicts, flatten_dict_of_list, flatten_arrays, get_column, \
     iterate_dict_items_based_on_list_ordering, groupby_and_select
 
@@ -22,17 +21,26 @@ class SpreadsheetLogic:
     def __init__(self, openstack_services_recap: dict[str, StatRecapPerOpenStackService],
                  glmark_processors: dict[str, MultiresolutionGlmark2ResultProcessor],
                  namd_processors: dict[str, namd_extractor.NamdResultProcessor],
-                 pytorch_processors: dict[str, pytorch_extractor.PytorchResultProcessor], clear_sheet=True):
-        self.gc = gspread.service_account("./key/key.json")
+                 pytorch_processors: dict[str, pytorch_extractor.PytorchResultProcessor], clear_sheet=True,
+                 client=None, stats_store: StatsStore = None, sample_table: SampleTable = None):
+        # client: gspread client, e.g. fake_gspread.FakeClient() to run the export without Google
+        if client is None:
+            import gspread
+            client = gspread.service_account("./key/key.json")
+        self.gc = client
         self.url = "https://docs.google.com/spreadsheets/d/1tEoTYKBOAVweJ5HYzxigeq6tE--nBIjnK5f8EBO-JLk/edit#gid=0"
-        self.document = self.gc.open_by_url(self.url)
+        self.document = scheduler.call("sheets", self.gc.open_by_url, self.url)
 
         self.openstack_services_recap = openstack_services_recap
         self.glmark_processors = glmark_processors
         self.namd_processors = namd_processors
         self.pytorch_processors = pytorch_processors
-        self.worksheets: list[gspread.Worksheet] = self.document.worksheets()
-        self.workers = WorkerPool()
+        self.stats_store = stats_store if stats_store is not None else \
+            StatsStore.from_recaps(list(openstack_services_recap.values()))
+        self.sample_table = sample_table if sample_table is not None else SampleTable.from_processors(
+            {'Glmark2': glmark_processors, 'NAMD': namd_processors, 'PyTorch': pytorch_processors})
+        # every tab is written into this plan, which is sent as one batchUpdate at the end
+        self.plan: WorkbookExportPlan = None
         self.spreadsheet_prefix = "07 "
         self.clear_sheet = clear_sheet
 
@@ -40,10 +48,7 @@ class SpreadsheetLogic:
 
         headers = ["Benchmark",	"Group", "Stats"] + openstack_services
 
-        table = StatRecapPerOpenStackService.as_table(get_column(
-                list(iterate_dict_items_based_on_list_ordering(self.openstack_services_recap, openstack_services)),
-            1
-        ))
+        table = self.stats_store.as_table(openstack_services)
         table.insert(0, headers)
 
         self.draw_overview_table("Overview", table)
@@ -51,19 +56,14 @@ class SpreadsheetLogic:
         self.draw_overview_table("Overview by Stats", table)
 
     def draw_overview_table(self, sheetName, table):
-        rekap_ws = self.get_or_create_worksheets(self.spreadsheet_prefix + sheetName)
-        if self.clear_sheet:
-            rekap_ws.clear()
-        self.unmerge_sheet(rekap_ws)
-        handle_write_req_limit(rekap_ws.update)(table, "A1")
-        self.merge_adjacent_equal_rows(rekap_ws, get_column(table, 0), 'A', 1)
-        self.merge_adjacent_equal_rows(rekap_ws, get_column(table, 1), 'B', 1)
+        self.plan.write_table(self.spreadsheet_prefix + sheetName, table, merge_columns=(0, 1),
+                              clear=self.clear_sheet)
 
 
 
 
     async def process_spreadsheet(self,):
-        self.workers.start_workers(2)
+        self.plan = await scheduler.run("sheets", WorkbookExportPlan, self.document)
 
         openstack_service_ordering = list(self.namd_processors.keys())
         glmark2_grouped_by_resolution = await self.process_glmark2(openstack_service_ordering)
@@ -72,8 +72,8 @@ class SpreadsheetLogic:
 
         self.overview(openstack_service_ordering)
 
-        self.workers.stop_workers()
-        print("Done")
+        request_count = await scheduler.run("sheets", self.plan.execute)
+        print(f"Done, {request_count} requests in one batchUpdate")
 
     async def process_glmark2(self, openstack_service_ordering):
         openstack_service_names = openstack_service_ordering
@@ -101,12 +101,7 @@ class SpreadsheetLogic:
         for key, values in ret.items():
             table.append([*key, *values])
 
-        glmark2_ws = self.get_or_create_worksheets(self.spreadsheet_prefix + "Glmark2")
-        if self.clear_sheet:
-            handle_write_req_limit(glmark2_ws.clear)()
-        self.unmerge_sheet(glmark2_ws)
-        handle_write_req_limit(glmark2_ws.update)(table, "A1")
-        self.merge_adjacent_equal_rows(glmark2_ws, get_column(table, 0), 'A', 1)
+        self.plan.write_table(self.spreadsheet_prefix + "Glmark2", table, merge_columns=(0,), clear=self.clear_sheet)
         return grouped_by_resolution
 
 
@@ -115,14 +110,13 @@ class SpreadsheetLogic:
         for openstack_service in openstack_service_ordering:
             headers.append(f"{openstack_service} (days/ns)")
         body_opstck_svc_as_row = []
-        for openstack_service, benchmark in iterate_dict_items_based_on_list_ordering(self.namd_processors, openstack_service_ordering):
-            body_opstck_svc_as_row.append(benchmark.results)
+        values_per_service = self.sample_table.values_per_service("NAMD")
+        for openstack_service in openstack_service_ordering:
+            body_opstck_svc_as_row.append(values_per_service[openstack_service])
         body_opstck_svc_as_col = transpose(body_opstck_svc_as_row)
 
-        namd_ws = self.get_or_create_worksheets(self.spreadsheet_prefix + "NAMD")
-        if self.clear_sheet:
-            handle_write_req_limit(namd_ws.clear)()
-        handle_write_req_limit(namd_ws.update)([headers] + body_opstck_svc_as_col, "A1")
+        self.plan.write_table(self.spreadsheet_prefix + "NAMD", [headers] + body_opstck_svc_as_col,
+                              clear=self.clear_sheet, unmerge=False)
 
     async def process_pytorch(self, openstack_service_ordering):
         dictionaries = []
@@ -137,69 +131,11 @@ class SpreadsheetLogic:
         for (model, batch_size, tc_number), values in combined_dict.items():
             table.append([model, int(batch_size), tc_number, *values])
 
-        pytorch_ws = self.get_or_create_worksheets(self.spreadsheet_prefix + "PyTorch")
-        if self.clear_sheet:
-            handle_write_req_limit(pytorch_ws.clear)()
-        self.unmerge_sheet(pytorch_ws)
-        handle_write_req_limit(pytorch_ws.update)(table, "A1")
-        self.merge_adjacent_equal_rows(pytorch_ws, get_column(table, 0), 'A', 1)
-        self.merge_adjacent_equal_rows(pytorch_ws, get_column(table, 1), 'B', 1)
+        self.plan.write_table(self.spreadsheet_prefix + "PyTorch", table, merge_columns=(0, 1),
+                              clear=self.clear_sheet)
         return combined_dict
 
 
-    def get_or_create_worksheets(self, name):
-        for ws in self.worksheets:
-            if ws.title == name:
-                return ws
-        worksheet = self.document.add_worksheet(name, 0, 0)
-        self.worksheets.append(name)
-        return worksheet
-
-    def merge_adjacent_equal_rows(self, worksheet: Worksheet, row_values: list, column_spreadsheet_index='A', row_spreadsheet_start_index=1):
-        if len(row_values) == 0:
-            return
-        prev_value = row_values[0]
-        start = 0
-        end = 0
-
-        def get_task(start, end):
-            return lambda: worksheet.merge_cells(
-                f"{column_spreadsheet_index}{start+row_spreadsheet_start_index}:{column_spreadsheet_index}{end+row_spreadsheet_start_index}")
-
-        for i, value in enumerate(row_values):
-            if value != prev_value:
-                self.workers.add_task(get_task(start, end))
-                start = i
-                prev_value = value
-            end = i
-        self.workers.add_task(get_task(start, end))
-
-    def unmerge_sheet(self, worksheet):
-        requests = [
-            {
-                "unmergeCells": {
-                    "range": {"sheetId": worksheet.id}
-                }
-            }
-        ]
-        handle_write_req_limit(self.document.batch_update)({"requests": requests})
-
-def handle_write_req_limit(func):
-    sleep_time = 1
-    def wrapper(*args):
-        nonlocal  sleep_time
-        while True:
-            try:
-                return func(*args)
-            except gspread.exceptions.APIError as e:
-                if 'Quota exceeded for quota metric' not in e.response.text:
-                    raise e
-                time.sleep(sleep_time)
-                sleep_time = min(sleep_time*2 , maximum_backoff)
-    return wrapper
-
-
-
 def func_to_str(func):
     return func.get_name()
 
@@ -0,0 +1,74 @@
+"""
+Startup-time regression check of main.py. In a fresh interpreter, measures `import main` and a cold
+`python main.py parse stats latex` on synthetic archives (see synthetic_archives.py), and checks that neither loads
+the heavy dependencies that only the charts, sheets and slides stages need. Exits with 1 when a budget is exceeded
+or a heavy module is imported. Usage:
+    python startup_check.py [--repeat N]
+"""
+from __future__ import annotations
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_archives import generate_dataset
+
+REPOSITORY = os.path.dirname(os.path.abspath(__file__))
+# modules that take hundreds of milliseconds to import each
+HEAVY_MODULES = ['pandas', 'pyarrow', 'scipy.stats', 'matplotlib', 'seaborn', 'dataframe_image', 'gspread',
+                 'googleapiclient', 'google.oauth2']
+# (name, stages given to main.main, budget in seconds including the start of the interpreter); the best of
+# --repeat runs is compared to the budget
+CHECKS = [
+    ("import main", [], 0.5),
+    ("parse stats latex", ['parse', 'stats', 'latex'], 1.0),
+]
+
+PROBE = """
+import asyncio, json, sys
+import main
+if sys.argv[1:]:
+    asyncio.run(main.main(sys.argv[1:]))
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def measure(stages: list[str], folder: str) -> tuple[float, list[str]]:
+    # seconds of the whole process, and the heavy modules it had imported at the end
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([REPOSITORY, os.environ.get("PYTHONPATH", "")]))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", PROBE, *stages], cwd=folder, env=environment,
+                            capture_output=True, text=True, check=True)
+    seconds = time.perf_counter() - start
+    modules = json.loads(result.stdout.splitlines()[-1])
+    return seconds, [module for module in HEAVY_MODULES if module in modules]
+
+
+def run(repeat=3) -> bool:
+    ok = True
+    with tempfile.TemporaryDirectory() as folder:
+        generate_dataset(os.path.join(folder, "data"))
+        print(f"{'check':<20}{'best s':>8}{'budget s':>10}  heavy modules")
+        for name, stages, budget in CHECKS:
+            timings = []
+            heavy_modules = set()
+            for _ in range(repeat):
+                # cold: nothing cached by the previous run
+                shutil.rmtree(os.path.join(folder, ".cache"), ignore_errors=True)
+                seconds, loaded = measure(stages, folder)
+                timings.append(seconds)
+                heavy_modules.update(loaded)
+            passed = min(timings) <= budget and not heavy_modules
+            ok &= passed
+            print(f"{name:<20}{min(timings):>8.3f}{budget:>10.2f}  {', '.join(sorted(heavy_modules)) or '-'}"
+                  f"  {'ok' if passed else 'FAILED'}")
+    return ok
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    repeat = int(arguments[arguments.index("--repeat") + 1]) if "--repeat" in arguments else 3
+    sys.exit(0 if run(repeat) else 1)
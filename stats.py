@@ -1,20 +1,38 @@
-from scipy.stats import ttest_ind
-from scipy.stats._result_classes import TtestResult
 import statistics
+from functools import singledispatch
 
+import numpy as np
+
+# avg, count and boxplot_samples dispatch on the type of the samples: groups that only keep a summary of their
+# samples (e.g. gpu_utilization_extractor.GpuUtilSummary) register their own implementation.
+@singledispatch
 def avg(arr, **_):
-    if not arr:
+    if len(arr) == 0:
         return ''
     return float(sum(arr) / len(arr))
 
 
 def stdev(arr, **_):
-    return statistics.stdev(arr)
+    return statistics.stdev(as_python_numbers(arr))
 
 
+@singledispatch
 def count(arr, **_):
     return len(arr)
 
+
+@singledispatch
+def boxplot_samples(arr) -> list:
+    # the samples written into the LaTeX boxplot of a group
+    return list(arr)
+
+
+def as_python_numbers(arr):
+    # the statistics module cannot do exact arithmetic on numpy integers
+    if isinstance(arr, np.ndarray):
+        return arr.tolist()
+    return arr
+
 def T_test_greater(physical_result: list):
     return CustomNamedFunction('> physical; p-value', lambda arr: t_test_wrappee(physical_result, arr, 'greater'))
 
@@ -26,12 +44,12 @@ def T_test_equal(physical_result: list):
 
 
 def t_test_wrappee(comparison, arr, alternative):
-    ret: TtestResult = ttest_ind(comparison, arr, alternative=alternative)
-    return ret.pvalue
+    return t_test_new_api(comparison, arr, alternative)
 
 def t_test_new_api(arr1, arr2, alternative,):
-    ret: TtestResult = ttest_ind(arr1, arr2, alternative=alternative)
-    return ret.pvalue
+    # scipy.stats takes about a second to import, only pay for it when a t-test runs on the raw samples
+    from scipy.stats import ttest_ind
+    return ttest_ind(arr1, arr2, alternative=alternative).pvalue
 
 
 class CustomNamedFunction:
@@ -59,27 +77,33 @@ def p_value_less(x, additional_argument):
     return t_test_new_api(x, additional_argument, 'less')
 
 def mininum(data, additional_argument):
-    return min(data)
+    return min(as_python_numbers(data))
 def maximum(data, additional_argument):
-    return max(data)
+    return max(as_python_numbers(data))
 def median(data, additional_argument):
-    return statistics.median(data)
+    return statistics.median(as_python_numbers(data))
 
 def lower_quantile(data, additional_argument):
-    q1, med, q3 = statistics.quantiles(data, n=4)
+    q1, med, q3 = statistics.quantiles(as_python_numbers(data), n=4)
     return q1
 
 
 def upper_quantile(data, additional_argument):
-    q1, med, q3 = statistics.quantiles(data, n=4)
+    q1, med, q3 = statistics.quantiles(as_python_numbers(data), n=4)
     return q3
 
 def lower_whisker(data, additional_argument):
-    q1, med, q3 = statistics.quantiles(data, n=4)
+    q1, med, q3 = statistics.quantiles(as_python_numbers(data), n=4)
     iqr = q3 - q1
     return q1 - 1.5*iqr
 
 
+def upper_whisker(data, additional_argument):
+    q1, med, q3 = statistics.quantiles(as_python_numbers(data), n=4)
+    iqr = q3 - q1
+    return q3 + 1.5*iqr
+
+
 
 
 DEFAULT_STATS_TO_CONSIDER = [
@@ -0,0 +1,80 @@
+from __future__ import annotations
+import hashlib
+import os
+import pickle
+from typing import TYPE_CHECKING
+
+from parse_cache import archive_key
+from stats_recap import StatRecapPerOpenStackService
+from stats_store import StatsStore
+
+if TYPE_CHECKING:
+    from sample_table import SampleTable
+
+DEFAULT_ARTIFACT_DIR = "./.cache/stats"
+# Bump whenever the calculated stats or the state kept by StatRecapPerOpenStackService / StatsStore change, so that
+# the artifact of an older version is not loaded
+STATS_VERSION = 5
+
+
+class StatsArtifact:
+    # Output of the stats stage of main (the StatRecapPerOpenStackService of every service and the StatsStore),
+    # pickled to disk so that the stages after it can run without parsing and calculating again, plus the
+    # SampleTable of the raw samples as Parquet. The files are named after the hash of the archives they were
+    # calculated from; only the artifact of the latest inputs is kept.
+    def __init__(self, artifact_dir=DEFAULT_ARTIFACT_DIR):
+        self.artifact_dir = artifact_dir
+
+    def key(self, files: dict[str, str], comparison_index: int) -> str:
+        digest = hashlib.sha256(f"stats-version:{STATS_VERSION};comparison:{comparison_index}".encode())
+        for name, file_path in files.items():
+            digest.update(f";{name}:{archive_key(file_path)}".encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.artifact_dir, f"{key}.pickle")
+
+    def samples_path(self, key: str) -> str:
+        return os.path.join(self.artifact_dir, f"{key}.samples.parquet")
+
+    def load(self, key: str) -> tuple[dict[str, StatRecapPerOpenStackService], StatsStore] | None:
+        path = self.path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Discarding unreadable stats artifact {path}. Reason: {e}")
+            os.unlink(path)
+            return None
+
+    def store(self, key: str, openstack_services: dict[str, StatRecapPerOpenStackService], stats_store: StatsStore):
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        path = self.path(key)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as f:
+            pickle.dump((openstack_services, stats_store), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+        for entry in os.scandir(self.artifact_dir):
+            if not entry.name.startswith(key):
+                os.unlink(entry.path)
+
+    def load_samples(self, key: str) -> SampleTable | None:
+        path = self.samples_path(key)
+        if not os.path.isfile(path):
+            return None
+        from sample_table import SampleTable
+        try:
+            return SampleTable.read_parquet(path)
+        except Exception as e:
+            print(f"Discarding unreadable sample table {path}. Reason: {e}")
+            os.unlink(path)
+            return None
+
+    def store_samples(self, key: str, sample_table: SampleTable):
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        path = self.samples_path(key)
+        temporary_path = f"{path}.tmp"
+        sample_table.to_parquet(temporary_path)
+        os.replace(temporary_path, path)
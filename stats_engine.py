@@ -0,0 +1,100 @@
+from __future__ import annotations
+from typing import Any, Callable
+
+import numpy as np
+
+from stats import avg, stdev, count, mininum, maximum, lower_quantile, median, upper_quantile, lower_whisker, \
+    upper_whisker
+
+# Summary statistics computed together for one group of samples. Each entry receives the samples as given,
+# the same samples sorted (sorted once per group) and the summary computed so far, so later entries can
+# build on earlier ones (e.g. whiskers from the quartiles).
+SUMMARY_STATS: dict[str, Callable[[np.ndarray, np.ndarray, dict[str, Any]], Any]] = {}
+# stats.py function -> SUMMARY_STATS key holding its result
+STAT_FUNCTION_TO_SUMMARY_KEY: dict[Callable, str] = {}
+
+
+def summary_stat(key: str, *stat_functions: Callable):
+    # Registers a summary statistic. Stat functions listed here are then served from the summary instead of
+    # being called one by one by StatsRecap.calculate_stats.
+    def decorator(compute):
+        SUMMARY_STATS[key] = compute
+        for stat_function in stat_functions:
+            STAT_FUNCTION_TO_SUMMARY_KEY[stat_function] = key
+        return compute
+    return decorator
+
+
+def describe(values) -> dict[str, Any] | None:
+    # None when the samples cannot be summarised; callers then fall back to the functions in stats.py
+    if not isinstance(values, (np.ndarray, list)):
+        return None
+    values = np.asarray(values)
+    if values.ndim != 1 or len(values) < 2 or values.dtype.kind not in 'iuf':
+        return None
+    sorted_values = np.sort(values)
+    summary = {}
+    for key, compute in SUMMARY_STATS.items():
+        summary[key] = compute(values, sorted_values, summary)
+    return summary
+
+
+def exclusive_quartile(sorted_values: np.ndarray, i: int):
+    # statistics.quantiles(data, n=4) with the default 'exclusive' method
+    m = len(sorted_values) + 1
+    j = min(max(i * m // 4, 1), len(sorted_values) - 1)
+    delta = i * m - j * 4
+    return ((sorted_values[j - 1] * (4 - delta) + sorted_values[j] * delta) / 4).item()
+
+
+@summary_stat('count', count)
+def _count(values, sorted_values, summary):
+    return len(values)
+
+
+@summary_stat('mean', avg)
+def _mean(values, sorted_values, summary):
+    return float(np.sum(values) / summary['count'])
+
+
+@summary_stat('stdev', stdev)
+def _stdev(values, sorted_values, summary):
+    return float(np.std(values, ddof=1))
+
+
+@summary_stat('min', mininum)
+def _min(values, sorted_values, summary):
+    return sorted_values[0].item()
+
+
+@summary_stat('max', maximum)
+def _max(values, sorted_values, summary):
+    return sorted_values[-1].item()
+
+
+@summary_stat('q1', lower_quantile)
+def _q1(values, sorted_values, summary):
+    return exclusive_quartile(sorted_values, 1)
+
+
+@summary_stat('median', median)
+def _median(values, sorted_values, summary):
+    n = len(sorted_values)
+    if n % 2 == 1:
+        return sorted_values[n // 2].item()
+    return ((sorted_values[n // 2 - 1] + sorted_values[n // 2]) / 2).item()
+
+
+@summary_stat('q3', upper_quantile)
+def _q3(values, sorted_values, summary):
+    return exclusive_quartile(sorted_values, 3)
+
+
+@summary_stat('lower_whisker', lower_whisker)
+def _lower_whisker(values, sorted_values, summary):
+    return summary['q1'] - 1.5 * (summary['q3'] - summary['q1'])
+
+
+@summary_stat('upper_whisker', upper_whisker)
+def _upper_whisker(values, sorted_values, summary):
+    return summary['q3'] + 1.5 * (summary['q3'] - summary['q1'])
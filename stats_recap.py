@@ -1,15 +1,15 @@
 from __future__ import annotations
-from typing import Callable
-
-import pandas as pd
+from typing import Any, Callable
 
+import profiling
 import namd_extractor
 from ResultProcessors import ResultProcessors
-from constants import openstack_service_col, benchmark_app_col, group_col, stat_name_col, value_col
 from glmark2_extractor import MultiresolutionGlmark2ResultProcessor
-from gpu_utilization_extractor import GpuUtilizzationExtractor, GpuUtilizzationExtractorBase
+from gpu_utilization_extractor import GpuUtilizzationExtractorBase
 from pytorch_extractor import PytorchResultProcessor
+from batched_ttest import PValueBatch, P_VALUE_ALTERNATIVES
 from stats import *
+from stats_engine import describe, STAT_FUNCTION_TO_SUMMARY_KEY
 from utils import convert_to_openstack_name, convert_to_openstack_latex_name
 
 
@@ -18,11 +18,22 @@ class StatsRecap:
         self.array_of_values = array_of_values
         self.stats_calculation_result: dict[str, float] = {}
         self.stats_to_be_calculated: list[tuple[str, Callable]] = None
+        self.summary: dict[str, Any] = None
 
-    def calculate_stats(self, stats_to_consider: list[tuple[str, Callable]], additional_argument):
+    def calculate_stats(self, stats_to_consider: list[tuple[str, Callable]], additional_argument,
+                        p_value_batch: PValueBatch = None, comparison: StatsRecap = None):
         self.stats_to_be_calculated = stats_to_consider
+        # descriptive stats come from a single sorted pass, p-values are left to p_value_batch when given;
+        # anything else is still called directly
+        self.summary = summary = describe(self.array_of_values)
         for stat_name, stat_func in stats_to_consider:
-            result = stat_func(self.array_of_values, additional_argument=additional_argument)
+            if summary is not None and stat_func in STAT_FUNCTION_TO_SUMMARY_KEY:
+                result = summary[STAT_FUNCTION_TO_SUMMARY_KEY[stat_func]]
+            elif p_value_batch is not None and comparison is not None and stat_func in P_VALUE_ALTERNATIVES:
+                p_value_batch.add(self, stat_name, stat_func, comparison)
+                continue
+            else:
+                result = stat_func(self.array_of_values, additional_argument=additional_argument)
             self.stats_calculation_result[stat_name] = result
 
 
@@ -38,11 +49,14 @@ class StatRecapPerBenchmarkApp:
         return self.grouping_to_stats_recap_mapping[group_name]
 
 
-    def calculate_stats(self, resultProcessor: ResultProcessors, comparison: StatRecapPerBenchmarkApp):
+    def calculate_stats(self, resultProcessor: ResultProcessors, comparison: StatRecapPerBenchmarkApp,
+                        p_value_batch: PValueBatch = None):
         for group, values in resultProcessor.groups_to_values_mapping().items():
             stat_recap = StatsRecap(values)
             self.add_group(group, stat_recap)
-            stat_recap.calculate_stats(resultProcessor.stats_to_consider(), comparison.get_group_stats(group).array_of_values)
+            comparison_stat_recap = comparison.get_group_stats(group)
+            stat_recap.calculate_stats(resultProcessor.stats_to_consider(), comparison_stat_recap.array_of_values,
+                                       p_value_batch, comparison_stat_recap)
 
     # Specific to particular stats
     def get_combined_average(self):
@@ -81,103 +95,39 @@ class StatRecapPerOpenStackService:
         }
 
 
-    def calculate_benchmark(self, comparison: StatRecapPerOpenStackService):
-        self.glmark2.calculate_stats(self.glmark2_processor, comparison.glmark2)
-        self.namd.calculate_stats(self.namd_processor, comparison.namd)
-        self.pytorch.calculate_stats(self.pytorch_processor, comparison.pytorch)
-        self.gpu_util.calculate_stats(self.gpu_util_processor, comparison.gpu_util)
+    def calculate_benchmark(self, comparison: StatRecapPerOpenStackService, p_value_batch: PValueBatch = None):
+        # without p_value_batch, the p-values of this service are computed right away
+        batch = p_value_batch if p_value_batch is not None else PValueBatch()
+        with profiling.stage("calculate_benchmark", services=1):
+            self.glmark2.calculate_stats(self.glmark2_processor, comparison.glmark2, batch)
+            self.namd.calculate_stats(self.namd_processor, comparison.namd, batch)
+            self.pytorch.calculate_stats(self.pytorch_processor, comparison.pytorch, batch)
+            self.gpu_util.calculate_stats(self.gpu_util_processor, comparison.gpu_util, batch)
+        if p_value_batch is None:
+            with profiling.stage("p_values", tests=len(batch.pending)):
+                batch.compute()
 
     @staticmethod
-    def as_table(all_openstack_service_stat_recap: list[StatRecapPerOpenStackService]):
-        rows = {}
-        stat_per_benchmark_app: StatRecapPerBenchmarkApp
+    def calculate_benchmarks(all_openstack_service_stat_recap: list[StatRecapPerOpenStackService],
+                             comparison: StatRecapPerOpenStackService):
+        # The comparison goes first since every other service refers to its groups
+        p_value_batch = PValueBatch()
+        comparison.calculate_benchmark(comparison, p_value_batch)
         for openstack_service_stat_recap in all_openstack_service_stat_recap:
-            for benchmark_app, stat_per_benchmark_app in openstack_service_stat_recap.as_dict().items():
-                for group, stat_recap in stat_per_benchmark_app.grouping_to_stats_recap_mapping.items():
-                    for stat_name, stat_value_result in stat_recap.stats_calculation_result.items():
-                        key = (benchmark_app, group, stat_name)
-                        if key not in rows:
-                            rows[key] = []
-                        rows[key].append(stat_value_result)
-        table = []
-        for (benchmark_app, group, stat_name), list_of_values in rows.items():
-            table.append([benchmark_app, group, stat_name] + list_of_values)
-        return table
-
-    @staticmethod
-    def as_dataframe(all_openstack_service_stat_recap: dict[str, StatRecapPerOpenStackService]) -> pd.DataFrame:
-        rows = {}
-        ret = []
-        stat_per_benchmark_app: StatRecapPerBenchmarkApp
-        for openstack_name, openstack_service_stat_recap in all_openstack_service_stat_recap.items():
-            for benchmark_app, stat_per_benchmark_app in openstack_service_stat_recap.as_dict().items():
-                for group, stat_recap in stat_per_benchmark_app.grouping_to_stats_recap_mapping.items():
-                    for stat_name, stat_value_result in stat_recap.stats_calculation_result.items():
-                        ret.append([openstack_name, benchmark_app, group, stat_name, stat_value_result])
-        return pd.DataFrame.from_records(ret, columns=[openstack_service_col, benchmark_app_col, group_col, stat_name_col, value_col])
+            if openstack_service_stat_recap is not comparison:
+                openstack_service_stat_recap.calculate_benchmark(comparison, p_value_batch)
+        with profiling.stage("p_values", tests=len(p_value_batch.pending)):
+            p_value_batch.compute()
 
-    @staticmethod
-    def as_latex_variables(all_openstack_service_stat_recap: list[StatRecapPerOpenStackService]) -> list[str]:
-        ret = []
 
-        stat_per_benchmark_app: StatRecapPerBenchmarkApp
-        for openstack_service_stat_recap in all_openstack_service_stat_recap:
-            openstack_service_name = extract_openstack_service_name(openstack_service_stat_recap.openstack_service_name)
-            ret.append(f"% {'='*40} {openstack_service_stat_recap.openstack_service_name} {'='*40}")
-
-            for benchmark_app, stat_per_benchmark_app in openstack_service_stat_recap.as_dict().items():
-                comparison_ratios = []
-                benchmark_app_latex_var_name = replace_forbidden_names(sanitize(benchmark_app).title())
-                for group, stat_recap in stat_per_benchmark_app.grouping_to_stats_recap_mapping.items():
-                    group_latex_var_name = replace_forbidden_names(group).title()
-
-                    for stat_name, stat_func  in stat_recap.stats_to_be_calculated:
-                        stat_value_result = stat_recap.stats_calculation_result[stat_name]
-                        # Cannot have underscores
-                        key = (f"{openstack_service_name}"
-                               f"{benchmark_app_latex_var_name}"
-                               f"{group_latex_var_name}"
-                               f"{sanitize(stat_func.__name__).title()}")
-                        ret.append(getLatexDeclaration(key, round(stat_value_result, 5)))
-                    ret.append(add_array_to_latex(openstack_service_name, benchmark_app_latex_var_name, group_latex_var_name, stat_recap))
-                    comparison_ratios.append(get_ratio_comparison(openstack_service_stat_recap,
-                                                                  benchmark_app, all_openstack_service_stat_recap, group))
-                    ret.append(getLatexDeclaration(f"{openstack_service_name}{benchmark_app_latex_var_name}{group_latex_var_name}AverageRatio",
-                                                   as_percentage(comparison_ratios[-1])))
-                    ret.append(getLatexDeclaration(f"{openstack_service_name}{benchmark_app_latex_var_name}{group_latex_var_name}DecrementRatio",
-                                                   as_percentage(1 - comparison_ratios[-1])))
-                ret.append(getLatexDeclaration(f"{openstack_service_name}{benchmark_app_latex_var_name}OverallAverageRatio",
-                                               as_percentage(avg(comparison_ratios))))
-                ret.append(getLatexDeclaration(f"{openstack_service_name}{benchmark_app_latex_var_name}OverallDecrementRatio",
-                                               as_percentage(1 - avg(comparison_ratios))))
-            ret.append("")
-            ret.append("")
-            ret.append("")
-        return ret
-
-
-def add_array_to_latex(openstack_service_name, benchmark_app_latex_var_name, group_latex_var_name, stat_recap):
+def add_array_to_latex(openstack_service_name, benchmark_app_latex_var_name, group_latex_var_name, array_of_values):
     key = f"BOXPLOT{openstack_service_name}{benchmark_app_latex_var_name}{group_latex_var_name}Array"
-    data = "data\\\\" + "\\\\".join(list(map(str, stat_recap.array_of_values))) + "\\\\"
+    data = "data\\\\" + "\\\\".join(list(map(str, boxplot_samples(array_of_values)))) + "\\\\"
     data = "\\addplot+[boxplot, fill, draw=black,] table[row sep=\\\\,y index=0] {"+data+"};"
     return getLatexDeclaration(key, data)
 
 
 
-def get_ratio_comparison(current_openstack_stat_recap: StatRecapPerOpenStackService, benchmark_name: str,
-                         all_openstack_service_stat_recap: list[StatRecapPerOpenStackService], group_name):
-    comparison: StatRecapPerOpenStackService = next(filter(lambda x: x.as_comparison, all_openstack_service_stat_recap))
-
-    comparison_benchmark_app = comparison.as_dict()[benchmark_name]
-    average_of_comparison = (comparison_benchmark_app.grouping_to_stats_recap_mapping[group_name]
-        .stats_calculation_result['Average'])
-    current_benchmark_app = current_openstack_stat_recap.as_dict()[benchmark_name]
-    average_of_current = (current_benchmark_app.grouping_to_stats_recap_mapping[group_name]
-        .stats_calculation_result['Average'])
-    if not current_benchmark_app.higher_nominals_means_worse_performance:
-        return average_of_current / average_of_comparison
-    return average_of_comparison / average_of_current
-
 def as_percentage(ratio_float: float):
     return f"{round(ratio_float*100, 1)}"
 
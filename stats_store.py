@@ -0,0 +1,201 @@
+from __future__ import annotations
+from typing import Any, Hashable, TYPE_CHECKING
+
+import numpy as np
+
+from constants import openstack_service_col, benchmark_app_col, group_col, stat_name_col, value_col
+from resampling import RESAMPLED_STATS
+from stats import avg
+from stats_recap import StatRecapPerOpenStackService, getLatexDeclaration, add_array_to_latex, as_percentage, \
+    replace_forbidden_names, sanitize, extract_openstack_service_name
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class Categories:
+    # label <-> small integer code, in order of first appearance
+    def __init__(self):
+        self.labels: list[Hashable] = []
+        self.codes: dict[Hashable, int] = {}
+
+    def code_of(self, label) -> int:
+        if label not in self.codes:
+            self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return self.codes[label]
+
+
+class StatsStore:
+    # Every computed statistic as one row (service, benchmark, group, stat, value), stored column by column with
+    # categorical codes, in the order they were calculated. Built once from the StatRecapPerOpenStackService after
+    # the calculation; the LaTeX variables, the spreadsheet tables and the graphics all read from here.
+    def __init__(self):
+        self.services = Categories()
+        self.benchmarks = Categories()
+        self.groups = Categories()
+        self.stats = Categories()
+        self.functions = Categories()  # name of the stats.py function that computed the row, for the LaTeX keys
+        self._columns: dict[str, list] = {'service': [], 'benchmark': [], 'group': [], 'stat': [], 'function': []}
+        self.values: list[Any] = []  # as calculated (int, float or numpy scalar), exported as is
+        self.row_of: dict[tuple[int, int, int, int], int] = {}
+        self.samples: dict[tuple[int, int, int], Any] = {}  # (service, benchmark, group) -> array_of_values
+        self.higher_is_worse: dict[int, bool] = {}  # benchmark -> lower values are better
+        self.baseline: int = None  # service every ratio is relative to
+        # resampling.resample_comparisons output the store was built with, reused when only some services change
+        self.resampled: dict[tuple[str, str, str], tuple] = {}
+        self._arrays: dict[str, np.ndarray] = None
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def from_recaps(all_openstack_service_stat_recap: list[StatRecapPerOpenStackService],
+                    resampled: dict[tuple[str, str, str], tuple] = None) -> StatsStore:
+        # resampled: output of resampling.resample_comparisons, its stats follow the others of each group
+        store = StatsStore()
+        store.resampled = dict(resampled or {})
+        for openstack_service_stat_recap in all_openstack_service_stat_recap:
+            service = openstack_service_stat_recap.openstack_service_name
+            if openstack_service_stat_recap.as_comparison:
+                store.baseline = store.services.code_of(service)
+            for benchmark_app, stat_per_benchmark_app in openstack_service_stat_recap.as_dict().items():
+                store.higher_is_worse.setdefault(store.benchmarks.code_of(benchmark_app),
+                                                 stat_per_benchmark_app.higher_nominals_means_worse_performance)
+                for group, stat_recap in stat_per_benchmark_app.grouping_to_stats_recap_mapping.items():
+                    store.add_samples(service, benchmark_app, group, stat_recap.array_of_values)
+                    for stat_name, stat_func in stat_recap.stats_to_be_calculated:
+                        store.add(service, benchmark_app, group, stat_name,
+                                  stat_recap.stats_calculation_result[stat_name], stat_func.__name__)
+                    for (stat_name, function_name), value in zip(RESAMPLED_STATS, store.resampled.get(
+                            (service, benchmark_app, group), ())):
+                        store.add(service, benchmark_app, group, stat_name, value, function_name)
+        return store
+
+    def add(self, service, benchmark, group, stat, value, function_name: str = None):
+        codes = (self.services.code_of(service), self.benchmarks.code_of(benchmark), self.groups.code_of(group),
+                 self.stats.code_of(stat))
+        self.row_of[codes] = len(self.values)
+        for column, code in zip(('service', 'benchmark', 'group', 'stat'), codes):
+            self._columns[column].append(code)
+        self._columns['function'].append(self.functions.code_of(function_name or stat))
+        self.values.append(value)
+        self._arrays = None
+
+    def add_samples(self, service, benchmark, group, array_of_values):
+        self.samples[(self.services.code_of(service), self.benchmarks.code_of(benchmark),
+                      self.groups.code_of(group))] = array_of_values
+
+    def value(self, service, benchmark, group, stat):
+        return self.values[self.row_of[(self.services.codes[service], self.benchmarks.codes[benchmark],
+                                        self.groups.codes[group], self.stats.codes[stat])]]
+
+    @property
+    def arrays(self) -> dict[str, np.ndarray]:
+        # the code columns as numpy arrays, plus the values as float64 (NaN when not a number)
+        if self._arrays is None:
+            self._arrays = {column: np.asarray(codes, dtype=np.int32) for column, codes in self._columns.items()}
+            self._arrays['number'] = np.array([value if isinstance(value, (int, float, np.number)) else np.nan
+                                               for value in self.values], dtype=np.float64)
+        return self._arrays
+
+    def ratios(self, stat='Average') -> dict[tuple[str, str, str], float]:
+        # (service, benchmark, group) -> `stat` of the service relative to the baseline service, > 1 when the service
+        # performs better, NaN when the baseline has no such group. One division for all rows; the baseline row of
+        # every (benchmark, group) is an array lookup.
+        assert self.baseline is not None, "no service of the store is the comparison"
+        arrays = self.arrays
+        rows = np.flatnonzero(arrays['stat'] == self.stats.codes[stat])
+        baseline_rows = arrays['service'][rows] == self.baseline
+        baseline_row_of = np.full((len(self.benchmarks.labels), len(self.groups.labels)), -1)
+        baseline_row_of[arrays['benchmark'][rows[baseline_rows]], arrays['group'][rows[baseline_rows]]] = \
+            rows[baseline_rows]
+        benchmarks = arrays['benchmark'][rows]
+        groups = arrays['group'][rows]
+        current = arrays['number'][rows]
+        baseline_row = baseline_row_of[benchmarks, groups]  # -1 when the baseline has no such group
+        baseline = np.where(baseline_row >= 0, arrays['number'][baseline_row], np.nan)
+        higher_is_worse = np.array([self.higher_is_worse[code] for code in range(len(self.benchmarks.labels))])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(higher_is_worse[benchmarks], baseline / current, current / baseline)
+        return {(self.services.labels[service], self.benchmarks.labels[benchmark], self.groups.labels[group]): value
+                for service, benchmark, group, value
+                in zip(arrays['service'][rows].tolist(), benchmarks.tolist(), groups.tolist(), ratio.tolist())}
+
+    def as_table(self, services: list[str] = None) -> list[list]:
+        # [benchmark, group, stat, value of each service...] rows, services in the given order (default: all)
+        services = self.services.labels if services is None else services
+        columns = {self.services.codes[service]: index for index, service in enumerate(services)}
+        rows: dict[tuple[int, int, int], list] = {}
+        arrays = self.arrays
+        for row, (service, benchmark, group, stat) in enumerate(zip(
+                arrays['service'].tolist(), arrays['benchmark'].tolist(), arrays['group'].tolist(),
+                arrays['stat'].tolist())):
+            if service not in columns:
+                continue
+            key = (benchmark, group, stat)
+            if key not in rows:
+                rows[key] = [None] * len(services)
+            rows[key][columns[service]] = self.values[row]
+        return [[self.benchmarks.labels[benchmark], self.groups.labels[group], self.stats.labels[stat], *values]
+                for (benchmark, group, stat), values in rows.items()]
+
+    def as_dataframe(self) -> pd.DataFrame:
+        import pandas as pd
+        arrays = self.arrays
+        return pd.DataFrame({
+            openstack_service_col: np.array(self.services.labels, dtype=object)[arrays['service']],
+            benchmark_app_col: np.array(self.benchmarks.labels, dtype=object)[arrays['benchmark']],
+            group_col: np.array(self.groups.labels, dtype=object)[arrays['group']],
+            stat_name_col: np.array(self.stats.labels, dtype=object)[arrays['stat']],
+            value_col: self.values,
+        })
+
+    def as_latex_variables(self, only_services: list[str] = None) -> list[str]:
+        # only_services: write the blocks of these services only, e.g. the ones whose stats changed
+        ret = []
+        ratios = self.ratios()
+        arrays = self.arrays
+        services, benchmarks, groups = arrays['service'].tolist(), arrays['benchmark'].tolist(), arrays['group'].tolist()
+        row = 0
+        while row < len(self):
+            # rows are ordered service -> benchmark -> group, each block is written the way it was calculated
+            service = services[row]
+            service_name = self.services.labels[service]
+            if only_services is not None and service_name not in only_services:
+                while row < len(self) and services[row] == service:
+                    row += 1
+                continue
+            openstack_service_name = extract_openstack_service_name(service_name)
+            ret.append(f"% {'='*40} {service_name} {'='*40}")
+            while row < len(self) and services[row] == service:
+                benchmark = benchmarks[row]
+                benchmark_app = self.benchmarks.labels[benchmark]
+                benchmark_app_latex_var_name = replace_forbidden_names(sanitize(benchmark_app).title())
+                comparison_ratios = []
+                while row < len(self) and services[row] == service and benchmarks[row] == benchmark:
+                    group = groups[row]
+                    group_latex_var_name = replace_forbidden_names(self.groups.labels[group]).title()
+                    while row < len(self) and services[row] == service and benchmarks[row] == benchmark \
+                            and groups[row] == group:
+                        key = (f"{openstack_service_name}"
+                               f"{benchmark_app_latex_var_name}"
+                               f"{group_latex_var_name}"
+                               f"{sanitize(self.functions.labels[arrays['function'][row]]).title()}")
+                        ret.append(getLatexDeclaration(key, round(self.values[row], 5)))
+                        row += 1
+                    ret.append(add_array_to_latex(openstack_service_name, benchmark_app_latex_var_name,
+                                                  group_latex_var_name, self.samples[(service, benchmark, group)]))
+                    comparison_ratios.append(ratios[(service_name, benchmark_app, self.groups.labels[group])])
+                    ret.append(getLatexDeclaration(f"{openstack_service_name}{benchmark_app_latex_var_name}{group_latex_var_name}AverageRatio",
+                                                   as_percentage(comparison_ratios[-1])))
+                    ret.append(getLatexDeclaration(f"{openstack_service_name}{benchmark_app_latex_var_name}{group_latex_var_name}DecrementRatio",
+                                                   as_percentage(1 - comparison_ratios[-1])))
+                ret.append(getLatexDeclaration(f"{openstack_service_name}{benchmark_app_latex_var_name}OverallAverageRatio",
+                                               as_percentage(avg(comparison_ratios))))
+                ret.append(getLatexDeclaration(f"{openstack_service_name}{benchmark_app_latex_var_name}OverallDecrementRatio",
+                                               as_percentage(1 - avg(comparison_ratios))))
+            ret.append("")
+            ret.append("")
+            ret.append("")
+        return ret
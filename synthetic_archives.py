@@ -0,0 +1,193 @@
+"""
+Generates synthetic result archives in the `more` format of the files inside ./data: the same section names and
+the same content layout the extractors read (Glmark2 at every resolution, PyTorch model/batch blocks, NAMD batches,
+nvidia-smi as JSON summaries, raw CSV samples and a pmon log), with the amount of services, sections and samples as
+parameters. The output only depends on the arguments, so the archives (and everything computed from them) are
+reproducible.
+
+Usage: python synthetic_archives.py <output folder> [services] [scale]
+"""
+from __future__ import annotations
+import json
+import os
+import random
+import sys
+from dataclasses import dataclass, field
+
+from service_parser import glmark2_resolutions
+
+SECTION_SEPARATOR = "::::::::::::::"
+# file names of ./data, in the order main reads them: the first one is the t-test baseline
+SERVICE_KINDS = ['0-physical', '1-nova', '2-zun', '3-ironic', '3-ironic-warmed-glmark']
+# models whose names can be turned into LaTeX variable names, see stats_recap.replace_forbidden_names
+PYTORCH_MODELS = ['ResNet-50', 'ResNet-152', 'Efficientnet_v2_l']
+GLMARK2_CATEGORIES = ['build', 'texture', 'shading', 'bump', 'effect2d', 'pulsar', 'desktop', 'buffer', 'ideas',
+                      'jellyfish', 'terrain', 'shadow', 'refract', 'conditionals', 'function', 'loop']
+# written as well, but not in service_parser.glmark2_resolutions: the parser has to filter them out
+UNRECAPPED_GLMARK2_RESOLUTIONS = ['800x600']
+GPU_PROCESSES = {'glmark2': "glmark2", 'namd': "./namd2", 'pytorch': "python3"}
+TYPICAL_GPU_UTILIZATION = {'glmark2': 40, 'namd': 17, 'pytorch': 51}
+PHORONIX_NOISE = ("    [8192] strpos(): Passing null to parameter #1 ($haystack) of type string is deprecated in "
+                  "phodevi_parser:35\n\n")
+
+
+@dataclass
+class ArchiveShape:
+    glmark2_steps: int = 33  # per resolution
+    pytorch_models: int = 3
+    pytorch_batch_sizes: list[int] = field(default_factory=lambda: [1, 16, 32, 64])
+    pytorch_runs: int = 3  # samples per model/batch size block
+    namd_batches: int = 16
+    namd_runs: int = 2  # samples per batch
+    noise_lines: int = 8  # Phoronix output around the results, which the extractors have to skip
+
+    def scaled(self, scale: int) -> ArchiveShape:
+        # `scale` times the samples and sections of every benchmark
+        extra_batch_sizes = [self.pytorch_batch_sizes[-1] * 2 ** i
+                             for i in range(1, len(self.pytorch_batch_sizes) * (scale - 1) + 1)]
+        return ArchiveShape(self.glmark2_steps * scale, self.pytorch_models,
+                            self.pytorch_batch_sizes + extra_batch_sizes, self.pytorch_runs * scale,
+                            self.namd_batches * scale, self.namd_runs * scale, self.noise_lines)
+
+
+def service_file_names(services: int) -> list[str]:
+    # more than five services repeat the kinds; the file names still tell the kind, see utils.convert_to_openstack_name
+    ret = []
+    for index in range(services):
+        kind = SERVICE_KINDS[index % len(SERVICE_KINDS)]
+        replica = index // len(SERVICE_KINDS)
+        ret.append(f"{kind}-synthetic" if replica == 0 else f"{kind}-synthetic-r{replica}")
+    return ret
+
+
+def generate_dataset(folder: str, services=5, shape: ArchiveShape = None, seed=0) -> list[str]:
+    shape = shape or ArchiveShape()
+    os.makedirs(folder, exist_ok=True)
+    ret = []
+    for index, file_name in enumerate(service_file_names(services)):
+        file_path = os.path.join(folder, file_name)
+        # each service performs a bit differently, so the t-tests and ratios are not trivial
+        write_archive(file_path, shape, random.Random(seed * 1000 + index), performance=1 - 0.04 * (index % 5))
+        ret.append(file_path)
+    return ret
+
+
+def write_archive(file_path: str, shape: ArchiveShape, rng: random.Random, performance=1.0):
+    with open(file_path, "w") as f:
+        for resolution in glmark2_resolutions:
+            write_section(f, f"glmark2_benchmark_result_{resolution}.txt",
+                          glmark2_result(shape, rng, performance, resolution))
+        for batch in range(shape.namd_batches):
+            write_section(f, f"namd_benchmark_result_{batch}.txt", namd_result(shape, rng, performance))
+        write_section(f, "namd_cuda_install_result.txt", noise(shape, rng))
+        # every way the GPU utilization is recorded: pmon log, JSON summaries and raw CSV samples
+        write_section(f, "nvidia_smi_glmark2.log", nvidia_smi_pmon_log(rng, "glmark2"))
+        for batch in range(shape.namd_batches):
+            write_section(f, f"nvidia_smi_namd_{batch}.txt", nvidia_smi_result(rng, "namd"))
+        write_section(f, "nvidia_smi_pytorch.csv", nvidia_smi_csv(rng, "pytorch"))
+        write_section(f, "pytorch_benchmark_result.txt", pytorch_result(shape, rng, performance))
+        write_section(f, "pytorch_install_result.txt", noise(shape, rng))
+        for resolution in UNRECAPPED_GLMARK2_RESOLUTIONS:
+            write_section(f, f"glmark2_benchmark_result_{resolution}.txt",
+                          glmark2_result(shape, rng, performance, resolution))
+
+
+def write_section(f, name: str, content: str):
+    # like `more *`: the separator of the next section directly follows the content
+    f.write(f"{SECTION_SEPARATOR}\n{name}\n{SECTION_SEPARATOR}\n{content}")
+
+
+def noise(shape: ArchiveShape, rng: random.Random) -> str:
+    return "\n" + PHORONIX_NOISE * rng.randint(1, max(shape.noise_lines, 1)) + "Phoronix Test Suite v10.8.4\n\n"
+
+
+def glmark2_result(shape: ArchiveShape, rng: random.Random, performance: float, resolution: str) -> str:
+    width, height = map(int, resolution.split("x"))
+    typical_fps = 5000 * 192 * 108 / (width * height) ** 0.8 * performance
+    lines = ["=" * 55, "    glmark2 2021.02", "=" * 55, "    OpenGL Information",
+             "    GL_VENDOR:     NVIDIA Corporation", "    GL_RENDERER:   Tesla T4/PCIe/SSE2", "=" * 55]
+    scores = []
+    for step in range(shape.glmark2_steps):
+        category = GLMARK2_CATEGORIES[step % len(GLMARK2_CATEGORIES)]
+        fps = max(1, round(rng.gauss(typical_fps, typical_fps * 0.15)))
+        scores.append(fps)
+        lines.append(f"[{category}] variant={step}:steps={rng.randint(0, 5)}: FPS: {fps} FrameTime: {1000 / fps:.3f} ms")
+    lines += ["=" * 55, f"                                  glmark2 Score: {round(sum(scores) / len(scores))}", "=" * 55]
+    return "\n".join(lines)
+
+
+def namd_result(shape: ArchiveShape, rng: random.Random, performance: float) -> str:
+    samples = [rng.gauss(0.21 / performance, 0.01) for _ in range(shape.namd_runs)]
+    return (noise(shape, rng) + "NAMD CUDA 2.14:\n    pts/namd-cuda-1.1.1\n    Test 1 of 1\n\n"
+            "    ATPase Simulation - 327,506 Atoms:\n"
+            + "".join(f"        {sample:.6f}\n" for sample in samples)
+            + f"\n    Average: {sum(samples) / len(samples):.5f} days/ns\n    Samples: {len(samples)}\n")
+
+
+def pytorch_result(shape: ArchiveShape, rng: random.Random, performance: float) -> str:
+    blocks = [noise(shape, rng)]
+    tests = [(model, batch_size) for model in PYTORCH_MODELS[:shape.pytorch_models]
+             for batch_size in shape.pytorch_batch_sizes]
+    for number, (model, batch_size) in enumerate(tests, start=1):
+        typical = 140 / (PYTORCH_MODELS.index(model) + 1) * performance
+        samples = [max(rng.gauss(typical, typical * 0.1), 0.1) for _ in range(shape.pytorch_runs)]
+        blocks.append(
+            f"PyTorch 2.1:\n    pts/pytorch-1.0.1 [Device: gpu - Batch Size: {batch_size} - Model: {model}]\n"
+            f"    Test {number} of {len(tests)}\n\n"
+            f"    Device: gpu - Batch Size: {batch_size} - Model: {model}:\n"
+            + "".join(f"        {sample:.11f}\n" for sample in samples)
+            + f"\n    Average: {sum(samples) / len(samples):.2f} batches/sec\n"
+              f"    Minimum: {min(samples):.2f}\n    Maximum: {max(samples):.2f}\n\n")
+    return "".join(blocks)
+
+
+def nvidia_smi_result(rng: random.Random, benchmark: str) -> str:
+    def utilization(count, typical):
+        values = [min(100, max(0, round(rng.gauss(typical, typical * 0.3)))) for _ in range(count)]
+        average = sum(values) / count
+        variance = sum((value - average) ** 2 for value in values) / (count - 1)
+        return {"gpu-sum": sum(values), "gpu-mem-sum": sum(values) // 4, "count": count, "gpu-avg": average,
+                "gpu-variance": variance, "gpu-high-values": sorted(set(values))[-5:],
+                "gpu-mem-avg": average / 4, "gpu-mem-variance": variance / 16, "gpu-mem-high-values": []}
+    return json.dumps({"": utilization(rng.randint(10, 30), 2), GPU_PROCESSES[benchmark]: utilization(
+        rng.randint(15, 60), TYPICAL_GPU_UTILIZATION[benchmark])})
+
+
+def gpu_utilization_sample(rng: random.Random, benchmark: str) -> int:
+    typical = TYPICAL_GPU_UTILIZATION[benchmark]
+    return min(100, max(0, round(rng.gauss(typical, typical * 0.3))))
+
+
+def nvidia_smi_csv(rng: random.Random, benchmark: str) -> str:
+    # `--format=csv` samples of the benchmark process, interleaved with the ones of the X server
+    lines = ["timestamp, process_name, utilization.gpu [%]"]
+    for second in range(rng.randint(15, 60)):
+        timestamp = f"2024/01/01 12:{second // 60:02d}:{second % 60:02d}.000"
+        lines.append(f"{timestamp}, {GPU_PROCESSES[benchmark]}, {gpu_utilization_sample(rng, benchmark)} %")
+        if second % 4 == 0:
+            lines.append(f"{timestamp}, /usr/lib/xorg/Xorg, {rng.randint(0, 3)} %")
+    return "\n".join(lines) + "\n"
+
+
+def nvidia_smi_pmon_log(rng: random.Random, benchmark: str) -> str:
+    # `nvidia-smi pmon`: the header is repeated, idle GPUs have "-" everywhere and commands have no path
+    header = ["# gpu        pid  type    sm   mem   enc   dec   command",
+              "# Idx          #   C/G     %     %     %     %   name"]
+    lines = []
+    for sample in range(rng.randint(15, 60)):
+        if sample % 10 == 0:
+            lines += header
+        if sample % 7 == 3:
+            lines.append("    0          -     -     -     -     -     -   -")
+        else:
+            lines.append(f"    0       4242     G    {gpu_utilization_sample(rng, benchmark):2d}     {rng.randint(0, 20):2d}"
+                         f"     -     -   {os.path.basename(GPU_PROCESSES[benchmark])}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    output_folder = sys.argv[1]
+    services = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    scale = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    for path in generate_dataset(output_folder, services, ArchiveShape().scaled(scale)):
+        print(path)
@@ -1,22 +1,27 @@
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-from pretty_html_table import build_table
+import matplotlib
 import pandas as pd
 import seaborn as sns
-from google.oauth2 import service_account
 
 from matplotlib import pyplot as plt
-from pandas.plotting import table
+from matplotlib.patches import Rectangle
 
-from ResultProcessors import ResultProcessors
+import profiling
 from aesthetic_pandas_export import export_pandas_to_png
+from comparison_matrix import ComparisonMatrix
 from constants import openstack_service_col, group_col, zun_const, ironic_const, physical_machine_const, nova_const, \
     value_col, stat_name_col, ironic_double_glmark
+from graphics_cache import GraphicsManifest, fingerprint
 from glmark2_extractor import MultiresolutionGlmark2ResultProcessor
 from gpu_utilization_extractor import GpuUtilizzationExtractorBase
 from namd_extractor import NamdResultProcessor
 from pytorch_extractor import PytorchResultProcessor
+from sample_table import SampleTable
 from stats_recap import StatRecapPerOpenStackService
+from stats_store import StatsStore
 from utils import convert_to_openstack_name
 
 
@@ -25,33 +30,56 @@ class UpdateGraphics():
                  glmark2_processors: dict[str, MultiresolutionGlmark2ResultProcessor],
                  namd_processors:dict[str, NamdResultProcessor],
                  pytorch_processors: dict[str, PytorchResultProcessor],
-                 gpu_util_processors: dict[str, GpuUtilizzationExtractorBase]):
+                 gpu_util_processors: dict[str, GpuUtilizzationExtractorBase],
+                 render_workers: int = 1, use_graphics_cache: bool = True, table_backend="matplotlib",
+                 stats_store: StatsStore = None, sample_table: SampleTable = None):
         self.openstack_services_stat_recap = openstack_services_stat_recap
+        self.stats_store = stats_store if stats_store is not None else \
+            StatsStore.from_recaps(list(openstack_services_stat_recap.values()))
         self.glmark2_processors = glmark2_processors
         self.namd_processors = namd_processors
         self.pytorch_processors = pytorch_processors
         self.gpu_util_processors = gpu_util_processors
+        self.sample_table = sample_table if sample_table is not None else SampleTable.from_processors(
+            {'Glmark2': glmark2_processors, 'NAMD': namd_processors, 'PyTorch': pytorch_processors})
+        # charts are independent from each other; with more than one worker they are rendered on a process pool
+        self.render_workers = render_workers
+        self.render_jobs: list[RenderJob] = []
+        # only re-render the PNGs whose input data or styling changed since the previous run
+        self.use_graphics_cache = use_graphics_cache
+        # see aesthetic_pandas_export.TABLE_BACKENDS
+        self.table_backend = table_backend
         os.makedirs("./graphics", exist_ok=True)
 
     def update_slides(self):
-        self.stat_recap_pd = StatRecapPerOpenStackService.as_dataframe(self.openstack_services_stat_recap)
+        self.collect_render_jobs()
+        return self.render(self.render_jobs)
+
+    def collect_render_jobs(self):
+        with profiling.stage("collect_render_jobs") as stage:
+            self._collect_render_jobs()
+            stage.add(jobs=len(self.render_jobs))
+        return self.render_jobs
+
+    def _collect_render_jobs(self):
+        self.stat_recap_pd = self.stats_store.as_dataframe()
         self.stat_recap_pd[openstack_service_col] = self.stat_recap_pd[openstack_service_col].apply(convert_to_openstack_name)
+        self.render_jobs = []
         self.update_slides_glmark2()
         self.update_slides_namd()
         self.update_slides_pytorch()
         self.update_gpu_util()
+        return self.render_jobs
+
+    def render(self, jobs):
+        # Renders the jobs that are not up to date and removes the graphics that no job in self.render_jobs produces
+        return render_into_folder("./graphics", jobs, self.render_jobs, self.render_workers, self.use_graphics_cache)
 
     def do_graphic(self, curr_data, y_col, title, save_file, group, benchmark):
-        plt.figure()
-        boxplot = sns.boxplot(data=curr_data, x=openstack_service_col, y=y_col).set_title(title)
-        figure = boxplot.get_figure()
-        figure.savefig(f"./graphics/boxplot_{save_file}.png", transparent=True)
-
-        fig, ax = plt.subplots(1, 1)
-        sns.kdeplot(data=curr_data, hue=openstack_service_col, x=y_col, ax=ax, bw_adjust=1.8)
-        ax.set_title(title)
-        ax.set_ylabel(ylabel="")
-        fig.savefig(f"./graphics/bellcurve_{save_file}.png", transparent=True)
+        self.render_jobs.append(RenderJob(render_boxplot, f"./graphics/boxplot_{save_file}.png",
+                                          curr_data=curr_data, y_col=y_col, title=title))
+        self.render_jobs.append(RenderJob(render_bellcurve, f"./graphics/bellcurve_{save_file}.png",
+                                          curr_data=curr_data, y_col=y_col, title=title))
         self.export_table_graphic(curr_data, title, save_file, group, benchmark)
 
     def export_table_graphic(self, curr_data, title, save_file, group, benchmark):
@@ -63,67 +91,176 @@ class UpdateGraphics():
         dataframe = dataframe[[physical_machine_const, nova_const, zun_const, ironic_const, ironic_double_glmark]]
         dataframe = dataframe.reset_index(stat_name_col)
 
-        export_pandas_to_png(dataframe, f"./graphics/table_{save_file}.png", title=title, hide_index=True)
-
+        self.render_jobs.append(RenderJob(export_pandas_to_png, f"./graphics/table_{save_file}.png",
+                                          df=dataframe, title=title, hide_index=True, backend=self.table_backend))
 
     def update_slides_glmark2(self):
-        data = dataframe_from_dict_of_processor(self.glmark2_processors)
-        data[openstack_service_col] = data[openstack_service_col].apply(convert_to_openstack_name)
-
-        for resolution in data['resolution'].unique():
-            curr_data = data[data['resolution'] == resolution]
-            self.do_graphic(curr_data, "FPS", f'{resolution}', f"glmark2_{resolution}", resolution, "Glmark2")
+        for resolution, samples in self.sample_table.groups("Glmark2"):
+            self.do_graphic(chart_data(samples, "FPS"), "FPS", f'{resolution}', f"glmark2_{resolution}", resolution,
+                            "Glmark2")
 
     def update_slides_pytorch(self):
-        data = dataframe_from_dict_of_processor(self.pytorch_processors)
-        data[openstack_service_col] = data[openstack_service_col].apply(convert_to_openstack_name)
-
-        for model in data['model'].unique():
-            curr_data = data[data['model'] == model]
-            self.do_graphic(curr_data, "batches/second",
+        for model, samples in self.sample_table.groups("PyTorch"):
+            self.do_graphic(chart_data(samples, "batches/second"), "batches/second",
                             f'{model}', f"pytorch_{model}", model, "PyTorch")
 
     def update_slides_namd(self):
-        data = dataframe_from_dict_of_processor(self.namd_processors)
-        data[openstack_service_col] = data[openstack_service_col].apply(convert_to_openstack_name)
-        self.do_graphic(data, "days/ns", f'', f"namd", "", "NAMD")
+        for _, samples in self.sample_table.groups("NAMD"):
+            self.do_graphic(chart_data(samples, "days/ns"), "days/ns", f'', f"namd", "", "NAMD")
 
     def update_gpu_util(self):
         df_melted = self.stat_recap_pd[self.stat_recap_pd['benchmark'] == 'GpuUtil']
         df_melted.drop("benchmark", inplace=True, axis=1)
         df_melted.rename(columns={"group": "benchmark"}, inplace=True)
 
-        # data = dataframe_from_dict_of_processor(self.gpu_util_processors)
-        # data[openstack_service_col] = data[openstack_service_col].apply(convert_to_openstack_name)
-        # df_melted = pd.melt(data, id_vars=["benchmark", "openstack-service"], value_vars=["gpu-util", "count", "stdev"], var_name="Statistik")
         df_pivot = df_melted.pivot_table(index=["benchmark", "Statistik"], columns="openstack-service", values="value")
         dataframe = df_pivot[[physical_machine_const, nova_const, zun_const, ironic_const, ironic_double_glmark]]
         dataframe.reset_index(level='Statistik', inplace=True)
         dataframe.columns.name=''
         # dataframe = dataframe.reset_index(stat_name_col)
 
-        export_pandas_to_png(dataframe, f"./graphics/table_gpuutil.png", title="GPU Utilization",
-                             hide_index=False, border=True, alternating_row_colors=False)
+        self.render_jobs.append(RenderJob(export_pandas_to_png, f"./graphics/table_gpuutil.png", df=dataframe,
+                                          title="GPU Utilization", hide_index=False, border=True,
+                                          alternating_row_colors=False, backend=self.table_backend))
         # self.export_table_graphic(df_pivot, f'GPU Utilization', f"gpuutil", "", "NAMD")
         pass
 
 
 
 
-def abc(df, group_by, to_be_replicated):
-    temporary_col = f"{group_by}x"
-    df[temporary_col] = 1
-    df[temporary_col] = df.groupby("ride_ID")[temporary_col].transform("cumsum").apply(lambda x: f"person_ID{x}")
+class RenderJob:
+    # One PNG inside ./graphics. Only holds a module level function and its (picklable) arguments, so that it can
+    # be sent to a worker process.
+    def __init__(self, render, file_path: str, **arguments):
+        self.render = render
+        self.file_path = file_path
+        self.arguments = arguments
+
+    def __call__(self):
+        return self.render(filename=self.file_path, **self.arguments)
+
+    def fingerprint(self) -> str:
+        return fingerprint(self.render, self.arguments)
+
+
+def render_into_folder(folder: str, jobs: list[RenderJob], current_jobs: list[RenderJob], render_workers: int = 1,
+                       use_graphics_cache: bool = True) -> list[tuple[RenderJob, str]]:
+    # Renders the jobs that are not up to date and removes the graphics of `folder` that no job in current_jobs
+    # produces
+    manifest = GraphicsManifest(folder)
+    for file_path in manifest.collect_garbage([job.file_path for job in current_jobs]):
+        print(f"Removed stale graphic {file_path}")
+    fingerprints = {job.file_path: job.fingerprint() for job in jobs}
+    pending_jobs = [job for job in jobs
+                    if not (use_graphics_cache and manifest.is_up_to_date(fingerprints[job.file_path], job.file_path))]
+
+    with profiling.stage("render", jobs=len(pending_jobs), unchanged=len(jobs) - len(pending_jobs)):
+        failures = run_render_jobs(pending_jobs, render_workers)
+    failed_file_paths = set()
+    for job, error in failures:
+        print(f"Failed to render {job.file_path}. Reason: {error}")
+        failed_file_paths.add(job.file_path)
+    for job in pending_jobs:
+        if job.file_path in failed_file_paths:
+            manifest.forget(job.file_path)
+        else:
+            manifest.record(fingerprints[job.file_path], job.file_path)
+    manifest.save()
+    print(f"Rendered {len(pending_jobs) - len(failures)} graphics, "
+          f"{len(jobs) - len(pending_jobs)} unchanged, {len(failures)} failed")
+    return failures
+
+
+def render_comparison_matrix(matrix: ComparisonMatrix, folder="./graphics/matrix", render_workers: int = 1,
+                             use_graphics_cache: bool = True, table_backend="matplotlib") -> list[tuple[RenderJob, str]]:
+    # One heatmap and one table of every (benchmark, group) of the matrix; kept in their own folder, so that the
+    # charts stage does not remove them
+    os.makedirs(folder, exist_ok=True)
+    services = [convert_to_openstack_name(service) for service in matrix.services]
+    jobs = []
+    for index, (benchmark, group) in enumerate(matrix.groups):
+        title = f"{benchmark} {group}".strip()
+        save_file = "_".join(filter(None, [benchmark, group])).lower()
+        ratios = matrix.as_dataframe(index, 'ratios', services)
+        p_values = matrix.as_dataframe(index, 'p_values', services)
+        jobs.append(RenderJob(render_heatmap, os.path.join(folder, f"heatmap_{save_file}.png"), ratios=ratios,
+                              p_values=p_values, title=f"{title}: row relative to column"))
+        table = ratios.map(lambda ratio: f"{ratio * 100:.1f}%") + p_values.map(lambda p_value: f" (p={p_value:.3f})")
+        jobs.append(RenderJob(export_pandas_to_png, os.path.join(folder, f"table_{save_file}.png"),
+                              df=table.rename_axis(openstack_service_col).reset_index(), title=title, hide_index=True,
+                              backend=table_backend))
+    return render_into_folder(folder, jobs, jobs, render_workers, use_graphics_cache)
+
+
+def chart_data(samples: pd.DataFrame, y_col: str) -> pd.DataFrame:
+    # samples of SampleTable.groups as the (openstack service, y_col) columns the charts plot
+    return pd.DataFrame({
+        openstack_service_col: samples['service'].cat.remove_unused_categories().map(convert_to_openstack_name),
+        y_col: samples['value'].to_numpy(),
+    })
+
+
+def render_boxplot(curr_data, y_col, title, filename):
+    plt.figure()
+    boxplot = sns.boxplot(data=curr_data, x=openstack_service_col, y=y_col).set_title(title)
+    figure = boxplot.get_figure()
+    figure.savefig(filename, transparent=True)
+    plt.close(figure)
+
+
+def render_bellcurve(curr_data, y_col, title, filename):
+    fig, ax = plt.subplots(1, 1)
+    sns.kdeplot(data=curr_data, hue=openstack_service_col, x=y_col, ax=ax, bw_adjust=1.8)
+    ax.set_title(title)
+    ax.set_ylabel(ylabel="")
+    fig.savefig(filename, transparent=True)
+    plt.close(fig)
+
+
+def render_heatmap(ratios: pd.DataFrame, p_values: pd.DataFrame, title, filename):
+    # ratios as percentages, coloured around 100%; pairs that do not differ significantly (p >= 0.05) are hatched out
+    fig, ax = plt.subplots(figsize=(1.6 * len(ratios) + 2, 1.2 * len(ratios) + 1.5))
+    annotations = ratios.map(lambda ratio: f"{ratio * 100:.1f}%") + p_values.map(lambda p_value: f"\np={p_value:.3f}")
+    sns.heatmap(ratios * 100, annot=annotations, fmt="", cmap="RdYlGn", center=100, ax=ax,
+                cbar_kws={"label": "average ratio (%)"})
+    for row, column in zip(*(p_values.to_numpy() >= 0.05).nonzero()):
+        ax.add_patch(Rectangle((column, row), 1, 1, fill=False, hatch="//", edgecolor="grey", linewidth=0))
+    ax.set_title(title)
+    ax.set_xlabel("")
+    ax.set_ylabel("")
+    fig.tight_layout()
+    fig.savefig(filename, transparent=True)
+    plt.close(fig)
+
 
-    df = df.pivot(index="ride_ID", columns="person_IDx", values="person_ID").reset_index().rename_axis(columns={"person_IDx":""})
+def run_render_job(job: RenderJob):
+    try:
+        with profiling.stage(os.path.basename(job.file_path), graphics=1):
+            job()
+        return None
+    except Exception as e:
+        plt.close('all')
+        return repr(e)
 
 
+def use_headless_backend():
+    matplotlib.use("Agg")
 
 
-def dataframe_from_dict_of_processor(dictionary: dict[str, ResultProcessors]):
-    ret = []
-    for openstack_service, resolutions in dictionary.items():
-        dataframe = resolutions.as_dataframe()
-        dataframe[openstack_service_col] = openstack_service
-        ret.append(dataframe)
-    return pd.concat(ret)
+def run_render_jobs(jobs: list[RenderJob], workers: int = 1) -> list[tuple[RenderJob, str]]:
+    # Returns the jobs that failed together with the reason; a failing chart does not stop the other ones
+    if workers is None or workers <= 1 or len(jobs) <= 1:
+        errors = [run_render_job(job) for job in jobs]
+    else:
+        # spawned rather than forked: a forked worker inherits the running event loop of main.main, which makes the
+        # browser used by dataframe_image refuse to start
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=use_headless_backend) as executor:
+            futures = [profiling.submit(executor, run_render_job, job) for job in jobs]
+            errors = []
+            for future in futures:
+                try:
+                    errors.append(profiling.result(future))
+                except Exception as e:
+                    errors.append(repr(e))
+    return [(job, error) for job, error in zip(jobs, errors) if error is not None]
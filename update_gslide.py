@@ -1,80 +1,126 @@
 import glob
 import os.path
+from collections import Counter
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from gdrive_util import SCOPES, upload_file, is_folder_accessible
-from thread_pool_worker import WorkerPool
-from update_gslide_util import GslideUtil
+from gdrive_util import SCOPES, upload_file, is_folder_accessible, list_folder_files, sync_file
+from request_scheduler import scheduler
+from update_gslide_util import GslideUtil, SlideElementIndex
+
+# Slides requests sent per presentations.batchUpdate call
+MAXIMUM_REQUESTS_PER_BATCH = 200
+PRESENTATION_ID = "1T_1giXV5MO6COGHmdVdubExm3PDA6wq4TVe0U_qUYpE"
+# publicly readable Drive folder the images are uploaded to, the deck links to them
+IMAGES_GDRIVE_FOLDER_ID = "1iVu_IHsyUJuAxu69djB4BdRg2marP0T8"
+
+slides_service = None
+
+
+def get_slides_service():
+    global slides_service
+    if slides_service is None:
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+        credentials = service_account.Credentials.from_service_account_file("./key/key.json")
+        creds = credentials.with_scopes(SCOPES)
+        slides_service = build('slides', 'v1', credentials=creds, static_discovery=True, cache_discovery=False)
+    return slides_service
 
-credentials = service_account.Credentials.from_service_account_file("./key/key.json")
-creds = credentials.with_scopes(SCOPES)
-slides_service = build('slides', 'v1', credentials=creds)
 
 class UpdateGslide():
-    def __init__(self):
-        self.images_gdrive_folder_id = "1iVu_IHsyUJuAxu69djB4BdRg2marP0T8"
-        self.presentation_id = "1T_1giXV5MO6COGHmdVdubExm3PDA6wq4TVe0U_qUYpE"
+    def __init__(self, slides_service=None, drive_service=None):
+        # slides_service/drive_service: e.g. fake_google_api.FakeSlidesService() to run without Google
+        self.slides_service = slides_service or get_slides_service()
+        self.drive_service = drive_service
+        self.images_gdrive_folder_id = IMAGES_GDRIVE_FOLDER_ID
+        self.presentation_id = PRESENTATION_ID
         self.presentation_url = f"https://docs.google.com/presentation/d/{self.presentation_id}/edit#slide=id.g2e205ea646f_0_38"
         print(self.presentation_url)
         self.presentation = self.slides = None
+        self.element_index: SlideElementIndex = None
         self.update_presentation_information()
 
         # for upserting image
-        assert is_folder_accessible(self.images_gdrive_folder_id)[0], f"Public should be able to read GDrive folder {self.images_gdrive_folder_id}"
+        assert is_folder_accessible(self.images_gdrive_folder_id, self.drive_service)[0], f"Public should be able to read GDrive folder {self.images_gdrive_folder_id}"
 
 
     def update_presentation_information(self):
-        self.presentation = slides_service.presentations().get(presentationId=self.presentation_id).execute()
+        self.presentation = scheduler.execute("slides", self.slides_service.presentations().get(presentationId=self.presentation_id))
         self.slides = self.presentation.get('slides')
+        self.element_index = SlideElementIndex(self.slides)
 
     def upsert_all_in_folder(self, folder_path):
-        workers = WorkerPool()
-        workers.start_workers(1)
-
+        # Uploads the changed images in parallel, then replaces/creates them in the deck with one batchUpdate.
+        # Images identical to the Drive copy (same MD5) are neither uploaded nor replaced, unless the deck lacks them.
+        folder_files = list_folder_files(self.images_gdrive_folder_id, self.drive_service)
+        uploads = {}
         for file in glob.glob(f'{folder_path}/*.*'):
             basename = os.path.basename(file)
-            def task(file, basename):
-                print(f"Upserting image {file}")
-                self.upsert_image_from_local(file, gdrive_new_file_name=basename, metadata_id_to_replace=basename)
-            workers.add_task((lambda file, basename: lambda: task(file, basename))(file, basename))
-        workers.stop_workers()
+            uploads[basename] = scheduler.spawn(sync_file, self.images_gdrive_folder_id, file, basename, folder_files,
+                                                drive_service=self.drive_service)
+        image_urls = {}
+        statuses = Counter()
+        for basename, upload in uploads.items():
+            file = upload.result()
+            statuses[file['status']] += 1
+            if file['status'] != 'unchanged' or basename not in self.element_index.by_title:
+                image_urls[basename] = file.get('webContentLink')
+        print(f"Images: {statuses['created']} uploaded, {statuses['updated']} updated, "
+              f"{statuses['unchanged']} unchanged")
+        return self.upsert_images(image_urls)
+
+    def upsert_images(self, image_urls: dict[str, str], slide_object_id=None) -> dict[str, str]:
+        # image_urls: metadata (title of the image element) -> url. Returns metadata -> objectId of the image
+        requests = []
+        ret = {}
+        for metadata, image_url in image_urls.items():
+            image_requests, ret[metadata] = self.upsert_image_requests(
+                image_url, slide_object_id=slide_object_id, metadata_id_to_replace=metadata)
+            requests.extend(image_requests)
+        self.batch_update(requests)
+        return ret
 
 
     def upsert_image_from_local(self, local_file_name, slide_object_id=None, gdrive_new_file_name=None, object_id_to_replace=None, metadata_id_to_replace=None):
         if gdrive_new_file_name is None:
             gdrive_new_file_name = local_file_name
 
-        response = upload_file(self.images_gdrive_folder_id, local_file_name, gdrive_new_file_name, overwrite=True)
+        response = upload_file(self.images_gdrive_folder_id, local_file_name, gdrive_new_file_name, overwrite=True,
+                               drive_service=self.drive_service)
         download_link = response.get('webContentLink')
         ret = self.upsert_image(download_link, slide_object_id=slide_object_id, object_id_to_replace=object_id_to_replace, metadata_id_to_replace=metadata_id_to_replace)
         return ret
 
 
     def upsert_image(self, image_url, slide_object_id=None, object_id_to_replace=None, metadata_id_to_replace=None):
+        requests, object_id = self.upsert_image_requests(image_url, slide_object_id, object_id_to_replace,
+                                                         metadata_id_to_replace)
+        self.batch_update(requests)
+        return object_id
+
+    def upsert_image_requests(self, image_url, slide_object_id=None, object_id_to_replace=None, metadata_id_to_replace=None):
+        # The replace/create and the alt text of one image. New images get their objectId from us, so the alt text
+        # request can go in the same batchUpdate as the createImage.
         if slide_object_id is None:
             slide_object_id = self.slides[-1].get('objectId')
+        element = self.element_index.by_object_id.get(object_id_to_replace)
+        if element is None and metadata_id_to_replace is not None:
+            element = self.element_index.by_title.get(metadata_id_to_replace)
         requests = []
-        ret = None
-        if object_id_to_replace is not None and GslideUtil.get_object(self.slides, object_id_to_replace) is not None:
-            requests.append(GslideUtil.replace_image(object_id_to_replace, image_url))
-        elif metadata_id_to_replace is not None and GslideUtil.get_object(self.slides, metadata_id_to_replace, 'title') is not None:
-            object_id_to_replace = GslideUtil.get_object(self.slides, metadata_id_to_replace, 'title')['objectId']
-            requests.append(GslideUtil.replace_image(object_id_to_replace, image_url))
+        if element is not None:
+            object_id = element['objectId']
+            requests.append(GslideUtil.replace_image(object_id, image_url))
         else:
-            requests.append(GslideUtil.create_image(slide_object_id, image_url))
-        response = slides_service.presentations().batchUpdate(
-            presentationId=self.presentation_id,
-            body={'requests': requests}
-        ).execute()
-        try:
-            object_id_to_replace = next(iter(response['replies'][0].values()))['objectId']
-        except:
-            pass
-        if metadata_id_to_replace is not None:
-            slides_service.presentations().batchUpdate(presentationId=self.presentation_id,
-               body={'requests': [GslideUtil.updatePageElementAltText(object_id_to_replace, metadata=metadata_id_to_replace)]}
-               ).execute()
-        return object_id_to_replace
-
+            object_id = GslideUtil.new_object_id()
+            requests.append(GslideUtil.create_image(slide_object_id, image_url, object_id))
+            self.element_index.add({'objectId': object_id, 'title': metadata_id_to_replace})
+        if metadata_id_to_replace is not None and (element is None or element.get('title') != metadata_id_to_replace):
+            requests.append(GslideUtil.updatePageElementAltText(object_id, metadata=metadata_id_to_replace))
+        return requests, object_id
 
+    def batch_update(self, requests):
+        # nothing to send when requests is empty
+        for start in range(0, len(requests), MAXIMUM_REQUESTS_PER_BATCH):
+            scheduler.execute("slides", self.slides_service.presentations().batchUpdate(
+                presentationId=self.presentation_id,
+                body={'requests': requests[start:start + MAXIMUM_REQUESTS_PER_BATCH]}
+            ))
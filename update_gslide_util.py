@@ -1,4 +1,22 @@
 
+import uuid
+
+
+class SlideElementIndex:
+    # objectId -> page element and title (alt text metadata) -> page element, built once for all the slides
+    def __init__(self, slides):
+        self.by_object_id = {}
+        self.by_title = {}
+        for slide in slides or []:
+            for element in slide.get('pageElements', []):
+                self.add(element)
+
+    def add(self, element):
+        self.by_object_id[element['objectId']] = element
+        if element.get('title') is not None:
+            self.by_title.setdefault(element['title'], element)
+
+
 class GslideUtil:
     @staticmethod
     def get_object(slides, value_to_find, key='objectId'):
@@ -41,8 +59,13 @@ class GslideUtil:
         }
 
     @staticmethod
-    def create_image(slide_object_id, image_url):  # title is similar to metadata
-        return {
+    def new_object_id():
+        # assigned by us, so requests of the same batchUpdate can refer to an image before it exists
+        return f"image_{uuid.uuid4().hex}"
+
+    @staticmethod
+    def create_image(slide_object_id, image_url, object_id=None):  # title is similar to metadata
+        ret = {
             'createImage': {
                 'url': image_url,
                 'elementProperties': {
@@ -66,4 +89,7 @@ class GslideUtil:
                     }
                 }
             }
-        }
\ No newline at end of file
+        }
+        if object_id is not None:
+            ret['createImage']['objectId'] = object_id
+        return ret
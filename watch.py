@@ -0,0 +1,78 @@
+from __future__ import annotations
+import asyncio
+import os
+import time
+from itertools import zip_longest
+from typing import Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from stats_store import StatsStore
+
+# How often ./data is looked at, in seconds
+POLL_SECONDS = 2.0
+# How long the archives must stay unchanged before they are read, so that a dump still being copied is not parsed
+DEBOUNCE_SECONDS = 3.0
+
+
+class ArchiveWatcher:
+    # Polls the size and modification time of the archives listed by list_files. No file system events: ./data is
+    # small, and polling works the same on every platform and on network shares.
+    def __init__(self, list_files: Callable[[], list[str]], poll_seconds=POLL_SECONDS,
+                 debounce_seconds=DEBOUNCE_SECONDS):
+        self.list_files = list_files
+        self.poll_seconds = poll_seconds
+        self.debounce_seconds = debounce_seconds
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self) -> dict[str, tuple[int, int]]:
+        ret = {}
+        for file_path in self.list_files():
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:  # removed while listing
+                continue
+            ret[file_path] = (stat.st_size, stat.st_mtime_ns)
+        return ret
+
+    async def wait_for_change(self, stop: asyncio.Event) -> bool:
+        # True once an archive was added, modified or removed and then nothing changed for debounce_seconds,
+        # False as soon as `stop` is set
+        changed_at = None
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_seconds)
+                return False
+            except asyncio.TimeoutError:
+                pass
+            snapshot = self.take_snapshot()
+            if snapshot != self.snapshot:
+                self.snapshot = snapshot
+                changed_at = time.monotonic()
+            elif changed_at is not None and time.monotonic() - changed_at >= self.debounce_seconds:
+                return True
+
+
+class LatexBlocks:
+    # latex_command.tex kept as one block of lines per service, so that an update only writes the variables of the
+    # services whose stats changed again. The file is the same as the one main.write_latex_variables writes.
+    def __init__(self, file_path="latex_command.tex"):
+        self.file_path = file_path
+        self.blocks: dict[str, list[str]] = {}
+
+    def update(self, stats_store: StatsStore, services: set[str]) -> int:
+        # Returns the number of lines that changed; the file is only written when there is one
+        changed_lines = 0
+        blocks = {}
+        for service in stats_store.services.labels:
+            if service in services or service not in self.blocks:
+                blocks[service] = stats_store.as_latex_variables([service])
+                changed_lines += sum(old != new for old, new in zip_longest(self.blocks.get(service, []), blocks[service]))
+            else:
+                blocks[service] = self.blocks[service]
+        for service in self.blocks.keys() - blocks.keys():
+            changed_lines += len(self.blocks[service])
+        self.blocks = blocks
+        if changed_lines:
+            with open(self.file_path, "w") as f:
+                print("\n".join(line for block in blocks.values() for line in block), file=f)
+        return changed_lines